@@ -3,6 +3,7 @@ from flask import Flask, jsonify, request, session
 from flask_login import LoginManager
 from flask_cors import CORS
 from dotenv import load_dotenv
+from sqlalchemy import event
 
 # Load environment variables
 load_dotenv()
@@ -14,6 +15,7 @@ from routes.plants import plants_bp
 from routes.garden import garden_bp
 from routes.calendar import calendar_bp
 from routes.garden_layout import garden_layout_bp
+from routes.jobs import jobs_bp
 
 # Import AI features optionally (for local development without openai package)
 try:
@@ -24,6 +26,36 @@ except ImportError as e:
     AI_FEATURES_AVAILABLE = False
     ai_bp = None
 
+def engine_options(database_url):
+    """
+    SQLAlchemy engine options from the environment. Every gunicorn worker and
+    job worker process has its own pool, so the database sees up to
+    processes x (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections.
+    """
+    if database_url.startswith('sqlite'):
+        # Wait for the writer lock instead of failing with "database is locked"
+        return {'connect_args': {'timeout': float(os.getenv('SQLITE_BUSY_TIMEOUT', 15))}}
+    
+    options = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 5)),
+        'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),  # Seconds, below server and proxy idle timeouts
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    }
+    
+    statement_timeout = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 0))
+    if statement_timeout and database_url.startswith('postgresql'):
+        options['connect_args'] = {'options': f'-c statement_timeout={statement_timeout}'}
+    return options
+
+def configure_sqlite_connection(dbapi_connection, connection_record):
+    """Single-node SQLite: readers don't block the writer, and commits skip the per-transaction fsync"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.close()
+
 def create_app():
     # Configure Flask to serve React build files
     app = Flask(__name__, static_folder='.', static_url_path='')
@@ -46,12 +78,16 @@ def create_app():
         database_url = database_url.replace('postgres://', 'postgresql://', 1)
     
     app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(database_url)
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['GOOGLE_CLIENT_ID'] = os.getenv('GOOGLE_CLIENT_ID')
     app.config['GOOGLE_CLIENT_SECRET'] = os.getenv('GOOGLE_CLIENT_SECRET')
     
     # Initialize extensions
     db.init_app(app)
+    if database_url.startswith('sqlite') and os.getenv('SQLITE_WAL', 'true').lower() == 'true':
+        with app.app_context():
+            event.listen(db.engine, 'connect', configure_sqlite_connection)
     
     # Setup CORS - Allow frontend domains
     allowed_origins = [
@@ -88,6 +124,7 @@ def create_app():
     app.register_blueprint(garden_bp)
     app.register_blueprint(calendar_bp)
     app.register_blueprint(garden_layout_bp)
+    app.register_blueprint(jobs_bp)
     if AI_FEATURES_AVAILABLE:
         app.register_blueprint(ai_bp)
     
@@ -107,6 +144,7 @@ def create_app():
                 'plants': '/api/plants',
                 'garden': '/api/garden',
                 'calendar': '/api/calendar',
+                'jobs': '/api/jobs/<id>',
                 'ai': '/api/ai/*'
             }
         })
@@ -139,6 +177,17 @@ def create_app():
             'cookies': dict(request.cookies)
         })
     
+    # Latency, error and circuit breaker state of the external APIs, for this process,
+    # and the tokens left in the API quotas shared by all workers
+    @app.route('/api/debug/upstreams')
+    def upstream_stats():
+        from services.http_client import http_client
+        from services.rate_limiter import rate_limiter
+        stats = http_client.stats()
+        for provider, quota in rate_limiter.stats().items():
+            stats.setdefault(provider, {})['rate_limit'] = quota
+        return jsonify(stats)
+    
     # React Router catch-all - serves React app for all non-API routes
     @app.route('/', defaults={'path': ''})
     @app.route('/<path:path>')
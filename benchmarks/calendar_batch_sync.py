@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Check GoogleCalendarService.sync_all_events against a local fake Calendar API.
+
+The fake server implements the calendar list, calendar create/get/delete,
+single event inserts/updates and HTTP batch requests, and fails some batch
+items the first time with a 503 (and one item always with a 400) to exercise
+the retry path. The script syncs the same garden event by event and in
+batches, then compares request counts, time and the stored Google event IDs.
+It also checks that plot calendars are created once, that duplicate calendars
+left by earlier syncs are cleaned up, that unchanged events are not pushed
+again, that remote edits are pulled with sync tokens, that a generated
+task moved in Google onto the day of the same task keeps its local date,
+and that a plot calendar deleted in Google is recreated on the next sync.
+Run from the project root:
+python benchmarks/calendar_batch_sync.py [number_of_events]
+"""
+
+import email.parser
+import email.policy
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import uuid
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+NUM_EVENTS = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+REQUEST_LATENCY = 0.005  # Seconds the fake server takes per HTTP request
+FLAKY_EVERY = 7  # Every 7th event fails once with a 503 inside a batch
+BROKEN_TITLE = 'Always rejected'  # This event always fails with a 400
+
+
+class FakeCalendarApi:
+    """In-memory Google Calendar API state shared by the request handlers"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.http_requests = 0
+        self.calendars = {}  # calendar id -> summary
+        self.calendars_created = 0
+        self.events = {}  # event id -> {'calendar', 'body', 'sequence', 'status'}
+        self.sequence = 0  # Change counter, sync tokens are its value at listing time
+        self.failed_once = set()
+
+    def save_event(self, event_id, calendar_id, body, status='confirmed'):
+        self.sequence += 1
+        self.events[event_id] = {'calendar': calendar_id, 'body': body, 'sequence': self.sequence, 'status': status}
+
+    def edit_remotely(self, event_id, **changes):
+        """Simulate the user editing an event in Google Calendar"""
+        with self.lock:
+            event = self.events[event_id]
+            self.save_event(event_id, event['calendar'], {**event['body'], **changes})
+
+    def handle(self, method, path, body):
+        """Serve one (possibly batched) API call, returning (status, response body)"""
+        path, _, query = path.partition('?')
+        parts = path.strip('/').split('/')[2:]  # After calendar/v3
+        params = dict(urllib.parse.parse_qsl(query))
+        not_found = 404, {'error': {'code': 404, 'message': 'Not Found'}}
+
+        with self.lock:
+            if parts == ['users', 'me', 'calendarList']:
+                items = [{'id': calendar_id, 'summary': summary, 'accessRole': 'owner'}
+                         for calendar_id, summary in self.calendars.items()]
+                return 200, {'items': items}
+            if parts == ['calendars'] and method == 'POST':
+                calendar_id = f'calendar-{uuid.uuid4().hex[:8]}'
+                self.calendars[calendar_id] = body['summary']
+                self.calendars_created += 1
+                return 200, {'id': calendar_id, **body}
+            if len(parts) < 2 or parts[1] not in self.calendars:
+                return not_found
+
+            calendar_id = parts[1]
+            if len(parts) == 2:
+                if method == 'DELETE':
+                    del self.calendars[calendar_id]
+                    self.events = {key: value for key, value in self.events.items() if value['calendar'] != calendar_id}
+                    return 204, None
+                return 200, {'id': calendar_id, 'summary': self.calendars[calendar_id]}
+
+            if method == 'GET':
+                # Full listing, or the changes since a sync token (one page is enough here)
+                since = int(params.get('syncToken', 0))
+                items = [
+                    {'id': event_id, 'status': event['status'], **event['body']}
+                    for event_id, event in self.events.items()
+                    if event['calendar'] == calendar_id and event['sequence'] > since
+                ]
+                return 200, {'items': items, 'nextSyncToken': str(self.sequence)}
+
+            if body.get('summary') == BROKEN_TITLE:
+                return 400, {'error': {'code': 400, 'message': 'Invalid event'}}
+            if method == 'POST':
+                event_id = uuid.uuid4().hex
+            elif method == 'PUT' and self.events.get(parts[3], {}).get('calendar') == calendar_id:
+                event_id = parts[3]
+            else:
+                return not_found
+            self.save_event(event_id, calendar_id, body)
+            return 200, {'id': event_id, **body}
+
+    def flaky(self, body):
+        """Whether this batch item should fail with a 503 this time"""
+        number = int(body.get('description', '0').rsplit(' ', 1)[-1])
+        with self.lock:
+            if number % FLAKY_EVERY or number in self.failed_once:
+                return False
+            self.failed_once.add(number)
+            return True
+
+
+api = FakeCalendarApi()
+
+
+class FakeCalendarHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _serve(self):
+        with api.lock:
+            api.http_requests += 1
+        time.sleep(REQUEST_LATENCY)
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        if self.path.startswith('/batch/'):
+            self._serve_batch(body)
+        else:
+            status, response = api.handle(self.command, self.path, json.loads(body or b'{}'))
+            self._respond(status, 'application/json', json.dumps(response).encode() if response is not None else b'')
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _serve
+
+    def _serve_batch(self, body):
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+            f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body
+        )
+        boundary = uuid.uuid4().hex
+        chunks = []
+        for part in message.iter_parts():
+            request_line, _, rest = part.get_payload().partition('\n')
+            method, path, _ = request_line.split(' ', 2)
+            item_body = json.loads(rest.split('\n\n', 1)[1] or '{}') if '\n\n' in rest else {}
+
+            if 'events' in path and api.flaky(item_body):
+                status, response = 503, {'error': {'code': 503, 'message': 'Backend Error'}}
+            else:
+                status, response = api.handle(method, path, item_body)
+
+            chunks.append(
+                f"--{boundary}\r\n"
+                f"Content-Type: application/http\r\n"
+                f"Content-ID: <response-{part['Content-ID'][1:]}\r\n\r\n"
+                f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                f"Content-Type: application/json\r\n\r\n"
+                f"{json.dumps(response)}\r\n"
+            )
+        payload = (''.join(chunks) + f"--{boundary}--\r\n").encode()
+        self._respond(200, f'multipart/mixed; boundary={boundary}', payload)
+
+    def _respond(self, status, content_type, payload):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def setup_garden(app, num_events):
+    from google.oauth2.credentials import Credentials
+    from models import db, User, PlantType, Plant, GardenLocation, PlotArea, PlantPlacement, CalendarEvent
+    from services.google_calendar_service import google_calendar_service
+
+    with app.app_context():
+        db.create_all()
+        user = User(google_id='fake', email='gardener@example.com', name='Gardener')
+        db.session.add(user)
+        db.session.flush()
+
+        location = GardenLocation(user_id=user.id, latitude=52.5, longitude=13.4)
+        plant_type = PlantType(name='Tomato')
+        db.session.add_all([location, plant_type])
+        db.session.flush()
+
+        plots = [PlotArea(user_id=user.id, garden_location_id=location.id, name=f'Bed {i}') for i in range(4)]
+        plants = [Plant(user_id=user.id, plant_type_id=plant_type.id) for _ in range(20)]
+        db.session.add_all(plots + plants)
+        db.session.flush()
+
+        for index, plant in enumerate(plants):
+            db.session.add(PlantPlacement(user_id=user.id, plant_id=plant.id, plot_id=plots[index % 4].id,
+                                          x_position=index, y_position=0, planted_date=date.today()))
+        for number in range(1, num_events + 1):
+            db.session.add(CalendarEvent(
+                user_id=user.id, plant_id=plants[number % 20].id,
+                title=BROKEN_TITLE if number == 1 else f'💧 Water tomato {number}',
+                description=f'Garden task {number}',
+                event_date=date.today() + timedelta(days=number % 60), event_type='watering'
+            ))
+
+        credentials = Credentials(
+            token='fake-token', refresh_token='fake-refresh', token_uri='http://127.0.0.1/token',
+            client_id='fake', client_secret='fake', scopes=google_calendar_service.SCOPES,
+            expiry=datetime.utcnow() + timedelta(hours=1)
+        )
+        google_calendar_service.store_credentials(user, credentials)
+        return user.id
+
+
+def run_sync(app, user_id, batch):
+    from models import db, User, CalendarEvent
+    from services.google_calendar_service import google_calendar_service
+
+    with app.app_context():
+        requests_before = api.http_requests
+        calendars_before = api.calendars_created
+        start = time.perf_counter()
+        success, message = google_calendar_service.sync_all_events(db.session.get(User, user_id), batch=batch)
+        elapsed = time.perf_counter() - start
+
+        stored = CalendarEvent.query.filter(CalendarEvent.google_event_id.isnot(None)).count()
+        print(f"{'batch' if batch else 'per event':>9}: {message} in {elapsed:.2f}s, "
+              f"{api.http_requests - requests_before} HTTP requests, {api.calendars_created - calendars_before} calendars created, "
+              f"{stored} events with Google IDs")
+        assert success, message
+        return stored
+
+
+def main():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeCalendarHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    directory = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{Path(directory) / 'garden.db'}"
+    os.environ['GOOGLE_CALENDAR_API_ROOT'] = f"http://127.0.0.1:{server.server_port}/"
+
+    from app import app
+    from services.google_calendar_service import google_calendar_service
+    google_calendar_service.BATCH_BACKOFF_SECONDS = 0.05
+
+    user_id = setup_garden(app, NUM_EVENTS)
+
+    # Duplicate calendars left behind by syncs that created calendars every time
+    for summary in ['🌱 Bed 0 - Garden Tasks'] * 3 + ['🌱 Bed 1 - Garden Tasks'] * 2:
+        api.calendars[f'calendar-old-{uuid.uuid4().hex[:8]}'] = summary
+
+    # Per event, registering the plot calendars on the way
+    assert run_sync(app, user_id, batch=False) == NUM_EVENTS - 1
+    assert sorted(api.calendars.values()) == [f'🌱 Bed {i} - Garden Tasks' for i in range(4)], api.calendars
+    with app.app_context():
+        from models import db, CalendarEvent
+        CalendarEvent.query.update({'google_event_id': None, 'google_calendar_id': None, 'google_sync_pending': True})
+        db.session.commit()
+
+    # Batched inserts (with one round of retries for the flaky items)
+    api.failed_once.clear()
+    calendars_created = api.calendars_created
+    assert run_sync(app, user_id, batch=True) == NUM_EVENTS - 1
+
+    # Nothing changed: only the sync token pulls (and the always rejected event) are sent
+    requests_before = api.http_requests
+    assert run_sync(app, user_id, batch=True) == NUM_EVENTS - 1
+    assert api.http_requests - requests_before <= 5, "unchanged events were pushed again"
+    assert api.calendars_created == calendars_created, "plot calendars were created again"
+
+    # Local edits push only the changed events, remote edits are pulled into the local events
+    with app.app_context():
+        events = CalendarEvent.query.filter(CalendarEvent.google_event_id.isnot(None)).order_by(CalendarEvent.id).limit(6).all()
+        for event in events[:5]:
+            event.title += ' (moved)'
+            event.google_sync_pending = True
+        remote_id, local_id = events[5].google_event_id, events[5].id
+        db.session.commit()
+    api.edit_remotely(remote_id, summary='✅ Watered by hand', start={'date': '2030-01-01'})
+    assert run_sync(app, user_id, batch=True) == NUM_EVENTS - 1
+    with app.app_context():
+        event = db.session.get(CalendarEvent, local_id)
+        assert (event.title, event.completed, event.event_date) == ('Watered by hand', True, date(2030, 1, 1)), event.to_dict()
+
+    # A generated task moved in Google onto a day that already has the same task keeps its local date
+    with app.app_context():
+        first = CalendarEvent.query.filter(CalendarEvent.google_event_id.isnot(None)).order_by(CalendarEvent.id.desc()).first()
+        second = CalendarEvent.query.filter(CalendarEvent.plant_id == first.plant_id, CalendarEvent.event_date != first.event_date,
+                                            CalendarEvent.google_event_id.isnot(None)).first()
+        first.auto_generated = second.auto_generated = True
+        remote_id, local_id, kept_date, taken_date = first.google_event_id, first.id, first.event_date, second.event_date
+        db.session.commit()
+    api.edit_remotely(remote_id, summary='✅ Watered early', start={'date': taken_date.isoformat()})
+    assert run_sync(app, user_id, batch=True) == NUM_EVENTS - 1
+    with app.app_context():
+        event = db.session.get(CalendarEvent, local_id)
+        assert (event.title, event.completed, event.event_date) == ('Watered early', True, kept_date), event.to_dict()
+    assert api.events[remote_id]['body']['start']['date'] == kept_date.isoformat(), "the local date was not pushed back"
+    requests_before = api.http_requests
+    assert run_sync(app, user_id, batch=True) == NUM_EVENTS - 1
+    assert api.http_requests - requests_before <= 5, "the conflicting change was pulled again"
+
+    # A plot calendar deleted in Google is recreated lazily, from the 404 of its pull
+    with api.lock:
+        deleted = next(iter(api.calendars))
+        del api.calendars[deleted]
+    assert run_sync(app, user_id, batch=True) == NUM_EVENTS - 1
+    assert api.calendars_created == calendars_created + 1 and len(api.calendars) == 4
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
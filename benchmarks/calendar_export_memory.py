@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Compare peak memory of the /api/calendar response modes on a large calendar.
+
+Fills a temporary SQLite database with seasons of generated events and
+fetches them as the single jsonify list, as NDJSON and as a streamed JSON
+array, measuring the peak traced Python allocation of each request. It checks
+that all modes, and walking the cursor pages, return the same events.
+Run from the project root:
+python benchmarks/calendar_export_memory.py [number_of_events]
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+DATABASE_PATH = os.path.join(tempfile.mkdtemp(), 'calendar_export_memory.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{DATABASE_PATH}'
+
+from app import app
+from models import db, User, PlantType, Plant, CalendarEvent
+
+NUM_EVENTS = int(sys.argv[1]) if len(sys.argv) > 1 else 30000
+NUM_PLANTS = 60
+PAGE_SIZE = 500
+
+
+def create_calendar(user_id):
+    plant_type = PlantType(name='Tomato')
+    db.session.add(plant_type)
+    db.session.flush()
+    plants = [Plant(user_id=user_id, plant_type_id=plant_type.id, custom_name=f'Tomato {i}') for i in range(NUM_PLANTS)]
+    db.session.add_all(plants)
+    db.session.flush()
+
+    start = date.today() - timedelta(days=3 * 365)
+    rows = [
+        {
+            'user_id': user_id,
+            'plant_id': plants[i % NUM_PLANTS].id,
+            'title': f'💧 Water {plants[i % NUM_PLANTS].custom_name}',
+            'description': 'Water your tomato in Plot 1',
+            'event_date': start + timedelta(days=i // NUM_PLANTS),  # Many events share a date
+            'event_type': 'watering',
+            'completed': False
+        }
+        for i in range(NUM_EVENTS)
+    ]
+    db.session.execute(CalendarEvent.__table__.insert(), rows)
+    db.session.commit()
+
+
+def measure(client, url):
+    """Run a request and write its body to a file, returning (body, seconds, peak MB)"""
+    with tempfile.TemporaryFile() as output:
+        tracemalloc.start()
+        started = time.perf_counter()
+        response = client.get(url, buffered=False)
+        for chunk in response.response:
+            output.write(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+        response.close()
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        output.seek(0)
+        return output.read(), elapsed, peak / 1024 / 1024
+
+
+def main():
+    with app.app_context():
+        db.create_all()
+        user = User(google_id='export', email='export@example.com', name='Export')
+        db.session.add(user)
+        db.session.commit()
+        create_calendar(user.id)
+        user_id = user.id
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+
+    body, elapsed, peak = measure(client, '/api/calendar')
+    expected = json.loads(body)
+    assert len(expected) == NUM_EVENTS
+    print(f"{'mode':<12} {'seconds':>8} {'peak MB':>8}")
+    print(f"{'list':<12} {elapsed:>8.2f} {peak:>8.1f}")
+
+    body, elapsed, peak = measure(client, '/api/calendar?format=ndjson')
+    assert [json.loads(line) for line in body.splitlines()] == expected, 'NDJSON events differ'
+    print(f"{'ndjson':<12} {elapsed:>8.2f} {peak:>8.1f}")
+
+    body, elapsed, peak = measure(client, '/api/calendar?format=stream')
+    assert json.loads(body) == expected, 'streamed JSON array differs'
+    print(f"{'json stream':<12} {elapsed:>8.2f} {peak:>8.1f}")
+
+    events, cursor, pages = [], None, 0
+    while True:
+        page = client.get(f'/api/calendar?limit={PAGE_SIZE}' + (f'&after={cursor}' if cursor else '')).get_json()
+        events.extend(page['events'])
+        pages += 1
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+    assert events == expected, 'cursor pages differ'
+    print(f"✅ All modes return the same {NUM_EVENTS} events ({pages} pages of {PAGE_SIZE})")
+
+
+if __name__ == '__main__':
+    main()
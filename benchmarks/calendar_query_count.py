@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Check that the calendar list endpoints run a constant number of SQL queries.
+
+Fills a temporary SQLite database with gardens of different sizes (one plant
+per event, plant types shared), requests /api/calendar, /upcoming, /overdue
+and the per-plant route, and counts the statements each request executes.
+The counts must not grow with the number of events, apart from selectinload
+splitting more than 500 keys into several IN queries. It also checks that the
+compact responses (?compact=true) hold the same data as the nested ones.
+Run from the project root: python benchmarks/calendar_query_count.py
+"""
+
+import os
+import sys
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+DATABASE_PATH = os.path.join(tempfile.mkdtemp(), 'calendar_query_count.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{DATABASE_PATH}'
+
+from sqlalchemy import event
+
+from app import app
+from models import db, User, PlantType, Plant, CalendarEvent
+
+SIZES = (10, 100, 1000)
+PLANT_TYPES = 8
+SELECTIN_CHUNK = 500  # selectinload sends at most this many keys per IN query
+BASE_QUERIES = 4  # Logged-in user, events, their plants, the plants' types
+
+
+class QueryCounter:
+    """Counts the statements sent to the database while active"""
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self.on_execute)
+
+    def on_execute(self, *args):
+        self.count += 1
+
+
+def create_garden(user_id, size):
+    """Replace the user's events with `size` events, each for its own plant"""
+    CalendarEvent.query.filter_by(user_id=user_id).delete()
+    Plant.query.filter_by(user_id=user_id).delete()
+
+    types = PlantType.query.all()
+    plants = [Plant(user_id=user_id, plant_type_id=types[i % len(types)].id, custom_name=f'Plant {i}') for i in range(size)]
+    db.session.add_all(plants)
+    db.session.flush()
+
+    today = date.today()
+    db.session.add_all([
+        CalendarEvent(user_id=user_id, plant_id=plant.id, title=f'Water {plant.custom_name}', event_type='watering',
+                      event_date=today + timedelta(days=i * 7 % 30 - 10))
+        for i, plant in enumerate(plants)
+    ])
+    db.session.commit()
+    return plants[0].id
+
+
+def expand(compact):
+    """Rebuild the nested event dicts from a compact response"""
+    plant_types = {plant_type['id']: plant_type for plant_type in compact['plant_types']}
+    plants = {}
+    for plant in compact['plants']:
+        plant = dict(plant)
+        plant['plant_type'] = plant_types.get(plant.pop('plant_type_id'))
+        plants[plant['id']] = plant
+
+    events = []
+    for item in compact['events']:
+        item = dict(item)
+        item['plant'] = plants.get(item.pop('plant_id'))
+        events.append(item)
+    return events
+
+
+def main():
+    with app.app_context():
+        db.create_all()
+        user = User(google_id='query-count', email='query-count@example.com', name='Query Count')
+        db.session.add(user)
+        db.session.add_all([PlantType(name=f'Type {i}') for i in range(PLANT_TYPES)])
+        db.session.commit()
+        user_id = user.id
+        counter = QueryCounter(db.engine)
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+
+    counts = {}
+    for size in SIZES:
+        with app.app_context():
+            plant_id = create_garden(user_id, size)
+
+        endpoints = ['/api/calendar', '/api/calendar/upcoming', '/api/calendar/overdue',
+                     f'/api/garden/calendar/plant/{plant_id}']
+        for endpoint in endpoints:
+            counter.count = 0
+            nested = client.get(endpoint).get_json()
+            nested_queries = counter.count
+
+            counter.count = 0
+            compact = client.get(endpoint + '?compact=true').get_json()
+            compact_queries = counter.count
+
+            if endpoint.startswith('/api/garden'):
+                nested = nested['events']
+            assert expand(compact) == nested, f'{endpoint} compact response differs at {size} events'
+
+            name = endpoint.rsplit('/', 1)[0] + '/<id>' if endpoint.startswith('/api/garden') else endpoint
+            counts.setdefault(name, []).append((nested_queries, compact_queries))
+
+    print(f"{'endpoint':<36}" + ''.join(f"{size:>12}" for size in SIZES))
+    for name, per_size in counts.items():
+        print(f"{name:<36}" + ''.join(f"{nested:>7}/{compact:<4}" for nested, compact in per_size))
+        for size, queries in zip(SIZES, per_size):
+            # One plant per event, so plants and types need one IN query per chunk of events
+            allowed = BASE_QUERIES + 2 * ((size - 1) // SELECTIN_CHUNK)
+            assert max(queries) <= allowed, f'{name} query count grows with the number of events'
+    print("✅ Query counts are constant (nested/compact) and compact responses match")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Show query plans and timings of the hot route queries before and after the
+composite indexes declared in models.py.
+
+Fills a temporary SQLite database with many users' plants, placements,
+journal entries and calendar events. Each hot query runs twice: once with the
+ix_* indexes dropped, as on a database created before they existed, and once
+after creating them again, as migration 0003 does. The script prints
+EXPLAIN QUERY PLAN and the median time for each run. Run from the project root:
+python benchmarks/explain_hot_queries.py [number_of_users]
+"""
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+DATABASE_PATH = os.path.join(tempfile.mkdtemp(), 'explain_hot_queries.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{DATABASE_PATH}'
+
+from sqlalchemy import text
+
+from app import app
+from models import db, User, PlantType, Plant, CalendarEvent, GardenLocation, PlotArea, PlantPlacement, PlantJournal
+
+NUM_USERS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+PLANTS_PER_USER = 100
+PLOTS_PER_USER = 5
+EVENTS_PER_PLANT = 20
+JOURNAL_PER_PLANT = 3
+RUNS = 20
+
+TODAY = date.today().isoformat()
+
+# The queries behind the routes, with the filters and ordering they use
+HOT_QUERIES = {
+    'calendar list (/api/calendar)':
+        "SELECT id FROM calendar_event WHERE user_id = :user_id ORDER BY event_date, id",
+    'calendar cursor page':
+        "SELECT id FROM calendar_event WHERE user_id = :user_id AND "
+        "(event_date > :today OR (event_date = :today AND id > 0)) ORDER BY event_date, id LIMIT 501",
+    'upcoming events':
+        "SELECT id FROM calendar_event WHERE user_id = :user_id AND completed = 0 AND event_date >= :today "
+        "ORDER BY event_date LIMIT 10",
+    'overdue events':
+        "SELECT id FROM calendar_event WHERE user_id = :user_id AND completed = 0 AND event_date < :today "
+        "ORDER BY event_date",
+    'harvest insights':
+        "SELECT id FROM calendar_event WHERE user_id = :user_id AND event_type = 'harvesting' AND completed = 0 "
+        "AND event_date <= :today ORDER BY event_date",
+    'events of a plant':
+        "SELECT id FROM calendar_event WHERE user_id = :user_id AND plant_id = :plant_id ORDER BY event_date",
+    'active placements of a plot':
+        "SELECT id FROM plant_placement WHERE user_id = :user_id AND plot_id = :plot_id AND removed_date IS NULL",
+    'plot plant count':
+        "SELECT count(id) FROM plant_placement WHERE plot_id = :plot_id",
+    'plant journal':
+        "SELECT id FROM plant_journal WHERE user_id = :user_id AND plant_id = :plant_id ORDER BY entry_date DESC",
+    'plant stats by status':
+        "SELECT status, count(id) FROM plant WHERE user_id = :user_id GROUP BY status",
+    'job claim':
+        "SELECT id FROM job WHERE status = 'queued' AND run_after <= :today ORDER BY run_after, id LIMIT 10",
+}
+
+
+def fill_database():
+    """Insert the garden of NUM_USERS users with Core inserts"""
+    rng = random.Random(0)
+    plant_type = PlantType(name='Tomato')
+    db.session.add(plant_type)
+    db.session.flush()
+    start = date.today() - timedelta(days=365)
+
+    for number in range(NUM_USERS):
+        user = User(google_id=f'user-{number}', email=f'user-{number}@example.com', name=f'User {number}')
+        db.session.add(user)
+        db.session.flush()
+        location = GardenLocation(user_id=user.id, latitude=40.0, longitude=-74.0)
+        db.session.add(location)
+        db.session.flush()
+        plots = [PlotArea(user_id=user.id, garden_location_id=location.id, name=f'Plot {i}') for i in range(PLOTS_PER_USER)]
+        db.session.add_all(plots)
+        db.session.flush()
+
+        statuses = ['planned', 'planted', 'growing', 'harvested']
+        db.session.execute(Plant.__table__.insert(), [
+            {'user_id': user.id, 'plant_type_id': plant_type.id, 'status': rng.choice(statuses)}
+            for _ in range(PLANTS_PER_USER)
+        ])
+        plant_ids = [row.id for row in db.session.query(Plant.id).filter_by(user_id=user.id)]
+
+        db.session.execute(PlantPlacement.__table__.insert(), [
+            {'user_id': user.id, 'plant_id': plant_id, 'plot_id': rng.choice(plots).id, 'x_position': 0, 'y_position': 0,
+             'removed_date': start if rng.random() < 0.2 else None}
+            for plant_id in plant_ids
+        ])
+        db.session.execute(PlantJournal.__table__.insert(), [
+            {'user_id': user.id, 'plant_id': plant_id, 'entry_date': start + timedelta(days=rng.randrange(365)),
+             'content': 'Looking good'}
+            for plant_id in plant_ids for _ in range(JOURNAL_PER_PLANT)
+        ])
+        db.session.execute(CalendarEvent.__table__.insert(), [
+            {'user_id': user.id, 'plant_id': plant_id, 'title': 'Care', 'completed': rng.random() < 0.5,
+             'event_type': rng.choice(['watering', 'fertilizing', 'harvesting']),
+             'event_date': start + timedelta(days=rng.randrange(2 * 365))}
+            for plant_id in plant_ids for _ in range(EVENTS_PER_PLANT)
+        ])
+    db.session.commit()
+
+
+def sample_parameters():
+    user = User.query.order_by(User.id.desc()).first()
+    plant = Plant.query.filter_by(user_id=user.id).first()
+    plot = PlotArea.query.filter_by(user_id=user.id).first()
+    return {'user_id': user.id, 'plant_id': plant.id, 'plot_id': plot.id, 'today': TODAY}
+
+
+def filter_indexes():
+    return [index for table in db.metadata.sorted_tables for index in table.indexes if index.name.startswith('ix_')]
+
+
+def explain(connection, sql, parameters):
+    plan = connection.execute(text('EXPLAIN QUERY PLAN ' + sql), parameters).fetchall()
+    timings = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        connection.execute(text(sql), parameters).fetchall()
+        timings.append(time.perf_counter() - started)
+    return [row[-1] for row in plan], statistics.median(timings) * 1000
+
+
+def run_all(connection, parameters):
+    connection.exec_driver_sql('ANALYZE')
+    return {name: explain(connection, sql, parameters) for name, sql in HOT_QUERIES.items()}
+
+
+def main():
+    with app.app_context():
+        db.create_all()
+        print(f"Filling {NUM_USERS} users ({NUM_USERS * PLANTS_PER_USER * EVENTS_PER_PLANT} calendar events)...")
+        fill_database()
+        parameters = sample_parameters()
+
+        with db.engine.connect() as connection:
+            for index in filter_indexes():
+                index.drop(connection)
+            before = run_all(connection, parameters)
+
+            for index in filter_indexes():
+                index.create(connection)
+            after = run_all(connection, parameters)
+
+    for name in HOT_QUERIES:
+        (plan_before, time_before), (plan_after, time_after) = before[name], after[name]
+        print(f"\n{name}: {time_before:.3f} ms -> {time_after:.3f} ms")
+        print("  before: " + ' | '.join(plan_before))
+        print("  after:  " + ' | '.join(plan_after))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Local stub server for checking the shared HTTP client offline.
+
+Compares a fresh requests.get per call, as the integrations used to do, with
+the pooled client on a keep-alive stub and counts the connections each
+opens. It then checks the rest of the client's behaviour:
+- 503 and 429 answers are retried with backoff, and Retry-After is honoured.
+- A timed out POST, or one answered 502/504, is not repeated, while such
+  a GET is.
+- The circuit breaker opens after consecutive failures, fails fast while
+  open, and closes again after a successful trial call.
+- The latency and outcome histograms count every attempt.
+Run from the project root: python benchmarks/http_client_stub_server.py
+"""
+
+import json
+import statistics
+import sys
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.http_client import CircuitOpenError, HttpClient
+
+CALLS = 200
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # Headers and body are separate writes, don't wait for the ACK between them
+    connections = set()
+    hits = defaultdict(int)  # Requests per path
+
+    def handle_request(self):
+        StubHandler.connections.add(self.client_address)
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        StubHandler.hits[url.path] += 1
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        if url.path == '/slow':
+            time.sleep(float(query['seconds'][0]))
+        elif url.path == '/flaky':
+            # Fails the first `failures` calls with the given status
+            if StubHandler.hits[url.path] <= int(query['failures'][0]):
+                status = int(query['status'][0])
+                self.send_response(status)
+                if 'retry_after' in query:
+                    self.send_header('Retry-After', query['retry_after'][0])
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+        elif url.path == '/down':
+            self.send_response(500)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        payload = json.dumps({'ok': True}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = handle_request
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def timed_calls(call):
+    StubHandler.connections.clear()
+    timings = []
+    for _ in range(CALLS):
+        started = time.perf_counter()
+        call().raise_for_status()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000, len(StubHandler.connections)
+
+
+def main():
+    server = start_stub_server()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    client = HttpClient()
+    client.register('stub', read_timeout=2, retries=2, backoff=0.05, max_backoff=1, failure_threshold=10)
+
+    fresh_ms, fresh_connections = timed_calls(lambda: requests.get(f"{base_url}/ok", timeout=5))
+    pooled_ms, pooled_connections = timed_calls(lambda: client.get('stub', f"{base_url}/ok"))
+    print(f"{CALLS} calls: fresh requests.get {fresh_ms:.2f} ms median over {fresh_connections} connections, "
+          f"pooled client {pooled_ms:.2f} ms over {pooled_connections} connection(s)")
+    assert pooled_connections == 1, 'the pooled client did not reuse its connection'
+
+    StubHandler.hits.clear()
+    response = client.get('stub', f"{base_url}/flaky?failures=2&status=503")
+    assert response.status_code == 200 and StubHandler.hits['/flaky'] == 3
+    print("503, 503, 200: retried to success")
+
+    StubHandler.hits.clear()
+    started = time.perf_counter()
+    response = client.post('stub', f"{base_url}/flaky?failures=1&status=429&retry_after=0.5", json={})
+    elapsed = time.perf_counter() - started
+    assert response.status_code == 200 and 0.5 <= elapsed < 1, elapsed
+    print(f"429 with Retry-After 0.5: retried after {elapsed:.2f}s")
+
+    StubHandler.hits.clear()
+    try:
+        client.post('stub', f"{base_url}/slow?seconds=3", json={}, timeout=(1, 0.3))
+        raise AssertionError('timeout not raised')
+    except requests.exceptions.ReadTimeout:
+        pass
+    assert StubHandler.hits['/slow'] == 1, 'a timed out POST was sent again'
+    try:
+        client.get('stub', f"{base_url}/slow?seconds=3", timeout=(1, 0.3))
+    except requests.exceptions.ReadTimeout:
+        pass
+    assert StubHandler.hits['/slow'] == 4, 'a timed out GET was not retried'
+    print("read timeouts: POST sent once, GET tried 3 times")
+
+    StubHandler.hits.clear()
+    response = client.post('stub', f"{base_url}/flaky?failures=1&status=504", json={})
+    assert response.status_code == 504 and StubHandler.hits['/flaky'] == 1, 'a POST answered 504 was sent again'
+    StubHandler.hits.clear()
+    response = client.get('stub', f"{base_url}/flaky?failures=2&status=502")
+    assert response.status_code == 200 and StubHandler.hits['/flaky'] == 3, 'a GET answered 502 was not retried'
+    print("502/504 from a gateway: POST sent once, GET retried to success")
+
+    client.register('flaky', retries=0, failure_threshold=3, reset_after=1)
+    for _ in range(3):
+        assert client.get('flaky', f"{base_url}/down").status_code == 500
+    StubHandler.hits.clear()
+    started = time.perf_counter()
+    try:
+        client.get('flaky', f"{base_url}/down")
+        raise AssertionError('circuit did not open')
+    except CircuitOpenError:
+        pass
+    assert StubHandler.hits['/down'] == 0
+    print(f"circuit open after 3 failures, failed fast in {(time.perf_counter() - started) * 1000:.2f} ms")
+
+    time.sleep(1)
+    assert client.upstreams['flaky'].state() == 'half_open'
+    assert client.get('flaky', f"{base_url}/ok").status_code == 200
+    assert client.upstreams['flaky'].state() == 'closed'
+    print("circuit closed again after a successful trial call")
+
+    stats = client.stats()
+    print(json.dumps({name: stats[name] for name in ('stub', 'flaky')}, indent=2))
+    assert stats['stub']['calls'] == CALLS + 3 + 2 + 1 + 3 + 1 + 3
+    assert stats['flaky']['outcomes'] == {'500': 3, 'circuit_open': 1, '200': 1}
+    print("✅ Pooling, retries, timeouts, circuit breaker and histograms behave as expected")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
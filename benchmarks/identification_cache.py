@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the perceptual-hash cache in front of /api/ai/identify-plant.
+
+Fills a temporary cache with many identification results and measures
+lookups for an exact photo, a near-identical re-upload (re-encoded, resized
+and slightly brightened) and an unrelated photo. It checks that re-uploads
+hit within IDENTIFICATION_CACHE_MAX_DISTANCE, that different photos and
+prompts miss, and that the cache evicts least recently used results to stay
+under its size bound. The cache hit is also timed through the route, where
+decoding the upload takes most of the time. Run from the project root:
+python benchmarks/identification_cache.py [number_of_entries]
+"""
+
+import io
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageEnhance
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+TEMP_DIR = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(TEMP_DIR, 'app.db')}"
+os.environ['IDENTIFICATION_CACHE_PATH'] = os.path.join(TEMP_DIR, 'identification_cache.db')
+
+from app import app
+from models import db, User
+from routes.ai_features import IDENTIFY_PROMPT, VISION_MODEL
+from services.identification_cache import hamming, identification_cache
+from services.image_preprocessing import image_preprocessor
+
+NUM_ENTRIES = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+RUNS = 200
+RESULT = {'ai_analysis': 'Tomato (Solanum lycopersicum), family Solanaceae. ' * 20, 'confidence_score': 0.8,
+          'plantnet_suggestions': [], 'success': True, 'model_used': VISION_MODEL}
+
+
+def photo(seed, size=(3024, 4032)):
+    """A smooth random scene, so different seeds give different hashes"""
+    rng = np.random.default_rng(seed)
+    coarse = rng.integers(0, 256, (6, 8, 3), dtype=np.uint8)
+    image = Image.fromarray(coarse, 'RGB').resize(size, Image.Resampling.BICUBIC)
+    noise = rng.normal(0, 8, (size[1], size[0], 3))
+    image = Image.fromarray(np.clip(np.asarray(image) + noise, 0, 255).astype(np.uint8), 'RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def reupload(data):
+    """The same shot saved again by another app: smaller, brighter, recompressed"""
+    image = Image.open(io.BytesIO(data))
+    image = image.resize((image.width * 3 // 4, image.height * 3 // 4))
+    image = ImageEnhance.Brightness(image).enhance(1.05)
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=75)
+    return buffer.getvalue()
+
+
+def timed_lookup(image_hash, prompt=IDENTIFY_PROMPT):
+    timings = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        result = identification_cache.get(image_hash, prompt, VISION_MODEL)
+        timings.append(time.perf_counter() - started)
+    return result, statistics.median(timings) * 1000
+
+
+def main():
+    original = photo(1)
+    original_hash = image_preprocessor.prepare(io.BytesIO(original)).dhash
+    near_hash = image_preprocessor.prepare(io.BytesIO(reupload(original))).dhash
+    other_hash = image_preprocessor.prepare(io.BytesIO(photo(2))).dhash
+    print(f"re-upload distance {hamming(original_hash, near_hash)}, "
+          f"other photo distance {hamming(original_hash, other_hash)} "
+          f"(threshold {identification_cache.max_distance})")
+
+    rng = random.Random(0)
+    print(f"Filling {NUM_ENTRIES} cached results...")
+    for _ in range(NUM_ENTRIES):
+        random_hash = rng.getrandbits(64)
+        if hamming(random_hash, original_hash) > 2 * identification_cache.max_distance:
+            identification_cache.set(random_hash, IDENTIFY_PROMPT, VISION_MODEL, RESULT)
+    identification_cache.set(original_hash, IDENTIFY_PROMPT, VISION_MODEL, RESULT)
+
+    result, exact_ms = timed_lookup(original_hash)
+    assert result == RESULT, 'exact photo missed'
+    result, near_ms = timed_lookup(near_hash)
+    assert result == RESULT, 're-uploaded photo missed'
+    result, miss_ms = timed_lookup(other_hash)
+    assert result is None, 'unrelated photo hit'
+    assert identification_cache.get(original_hash, 'Another prompt', VISION_MODEL) is None, 'other prompt hit'
+    print(f"exact hit {exact_ms:.2f} ms, near-duplicate hit {near_ms:.2f} ms, miss {miss_ms:.2f} ms")
+
+    with app.app_context():
+        db.create_all()
+        user = User(google_id='cache', email='cache@example.com', name='Cache')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    upload = reupload(original)
+    started = time.perf_counter()
+    response = client.post('/api/ai/identify-plant', data={'image': (io.BytesIO(upload), 'leaf.jpg')},
+                           content_type='multipart/form-data')
+    route_ms = (time.perf_counter() - started) * 1000
+    assert response.get_json()['cached'] is True, 'route did not use the cache'
+    print(f"route cache hit for a {len(upload) / 1e6:.1f} MB upload: {route_ms:.0f} ms (vision call timeout is 30 s)")
+
+    stats = identification_cache.stats()
+    print(f"{stats['entries']} entries, {stats['size_bytes'] / 1e6:.1f} MB, hits {stats['hits']}, misses {stats['misses']}")
+
+    identification_cache.max_bytes = stats['size_bytes'] // 2
+    identification_cache.get(original_hash, IDENTIFY_PROMPT, VISION_MODEL)  # Recently used, must survive
+    identification_cache.set(other_hash, IDENTIFY_PROMPT, VISION_MODEL, RESULT)
+    stats = identification_cache.stats()
+    assert stats['size_bytes'] <= identification_cache.max_bytes, 'cache over its size bound'
+    assert identification_cache.get(original_hash, IDENTIFY_PROMPT, VISION_MODEL) == RESULT, 'recent entry evicted'
+    assert identification_cache.get(other_hash, IDENTIFY_PROMPT, VISION_MODEL) == RESULT, 'new entry evicted'
+    print(f"✅ After halving the bound: {stats['entries']} entries, {stats['size_bytes'] / 1e6:.1f} MB, "
+          "recently used results kept")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Local stubs of the PlantNet and OpenAI APIs for checking plant identification offline.
+
+Serves PlantNet /v2/identify/world and OpenAI /v1/chat/completions with
+configurable delays and points AIPlantAnalysisService at them. It checks
+several things:
+- Both providers are queried concurrently, so identification takes as long as
+  the slower one.
+- Calls reuse pooled keep-alive connections.
+- A failing or hanging provider only drops its own part of the result, within
+  that provider's timeout.
+- Identifying from a file path leaves no file handles open.
+- /api/ai/identify-plant returns the merged result.
+Run from the project root: python benchmarks/identification_stub_server.py
+"""
+
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+PLANTNET_DELAY = 0.6  # Seconds each stub takes to answer
+OPENAI_DELAY = 0.8
+TEMP_DIR = tempfile.mkdtemp()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, so connection reuse is visible
+    modes = {'plantnet': 'ok', 'openai': 'ok'}  # ok, error or hang
+    connections = set()
+    requests_served = 0
+
+    def do_POST(self):
+        StubHandler.requests_served += 1
+        StubHandler.connections.add(self.client_address)
+        url = urlparse(self.path)
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+
+        if url.path == '/v2/identify/world':
+            provider, delay = 'plantnet', PLANTNET_DELAY
+            assert parse_qs(url.query).get('api-key') == ['stub-plantnet-key'], 'PlantNet key missing'
+            form = BytesParser().parsebytes(f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body)
+            images = [part for part in form.get_payload() if part.get_param('name', header='content-disposition') == 'images']
+            Image.open(io.BytesIO(images[0].get_payload(decode=True))).verify()
+            response = {'results': [
+                {'score': 0.91, 'species': {'scientificNameWithoutAuthor': 'Solanum lycopersicum',
+                                            'commonNames': ['Tomato']}},
+                {'score': 0.04, 'species': {'scientificNameWithoutAuthor': 'Solanum melongena',
+                                            'commonNames': ['Eggplant']}},
+            ]}
+        elif url.path == '/v1/chat/completions':
+            provider, delay = 'openai', OPENAI_DELAY
+            payload = json.loads(body)
+            assert self.headers['Authorization'] == 'Bearer stub-openai-key', 'OpenAI key missing'
+            image_url = payload['messages'][0]['content'][1]['image_url']['url']
+            assert image_url.startswith('data:image/jpeg;base64,'), 'image not sent as a data URL'
+            response = {'choices': [{'message': {'content': 'This is a tomato (Solanum lycopersicum). '
+                                                            'I am fairly confident.'}}]}
+        else:
+            self.send_error(404)
+            return
+
+        mode = self.modes[provider]
+        if mode == 'hang':
+            time.sleep(60)
+        time.sleep(delay)
+        if mode == 'error':
+            self.send_error(500)
+            return
+
+        payload = json.dumps(response).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def photo_file():
+    path = os.path.join(TEMP_DIR, 'tomato.jpg')
+    Image.new('RGB', (4032, 3024), (40, 140, 60)).save(path, 'JPEG')
+    return path
+
+
+def open_files():
+    return len(os.listdir('/proc/self/fd')) if os.path.isdir('/proc/self/fd') else 0
+
+
+def identify(service, image):
+    started = time.perf_counter()
+    result = service.identify_plant_species(image)
+    return result, time.perf_counter() - started
+
+
+def main():
+    server = start_stub_server()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(TEMP_DIR, 'app.db')}",
+        'IDENTIFICATION_CACHE_MAX_BYTES': '0',
+        'PLANTNET_API_KEY': 'stub-plantnet-key',
+        'PLANTNET_BASE_URL': f'{base_url}/v2',
+        'OPENAI_API_KEY': 'stub-openai-key',
+        'OPENAI_BASE_URL': f'{base_url}/v1',
+        'PLANTNET_TIMEOUT': '2',
+        'OPENAI_VISION_TIMEOUT': '3',
+    })
+
+    from app import app
+    from models import db, PlantType, User
+    from services.ai_plant_analysis import ai_plant_service
+    from services.image_preprocessing import image_preprocessor
+
+    path = photo_file()
+    image = image_preprocessor.prepare(path)
+
+    with app.app_context():
+        result, elapsed = identify(ai_plant_service, image)
+        assert result['success'] and not result['errors'], result
+        assert result['plantnet_suggestions'][0]['score'] == 0.91
+        assert 'tomato' in result['ai_analysis']
+        assert elapsed < PLANTNET_DELAY + OPENAI_DELAY - 0.2, f"providers were not queried concurrently ({elapsed:.2f}s)"
+        print(f"PlantNet ({PLANTNET_DELAY}s) + OpenAI ({OPENAI_DELAY}s) merged in {elapsed:.2f}s, "
+              f"confidence {result['confidence_score']:.2f}")
+
+        StubHandler.connections.clear()
+        served = StubHandler.requests_served
+        files_before = open_files()
+        for _ in range(5):
+            result, _ = identify(ai_plant_service, path)
+            assert result['success']
+        assert open_files() <= files_before, 'file handles leaked'
+        calls = StubHandler.requests_served - served
+        print(f"{calls} provider calls over {len(StubHandler.connections)} connections, no file handles left open")
+        assert len(StubHandler.connections) <= 2, 'connections were not reused'
+
+        StubHandler.modes['plantnet'] = 'error'
+        result, elapsed = identify(ai_plant_service, image)
+        assert result['success'] and result['ai_analysis'] and result['plantnet_suggestions'] == []
+        assert 'plantnet' in result['errors']
+        print(f"PlantNet error: vision result kept in {elapsed:.2f}s")
+
+        StubHandler.modes['plantnet'] = 'hang'
+        result, elapsed = identify(ai_plant_service, image)
+        assert result['success'] and result['ai_analysis'] and 'plantnet' in result['errors']
+        assert elapsed < ai_plant_service.plantnet_timeout + 0.5, f"PlantNet timeout not applied ({elapsed:.2f}s)"
+        print(f"PlantNet hanging: gave up after {elapsed:.2f}s ({result['errors']['plantnet']})")
+
+        StubHandler.modes.update(plantnet='ok', openai='hang')
+        result, elapsed = identify(ai_plant_service, image)
+        assert result['success'] and result['ai_analysis'] is None and result['plantnet_suggestions']
+        assert elapsed < ai_plant_service.vision_timeout + 0.5, f"vision timeout not applied ({elapsed:.2f}s)"
+        print(f"OpenAI hanging: PlantNet suggestions kept, gave up after {elapsed:.2f}s")
+        StubHandler.modes['openai'] = 'ok'
+
+        db.create_all()
+        user = User(google_id='stub', email='stub@example.com', name='Stub')
+        db.session.add_all([user, PlantType(name='Tomato', scientific_name='Solanum lycopersicum')])
+        db.session.commit()
+        user_id = user.id
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    with open(path, 'rb') as upload:
+        started = time.perf_counter()
+        response = client.post('/api/ai/identify-plant', data={'image': (upload, 'tomato.jpg')},
+                               content_type='multipart/form-data')
+        elapsed = time.perf_counter() - started
+    body = response.get_json()
+    assert response.status_code == 200, body
+    assert body['identification']['plantnet_suggestions'] and body['identification']['ai_analysis']
+    assert body['suggested_plants'][0]['name'] == 'Tomato'
+    print(f"✅ /api/ai/identify-plant returned the merged identification in {elapsed:.2f}s")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
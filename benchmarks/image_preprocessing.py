@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the upload preprocessing in front of the vision API calls.
+
+Generates typical phone photos (12 and 48 MP JPEGs with EXIF orientation and
+GPS tags, and a PNG screenshot) and prepares each one for the vision request
+two ways. The original way saves the upload to disk, reads it back and
+base64-encodes all of it. The new way decodes the upload stream with
+ImagePreprocessor. The script prints the request payload size, the time and
+the peak traced Python memory of each, checks that the prepared images are
+upright, stripped of EXIF and within the configured limits, and estimates the
+upload time of the payload. Run from the project root:
+python benchmarks/image_preprocessing.py
+"""
+
+import base64
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.image_preprocessing import image_preprocessor
+
+UPLINK_MBIT = 10  # A typical mobile or home uplink
+RUNS = 3
+
+# name, stored size (before EXIF rotation), format, EXIF orientation
+PHOTOS = [
+    ('12 MP portrait JPEG', (4032, 3024), 'JPEG', 6),
+    ('12 MP landscape JPEG', (4032, 3024), 'JPEG', 1),
+    ('48 MP JPEG', (8064, 6048), 'JPEG', 1),
+    ('screenshot PNG', (1170, 2532), 'PNG', None),
+]
+
+
+def synthetic_photo(size, image_format, orientation):
+    """A noisy gradient, which compresses about as badly as foliage does"""
+    width, height = size
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    pixels = np.stack([x + 0 * y, (x + y) / 2, y + 0 * x], axis=-1)
+    pixels += rng.normal(0, 12, pixels.shape).astype(np.float32)
+    image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), 'RGB')
+
+    buffer = io.BytesIO()
+    if image_format == 'JPEG':
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        exif[0x010F] = 'PhoneMaker'
+        exif[0x8825] = {1: 'N', 2: (40.0, 42.0, 51.0)}  # GPSInfo
+        image.save(buffer, 'JPEG', quality=92, exif=exif)
+    else:
+        image.save(buffer, image_format)
+    return buffer.getvalue()
+
+
+def upload(data, filename):
+    return FileStorage(stream=io.BytesIO(data), filename=filename)
+
+
+def original_pipeline(data, filename, folder):
+    """What the routes did before: save, read back, base64 the whole file"""
+    filepath = os.path.join(folder, filename)
+    upload(data, filename).save(filepath)
+    with open(filepath, 'rb') as image_file:
+        base64_image = base64.b64encode(image_file.read()).decode('utf-8')
+    os.remove(filepath)
+    return f'data:image/jpeg;base64,{base64_image}'
+
+
+def preprocessed_pipeline(data, filename):
+    return image_preprocessor.prepare(upload(data, filename).stream).data_url()
+
+
+def measure(function, *args):
+    """Return (result, median seconds, peak traced MB)"""
+    timings = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        result = function(*args)
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    function(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, sorted(timings)[RUNS // 2], peak / 1024 / 1024
+
+
+def check(data, expected_portrait):
+    prepared = image_preprocessor.prepare(io.BytesIO(data))
+    image = Image.open(io.BytesIO(prepared.data))
+    assert not image.getexif(), 'EXIF was not stripped'
+    assert len(prepared.data) <= image_preprocessor.max_bytes, 'prepared image is over IMAGE_MAX_BYTES'
+    assert min(image.size) <= image_preprocessor.max_short_side, 'short side over IMAGE_MAX_SHORT_SIDE'
+    assert max(image.size) <= image_preprocessor.max_long_side, 'long side over IMAGE_MAX_LONG_SIDE'
+    assert (image.height > image.width) == expected_portrait, 'EXIF orientation was not applied'
+    return image.size
+
+
+def main():
+    folder = tempfile.mkdtemp()
+    print(f"{'photo':<22} {'upload':>9} {'payload before':>15} {'payload after':>14} "
+          f"{'ms before':>10} {'ms after':>9} {'MB before':>10} {'MB after':>9} {'sent size':>10}")
+
+    for name, size, image_format, orientation in PHOTOS:
+        data = synthetic_photo(size, image_format, orientation)
+        filename = 'photo.' + image_format.lower()
+        before, time_before, memory_before = measure(original_pipeline, data, filename, folder)
+        after, time_after, memory_after = measure(preprocessed_pipeline, data, filename)
+
+        portrait = (size[1] > size[0]) != (orientation in (5, 6, 7, 8))
+        sent_size = check(data, portrait)
+        print(f"{name:<22} {len(data) / 1e6:>7.1f}MB {len(before) / 1e6:>13.2f}MB {len(after) / 1e6:>12.2f}MB "
+              f"{time_before * 1000:>10.0f} {time_after * 1000:>9.0f} {memory_before:>10.1f} {memory_after:>9.1f} "
+              f"{sent_size[0]:>5}x{sent_size[1]}")
+        print(f"{'':<22} upload of the payload at {UPLINK_MBIT} Mbit/s: "
+              f"{len(before) * 8 / UPLINK_MBIT / 1e6:.2f}s -> {len(after) * 8 / UPLINK_MBIT / 1e6:.2f}s")
+
+    print("✅ Prepared images are upright, EXIF-free and within the configured limits")
+
+
+if __name__ == '__main__':
+    main()
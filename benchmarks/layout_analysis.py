@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Benchmark for PlantDataService.analyze_garden_layout.
+
+Compares the spatial-grid and NumPy engines against the original all-pairs
+scan on random gardens and checks that all produce the same scores and
+spacing issues. Run from the project root: python benchmarks/layout_analysis.py
+(add --all to also time the all-pairs scan on 10k plants, which takes minutes).
+"""
+
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.plant_data_service import np, plant_data_service
+
+# The all-pairs scan is quadratic, skip it above this size unless asked to
+PAIRWISE_LIMIT = float('inf') if '--all' in sys.argv else 2000
+
+
+def pairwise_analysis(service, plant_positions):
+    """The original O(n²) analyser, kept here as the reference implementation"""
+    analysis = {
+        'overall_score': 0,
+        'compatibility_issues': [],
+        'benefits': [],
+        'recommendations': [],
+        'critical_warnings': []
+    }
+    
+    for i, plant1 in enumerate(plant_positions):
+        for j, plant2 in enumerate(plant_positions[i+1:], i+1):
+            distance = ((plant1['x'] - plant2['x'])**2 + (plant1['y'] - plant2['y'])**2)**0.5
+            compatibility = service.check_plant_compatibility(plant1['plant_name'], plant2['plant_name'], distance)
+            analysis['overall_score'] += compatibility['compatibility_score']
+            
+            if not compatibility['compatible']:
+                analysis['critical_warnings'].append({
+                    'plant1': plant1['plant_name'],
+                    'plant2': plant2['plant_name'],
+                    'distance': distance,
+                    'issues': compatibility['warnings']
+                })
+            
+            analysis['compatibility_issues'].extend([
+                {'plant1': plant1['plant_name'], 'plant2': plant2['plant_name'], 'issue': issue}
+                for issue in compatibility['spacing_issues']
+            ])
+            analysis['benefits'].extend([
+                {'plant1': plant1['plant_name'], 'plant2': plant2['plant_name'], 'benefit': benefit}
+                for benefit in compatibility['benefits']
+            ])
+    
+    if analysis['critical_warnings']:
+        analysis['recommendations'].append("Consider relocating incompatible plants")
+    if analysis['compatibility_issues']:
+        analysis['recommendations'].append("Increase spacing between overcrowded plants")
+    if analysis['overall_score'] > 5:
+        analysis['recommendations'].append("Great plant combinations! Your garden layout promotes healthy growth")
+    
+    return analysis
+
+
+def random_garden(size, names, seed=0):
+    """Scatter plants at roughly one plant per 2 square feet"""
+    rng = random.Random(seed)
+    side = (size * 288) ** 0.5  # inches
+    return [
+        {
+            'plant_name': rng.choice(names),
+            'x': rng.uniform(0, side),
+            'y': rng.uniform(0, side),
+            'id': str(i)
+        }
+        for i in range(size)
+    ]
+
+
+def engines():
+    return ['grid', 'numpy'] if np is not None else ['grid']
+
+
+def timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def check_small_gardens(service):
+    """Gardens with unique plant names must match the original output exactly"""
+    names = list(service.companion_data)
+    for seed in range(20):
+        positions = random_garden(len(names), names, seed)
+        random.Random(seed).shuffle(names)
+        for plant, name in zip(positions, names):
+            plant['plant_name'] = name
+        
+        expected = pairwise_analysis(service, positions)
+        for engine in engines():
+            actual = service.analyze_garden_layout(positions, engine=engine)
+            for item in actual['critical_warnings'] + actual['benefits']:
+                item.pop('count')
+            assert actual == expected, f"{engine} layout analysis differs for seed {seed}"
+    print("✅ Results match the all-pairs analyser on small gardens")
+
+
+def main():
+    service = plant_data_service
+    names = list(service.companion_data) + ['Sunflower', 'Zinnia']
+    check_small_gardens(service)
+    
+    print(f"{'plants':>8} {'all-pairs':>12}" + ''.join(f"{engine:>10}" for engine in engines()))
+    for size in (100, 1000, 10000):
+        positions = random_garden(size, names, seed=size)
+        row = f"{size:>8}"
+        
+        expected = None
+        if size <= PAIRWISE_LIMIT:
+            expected, pairwise_time = timed(pairwise_analysis, service, positions)
+            row += f" {pairwise_time:>11.3f}s"
+        else:
+            row += f" {'skipped':>12}"
+        
+        for engine in engines():
+            result, engine_time = timed(service.analyze_garden_layout, positions, engine=engine)
+            expected = expected or result
+            assert result['overall_score'] == expected['overall_score']
+            assert result['compatibility_issues'] == expected['compatibility_issues']
+            row += f" {engine_time:>8.3f}s"
+        print(row)
+
+if __name__ == '__main__':
+    main()
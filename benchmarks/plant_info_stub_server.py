@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Local stubs of the Perenual and Trefle APIs for checking the plant info cache offline.
+
+Serves Perenual /species-list and /species/details and Trefle /plants/search
+with a configurable delay, then checks /api/plants/external-info and the
+cache behind it:
+- The first lookup of a species calls the APIs; later ones, under any
+  spelling of the name, answer from the cache without calls.
+- Unknown names are cached as misses.
+- Stale info is served at once while a single background refresh runs.
+- Expired info is still served when the APIs are down.
+- prefetch_plant_info.py warms the cache for every plant type.
+Run from the project root: python benchmarks/plant_info_stub_server.py
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+RESPONSE_DELAY = 0.2  # Seconds each stub call takes to answer
+TEMP_DIR = tempfile.mkdtemp()
+SPECIES = {
+    'tomato': (1, 'Solanum lycopersicum', 'Solanaceae'),
+    'basil': (2, 'Ocimum basilicum', 'Lamiaceae'),
+    'carrot': (3, 'Daucus carota', 'Apiaceae'),
+    'cherry tomato': (4, 'Solanum lycopersicum var. cerasiforme', 'Solanaceae'),
+}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    down = False
+    rate_limited = 0  # Answer 429 with this Retry-After when set
+    calls = Counter()  # Calls per provider
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {name: values[0] for name, values in parse_qs(url.query).items()}
+        provider = url.path.split('/')[1]
+        StubHandler.calls[provider] += 1
+        time.sleep(RESPONSE_DELAY)
+        if self.down:
+            self.send_error(503)
+            return
+        if self.rate_limited:
+            self.send_response(429)
+            self.send_header('Retry-After', str(self.rate_limited))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        species = SPECIES.get(query.get('q', '').lower())
+        if url.path == '/perenual/species-list':
+            assert query.get('key') == 'stub-perenual-key', 'Perenual key missing'
+            data = [{'id': species[0], 'scientific_name': [species[1]], 'common_name': query['q'],
+                     'cycle': 'Annual', 'watering': 'Frequent', 'sunlight': ['full sun']}] if species else []
+            body = {'data': data}
+        elif url.path.startswith('/perenual/species/details/'):
+            body = {'care_level': 'Medium', 'growth_rate': 'High', 'hardiness': {'min': '10', 'max': '12'},
+                    'propagation': ['Seed'], 'pruning_month': ['July']}
+        elif url.path == '/trefle/plants/search':
+            assert query.get('token') == 'stub-trefle-key', 'Trefle token missing'
+            data = [{'scientific_name': species[1], 'family': species[2], 'genus': species[1].split()[0],
+                     'rank': 'species'}] if species else []
+            body = {'data': data}
+        else:
+            self.send_error(404)
+            return
+
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def logged_in_client(app, user_id):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client
+
+
+def lookup(client, name):
+    """Calls the route, returning its plant info, the API calls it made and its duration"""
+    before = sum(StubHandler.calls.values())
+    started = time.perf_counter()
+    response = client.get(f'/api/plants/external-info/{name}')
+    elapsed = time.perf_counter() - started
+    body = response.get_json()
+    assert response.status_code == 200 and body['success'], body
+    return body['plant_info'], sum(StubHandler.calls.values()) - before, elapsed
+
+
+def wait_for_calls(count, timeout=5):
+    deadline = time.monotonic() + timeout
+    while sum(StubHandler.calls.values()) < count and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+
+def main():
+    server = start_stub_server()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(TEMP_DIR, 'app.db')}",
+        'PERENUAL_API_KEY': 'stub-perenual-key',
+        'PERENUAL_BASE_URL': f'{base_url}/perenual',
+        'TREFLE_API_KEY': 'stub-trefle-key',
+        'TREFLE_BASE_URL': f'{base_url}/trefle',
+        'HTTP_PERENUAL_RETRIES': '0',  # Fail fast while the stub is down
+        'HTTP_TREFLE_RETRIES': '0',
+    })
+
+    from app import app
+    from models import db, ExternalPlantInfo, PlantType, User
+
+    with app.app_context():
+        db.create_all()
+        user = User(google_id='stub', email='stub@example.com', name='Stub')
+        db.session.add(user)
+        db.session.add_all(PlantType(name=name.title()) for name in ('Tomato', 'Basil', 'Carrot', 'Mandrake'))
+        db.session.commit()
+        user_id = user.id
+
+    client = logged_in_client(app, user_id)
+
+    info, calls, cold = lookup(client, 'Tomato')
+    assert calls == 3 and info['api_sources'] == ['perenual', 'trefle'], (calls, info)
+    assert info['family'] == 'Solanaceae' and info['care_level'] == 'Medium'
+    info, calls, warm = lookup(client, '  tomato ')
+    assert calls == 0 and info['family'] == 'Solanaceae', 'the cache was not used'
+    print(f"tomato: {cold * 1000:.0f} ms with 3 API calls, then {warm * 1000:.1f} ms from the cache")
+
+    _, calls, _ = lookup(client, 'cherry_tomato')
+    _, calls_again, _ = lookup(client, 'Cherry Tomato')
+    assert calls == 3 and calls_again == 0, 'spellings of one name were cached separately'
+    info, calls, _ = lookup(client, 'Mandrake')
+    assert calls == 2 and info['api_sources'] == [] and 'family' not in info, (calls, info)
+    _, calls, _ = lookup(client, 'mandrake')
+    assert calls == 0, 'the unknown name was not cached'
+    print("unknown name cached as a miss, name spellings share one entry")
+
+    with app.app_context():
+        entry = db.session.get(ExternalPlantInfo, 'tomato')
+        entry.fresh_until = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+    served = sum(StubHandler.calls.values())
+    results = []
+    clients = [logged_in_client(app, user_id) for _ in range(4)]
+    threads = [threading.Thread(target=lambda c=c: results.append(lookup(c, 'Tomato'))) for c in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wait_for_calls(served + 3)
+    time.sleep(RESPONSE_DELAY)
+    slowest = max(elapsed for _, _, elapsed in results)
+    refresh_calls = sum(StubHandler.calls.values()) - served
+    with app.app_context():
+        entry = db.session.get(ExternalPlantInfo, 'tomato')
+        assert entry.fresh_until > datetime.utcnow() and entry.refreshing_until is None, 'stale entry not refreshed'
+    assert len(results) == 4 and refresh_calls == 3, f"{refresh_calls} API calls for one refresh"
+    assert slowest < RESPONSE_DELAY, f"a request waited for the refresh ({slowest:.2f}s)"
+    print(f"stale tomato served to 4 concurrent requests within {slowest * 1000:.0f} ms, "
+          f"one background refresh ({refresh_calls} API calls)")
+
+    lookup(client, 'Basil')
+    with app.app_context():
+        entry = db.session.get(ExternalPlantInfo, 'basil')
+        entry.fresh_until = entry.stale_until = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+    StubHandler.down = True
+    info, calls, _ = lookup(client, 'Basil')
+    assert calls > 0 and info['family'] == 'Lamiaceae', 'expired info not served while the APIs are down'
+    info, _, _ = lookup(client, 'Peppers')
+    assert info['api_sources'] == [] and info['companion_planting'], 'local data missing while the APIs are down'
+    StubHandler.down = False
+    print("APIs down: expired basil info served, uncached peppers answered from local companion data")
+
+    before = sum(StubHandler.calls.values())
+    result = subprocess.run([sys.executable, 'prefetch_plant_info.py'], cwd=ROOT, env=os.environ,
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stdout + result.stderr
+    print(f"prefetch_plant_info.py: {result.stdout.strip().splitlines()[-1]}")
+    prefetch_calls = sum(StubHandler.calls.values()) - before
+    info, calls, _ = lookup(client, 'Carrot')
+    assert calls == 0 and info['family'] == 'Apiaceae', 'carrot was not prefetched'
+    print(f"✅ prefetch made {prefetch_calls} API calls, carrot then answered from the cache")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
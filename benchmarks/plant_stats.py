@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Check the materialised plant counters behind /api/plants/stats.
+
+Fills a temporary SQLite database with plants added outside the handlers, so
+the user has no plant_stats row yet, like every user from before migration
+0004. The first change of each kind (status change, create, delete) must
+then build the row with that change included. A mix of creates, updates
+and deletes must leave the counters equal to a recount from the plant
+table, and reading the stats must take one query once the row exists.
+Run from the project root: python benchmarks/plant_stats.py
+"""
+
+import os
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+DATABASE_PATH = os.path.join(tempfile.mkdtemp(), 'plant_stats.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{DATABASE_PATH}'
+
+from sqlalchemy import event
+
+from app import app
+from models import db, User, PlantType, Plant, PlantStats
+from services.plant_stats import STATUS_COLUMNS, plant_stats_counters
+
+STATUSES = list(STATUS_COLUMNS)
+CHANGES = 200
+
+
+def create_user(name, statuses):
+    """A user whose plants were inserted directly, without a plant_stats row"""
+    user = User(google_id=name, email=f'{name}@example.com', name=name)
+    db.session.add(user)
+    db.session.flush()
+    plant_type = PlantType.query.first()
+    db.session.add_all([Plant(user_id=user.id, plant_type_id=plant_type.id, status=status) for status in statuses])
+    db.session.commit()
+    return user.id, [plant.id for plant in Plant.query.filter_by(user_id=user.id).order_by(Plant.id)]
+
+
+def logged_in_client(user_id):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client
+
+
+def stats(client, recount=False):
+    response = client.get('/api/plants/stats' + ('?recount=true' if recount else ''))
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def assert_counted(client, user_id, what):
+    with app.app_context():
+        assert db.session.get(PlantStats, user_id) is not None, f'{what}: no plant_stats row created'
+    counted, recounted = stats(client), stats(client, recount=True)
+    assert counted == recounted, f'{what}: counters {counted} differ from the plant table {recounted}'
+
+
+def main():
+    with app.app_context():
+        db.create_all()
+        db.session.add(PlantType(name='Tomato'))
+        db.session.commit()
+        users = {change: create_user(change, ['planned', 'planned', 'growing'])
+                 for change in ('status', 'create', 'delete')}
+        mixed_user, mixed_plants = create_user('mixed', [random.choice(STATUSES) for _ in range(20)])
+        plant_type_id = PlantType.query.first().id
+
+    # First change of each kind for users without counters
+    user_id, plant_ids = users['status']
+    client = logged_in_client(user_id)
+    assert client.put(f'/api/plants/{plant_ids[0]}', json={'status': 'growing'}).status_code == 200
+    assert_counted(client, user_id, 'first status change')
+    assert stats(client)['growing_plants'] == 2
+
+    user_id, _ = users['create']
+    client = logged_in_client(user_id)
+    assert client.post('/api/plants', json={'plant_type_id': plant_type_id, 'status': 'planted'}).status_code == 201
+    assert_counted(client, user_id, 'first create')
+
+    user_id, plant_ids = users['delete']
+    client = logged_in_client(user_id)
+    assert client.delete(f'/api/plants/{plant_ids[-1]}').status_code == 200
+    assert_counted(client, user_id, 'first delete')
+    print("first status change, create and delete without a plant_stats row are counted")
+
+    client = logged_in_client(mixed_user)
+    random.seed(18)
+    for _ in range(CHANGES):
+        action = random.random()
+        if action < 0.3 or not mixed_plants:
+            response = client.post('/api/plants', json={'plant_type_id': plant_type_id,
+                                                        'status': random.choice(STATUSES)})
+            mixed_plants.append(response.get_json()['id'])
+        elif action < 0.8:
+            client.put(f'/api/plants/{random.choice(mixed_plants)}', json={'status': random.choice(STATUSES)})
+        else:
+            client.delete(f'/api/plants/{mixed_plants.pop(random.randrange(len(mixed_plants)))}')
+    assert_counted(client, mixed_user, f'{CHANGES} random changes')
+
+    queries = []
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: queries.append(args))
+    counted = stats(client)
+    print(f"{CHANGES} random changes: counters match the plant table {counted}")
+    # The logged-in user and the counters row
+    assert len(queries) <= 2, f'reading the stats took {len(queries)} queries'
+    print(f"✅ stats read in {len(queries)} queries, including loading the logged-in user")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Checks for the shared token buckets in front of the Perenual and Trefle APIs.
+
+- Several processes drawing from one bucket get no more tokens in total than
+  its capacity plus what it refills, since the bucket lives in the database.
+- Calls queue for tokens still to come within their deadline, and a call
+  that would wait longer is refused at once.
+- With the stub APIs from plant_info_stub_server.py: a used up Perenual quota
+  makes /api/plants/external-info answer without calling Perenual, from
+  Trefle, cached or local data. A 429 with a long Retry-After is not retried
+  and pauses further calls.
+Run from the project root: python benchmarks/rate_limiter.py
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from plant_info_stub_server import RESPONSE_DELAY, StubHandler, logged_in_client, lookup, start_stub_server
+
+TEMP_DIR = tempfile.mkdtemp()
+PROCESSES = 4
+CAPACITY = 10
+PER_SECOND = 10
+DURATION = 2.0
+
+
+def draw_tokens(ready, go, results):
+    """Once all workers are ready, take tokens without waiting for DURATION, counting the granted ones"""
+    from app import app
+    from services.rate_limiter import RateLimitExceeded, rate_limiter
+
+    rate_limiter.configure('bench', f'{CAPACITY}/second')
+    granted = 0
+    with app.app_context():
+        ready.put(True)
+        go.wait()
+        started = time.time()
+        while time.time() < started + DURATION:
+            try:
+                rate_limiter.reserve('bench', max_wait=0)
+                granted += 1
+            except RateLimitExceeded:
+                time.sleep(0.005)
+    results.put(granted)
+
+
+def main():
+    server = start_stub_server()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(TEMP_DIR, 'app.db')}",
+        'PERENUAL_API_KEY': 'stub-perenual-key',
+        'PERENUAL_BASE_URL': f'{base_url}/perenual',
+        'TREFLE_API_KEY': 'stub-trefle-key',
+        'TREFLE_BASE_URL': f'{base_url}/trefle',
+        'PERENUAL_RATE_LIMIT': '2/hour',  # One lookup: a search and a details call
+        'TREFLE_RATE_LIMIT': '120/minute',
+    })
+
+    from app import app
+    from models import db, ExternalPlantInfo, User
+    from services.rate_limiter import RateLimitExceeded, rate_limiter
+
+    with app.app_context():
+        db.create_all()
+        user = User(google_id='limits', email='limits@example.com', name='Limits')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    context = multiprocessing.get_context('spawn')
+    ready, go, results = context.Queue(), context.Event(), context.Queue()
+    workers = [context.Process(target=draw_tokens, args=(ready, go, results)) for _ in range(PROCESSES)]
+    for worker in workers:
+        worker.start()
+    for _ in workers:
+        ready.get()  # Importing the app takes a while
+    go.set()
+    granted = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    allowed = CAPACITY + PER_SECOND * DURATION
+    print(f"{PROCESSES} processes drew {sum(granted)} tokens {granted} in {DURATION:.0f}s, "
+          f"the bucket allows {allowed:.0f}")
+    assert allowed - 2 <= sum(granted) <= allowed + 1, 'processes did not share the bucket'
+
+    with app.app_context():
+        rate_limiter.configure('queue', '2/second')
+        delays = [rate_limiter.reserve('queue', max_wait=1) for _ in range(4)]
+        assert delays[:2] == [0, 0] and 0.4 < delays[2] < 0.6 and 0.9 < delays[3] < 1.1, delays
+        started = time.perf_counter()
+        try:
+            rate_limiter.reserve('queue', max_wait=1)
+            raise AssertionError('a call past its deadline was queued')
+        except RateLimitExceeded as e:
+            refused_ms = (time.perf_counter() - started) * 1000
+            reason = str(e)
+        print(f"queued calls wait {', '.join(f'{delay:.2f}s' for delay in delays)}; "
+              f"one past the 1s deadline refused in {refused_ms:.1f} ms ({reason})")
+
+    client = logged_in_client(app, user_id)
+    info, calls, _ = lookup(client, 'Tomato')
+    assert StubHandler.calls['perenual'] == 2 and info['api_sources'] == ['perenual', 'trefle']
+
+    info, calls, elapsed = lookup(client, 'Basil')
+    assert StubHandler.calls['perenual'] == 2, 'Perenual was called over its quota'
+    assert info['api_sources'] == ['trefle'] and info['api_errors'] == ['perenual'], info
+    assert elapsed < 2 * RESPONSE_DELAY, f"waited on the used up quota ({elapsed:.2f}s)"
+    print(f"Perenual quota used up: basil answered from Trefle in {elapsed * 1000:.0f} ms, Perenual not called")
+
+    with app.app_context():
+        entry = db.session.get(ExternalPlantInfo, 'tomato')
+        entry.fresh_until = entry.stale_until = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+    rate_limiter.configure('trefle', '1/hour')
+    with app.app_context():
+        rate_limiter.reserve('trefle', max_wait=0)  # Use up the new, smaller quota
+    before = sum(StubHandler.calls.values())
+    info, _, elapsed = lookup(client, 'Tomato')
+    assert sum(StubHandler.calls.values()) == before and info['care_level'] == 'Medium', info
+    info, _, _ = lookup(client, 'Peppers')
+    assert info['api_sources'] == [] and info['companion_planting'] and sum(StubHandler.calls.values()) == before
+    print(f"both quotas used up: expired tomato info served in {elapsed * 1000:.0f} ms, "
+          "peppers from local companion data, no API calls")
+
+    rate_limiter.configure('trefle', '120/minute')
+    with app.app_context():
+        db.session.execute(db.text("UPDATE rate_limit_bucket SET tokens = 120 WHERE provider = 'trefle'"))
+        db.session.commit()
+    StubHandler.rate_limited = 3600
+    before = StubHandler.calls['trefle']
+    info, _, elapsed = lookup(client, 'Carrot')
+    assert StubHandler.calls['trefle'] == before + 1, 'a 429 with a long Retry-After was retried'
+    info, _, _ = lookup(client, 'Lettuce')
+    assert StubHandler.calls['trefle'] == before + 1, 'called Trefle again after its 429'
+    with app.app_context():
+        tokens = rate_limiter.stats()['trefle']['tokens']
+    print(f"✅ Trefle 429 (Retry-After 3600): answered in {elapsed * 1000:.0f} ms without retrying, "
+          f"further calls paused ({tokens:.0f} tokens)")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Local stub of the OpenWeather endpoints for checking GardenScheduler.get_weather_data offline.
+
+Serves /weather and /forecast with a configurable delay and points the
+scheduler at it, then checks that both calls run concurrently, that the
+responses are parsed, and that a hanging endpoint falls back to mock data
+within the configured timeout. Also checks the weather cache: nearby
+coordinates and concurrent misses share one fetch. Run from the project root:
+python benchmarks/weather_stub_server.py
+
+The stub can also be left running for manual testing with --serve, then start
+the app with OPENWEATHER_BASE_URL=http://127.0.0.1:8765 and any
+OPENWEATHER_API_KEY.
+"""
+
+import asyncio
+import json
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.garden_scheduler import GardenScheduler
+from services.weather_cache import MemoryWeatherBackend, SQLiteWeatherBackend, weather_cache
+
+RESPONSE_DELAY = 0.5  # Seconds each endpoint takes to answer
+
+
+def current_weather():
+    return {
+        'main': {'temp': 18.5, 'humidity': 71},
+        'weather': [{'description': 'light rain'}],
+        'rain': {'1h': 0.4}
+    }
+
+
+def forecast():
+    start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    return {
+        'list': [
+            {
+                'dt': int((start + timedelta(hours=3 * i)).timestamp()),
+                'main': {'temp': 15 + i % 8, 'humidity': 60},
+                'rain': {'3h': 1.5} if i % 4 == 0 else {}
+            }
+            for i in range(40)  # 5 days in 3 hour steps, like the real API
+        ]
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    delay = RESPONSE_DELAY
+    requests_served = 0
+
+    def do_GET(self):
+        StubHandler.requests_served += 1
+        path = urlparse(self.path).path.rstrip('/')
+        if path.startswith('/hang/'):
+            time.sleep(60)
+
+        time.sleep(self.delay)
+        if path.endswith('/weather'):
+            body = current_weather()
+        elif path.endswith('/forecast'):
+            body = forecast()
+        else:
+            self.send_error(404)
+            return
+
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(port=0):
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def stub_scheduler(base_url, read_timeout=10):
+    scheduler = GardenScheduler()
+    scheduler.weather_api_key = 'stub-key'
+    scheduler.weather_base_url = base_url
+    scheduler.weather_timeout = (1, read_timeout)
+    return scheduler
+
+
+def main():
+    if '--serve' in sys.argv:
+        server = start_stub_server(8765)
+        print(f"OpenWeather stub listening on http://127.0.0.1:{server.server_port}")
+        threading.Event().wait()
+
+    server = start_stub_server()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    scheduler = stub_scheduler(base_url)
+    start = time.perf_counter()
+    weather = asyncio.run(scheduler.get_weather_data(52.5, 13.4))
+    elapsed = time.perf_counter() - start
+
+    assert weather['current']['description'] == 'light rain', weather['current']
+    assert len(weather['forecast']) == 5, weather['forecast']
+    assert elapsed < 2 * RESPONSE_DELAY, f"calls were not concurrent ({elapsed:.2f}s)"
+    print(f"current + forecast in {elapsed:.2f}s (each endpoint takes {RESPONSE_DELAY}s)")
+
+    # Nearby coordinates hit the cache, from another event loop as each request handler runs its own
+    served = StubHandler.requests_served
+    start = time.perf_counter()
+    cached = asyncio.run(scheduler.get_weather_data(52.51, 13.41))
+    assert cached == weather and StubHandler.requests_served == served
+    print(f"nearby plot served from cache in {time.perf_counter() - start:.4f}s")
+
+    # Concurrent misses for one grid cell share a single fetch
+    async def concurrent_misses():
+        return await asyncio.gather(*(scheduler.get_weather_data(48.1, 11.6) for _ in range(10)))
+
+    served = StubHandler.requests_served
+    results = asyncio.run(concurrent_misses())
+    assert all(result == results[0] for result in results)
+    assert StubHandler.requests_served - served == 2, StubHandler.requests_served - served
+    print("10 concurrent misses made 2 API calls")
+
+    # Same for the SQLite backend, read back by a fresh cache
+    with tempfile.TemporaryDirectory() as directory:
+        weather_cache.backend = SQLiteWeatherBackend(str(Path(directory) / 'weather.db'))
+        weather = asyncio.run(scheduler.get_weather_data(40.7, -74.0))
+        weather_cache.backend = SQLiteWeatherBackend(str(Path(directory) / 'weather.db'))
+        served = StubHandler.requests_served
+        assert asyncio.run(scheduler.get_weather_data(40.7, -74.0)) == weather
+        assert StubHandler.requests_served == served
+        print("SQLite backend round trip ok")
+    weather_cache.backend = MemoryWeatherBackend()
+
+    # A hanging endpoint falls back to mock data after the read timeout
+    scheduler = stub_scheduler(f"{base_url}/hang", read_timeout=1)
+    start = time.perf_counter()
+    weather = asyncio.run(scheduler.get_weather_data(35.7, 139.7))
+    elapsed = time.perf_counter() - start
+    assert weather == scheduler._get_mock_weather_data(), weather
+    assert elapsed < 3, f"timeout was not applied ({elapsed:.2f}s)"
+    print(f"hanging endpoint fell back to mock data in {elapsed:.2f}s")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -906,13 +906,13 @@ const GardenLayoutFixed = () => {
                          </Typography>
                          
                          {/* Show Plants in Plot */}
-                         {plot.plant_placements && plot.plant_placements.length > 0 && (
+                         {plot.plant_count > 0 && (
                            <Box mt={2}>
                              <Typography variant="caption" color="text.secondary" fontWeight="bold">
                                Plants in this plot ({plot.plant_count}):
                              </Typography>
                              <Box display="flex" flexWrap="wrap" gap={0.5} mt={0.5}>
-                               {plot.plant_placements.map((placement) => (
+                               {plantPlacements.filter((placement) => placement.plot_id === plot.id).map((placement) => (
                                  <Chip
                                    key={placement.id}
                                    label={`${placement.plant_icon} ${placement.plant_name}`}
@@ -152,6 +152,24 @@ const SmartGardenCalendar = () => {
     }
   };
 
+  // Schedule generation and Google sync run as background jobs, poll until they finish
+  const waitForJob = async (jobId) => {
+    while (true) {
+      const response = await fetch(`/api/jobs/${jobId}`, {
+        credentials: 'include'
+      });
+      const job = await response.json();
+      
+      if (job.status === 'succeeded') {
+        return job.result;
+      }
+      if (job.status === 'failed' || !response.ok) {
+        return { success: false, error: job.error || 'Background job failed' };
+      }
+      await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+  };
+
   const generateSmartSchedule = async () => {
     setScheduleGenerating(true);
     try {
@@ -159,7 +177,8 @@ const SmartGardenCalendar = () => {
         method: 'POST',
         credentials: 'include'
       });
-      const data = await response.json();
+      const queued = await response.json();
+      const data = queued.success ? await waitForJob(queued.job_id) : queued;
       
       if (data.success) {
         setLastGenerated(new Date());
@@ -232,7 +251,8 @@ const SmartGardenCalendar = () => {
         method: 'POST',
         credentials: 'include'
       });
-      const data = await response.json();
+      const queued = await response.json();
+      const data = queued.success ? await waitForJob(queued.job_id) : queued;
       
       if (data.success) {
         setGoogleSyncDialogOpen(false);
@@ -0,0 +1,48 @@
+"""Alembic environment running migrations against the Flask app's database"""
+
+from logging.config import fileConfig
+
+from alembic import context
+
+from app import app
+from models import db
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = db.metadata
+
+
+def run_migrations_offline() -> None:
+    """Emit the migration SQL without connecting (alembic upgrade head --sql)"""
+    context.configure(
+        url=app.config['SQLALCHEMY_DATABASE_URI'],
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={'paramstyle': 'named'},
+        transaction_per_migration=True
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    with app.app_context():
+        with db.engine.connect() as connection:
+            context.configure(
+                connection=connection,
+                target_metadata=target_metadata,
+                # SQLite can only alter tables by copying them
+                render_as_batch=connection.dialect.name == 'sqlite',
+                # Commit after each revision, so a failed one leaves the earlier ones applied
+                transaction_per_migration=True
+            )
+            with context.begin_transaction():
+                context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
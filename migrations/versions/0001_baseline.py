@@ -0,0 +1,193 @@
+"""Baseline schema: the tables db.create_all() created before migrations existed
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+
+Databases created with db.create_all() already have these tables; they are
+skipped, so `alembic upgrade head` adopts such a database without stamping.
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def has_table(name: str) -> bool:
+    if context.is_offline_mode():
+        return False
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade() -> None:
+    if not has_table('plant_type'):
+        op.create_table('plant_type',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(length=100), nullable=False),
+            sa.Column('scientific_name', sa.String(length=100), nullable=True),
+            sa.Column('category', sa.String(length=50), nullable=True),
+            sa.Column('planting_season', sa.String(length=50), nullable=True),
+            sa.Column('days_to_harvest', sa.Integer(), nullable=True),
+            sa.Column('spacing_inches', sa.Integer(), nullable=True),
+            sa.Column('sun_requirement', sa.String(length=20), nullable=True),
+            sa.Column('water_requirement', sa.String(length=20), nullable=True),
+            sa.Column('description', sa.Text(), nullable=True),
+            sa.Column('care_instructions', sa.Text(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+    if not has_table('user'):
+        op.create_table('user',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('google_id', sa.String(length=100), nullable=False),
+            sa.Column('email', sa.String(length=100), nullable=False),
+            sa.Column('name', sa.String(length=100), nullable=False),
+            sa.Column('picture', sa.String(length=200), nullable=True),
+            sa.Column('google_credentials', sa.Text(), nullable=True),
+            sa.Column('calendar_enabled', sa.Boolean(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('email'),
+            sa.UniqueConstraint('google_id')
+        )
+    if not has_table('garden_location'):
+        op.create_table('garden_location',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(length=200), nullable=True),
+            sa.Column('latitude', sa.Float(), nullable=False),
+            sa.Column('longitude', sa.Float(), nullable=False),
+            sa.Column('address', sa.String(length=500), nullable=True),
+            sa.Column('zip_code', sa.String(length=20), nullable=True),
+            sa.Column('climate_zone', sa.String(length=50), nullable=True),
+            sa.Column('soil_type', sa.String(length=100), nullable=True),
+            sa.Column('notes', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+    if not has_table('plant'):
+        op.create_table('plant',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('plant_type_id', sa.Integer(), nullable=False),
+            sa.Column('custom_name', sa.String(length=100), nullable=True),
+            sa.Column('planted_date', sa.Date(), nullable=True),
+            sa.Column('expected_harvest_date', sa.Date(), nullable=True),
+            sa.Column('actual_harvest_date', sa.Date(), nullable=True),
+            sa.Column('status', sa.String(length=20), nullable=True),
+            sa.Column('notes', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['plant_type_id'], ['plant_type.id']),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+    if not has_table('calendar_event'):
+        op.create_table('calendar_event',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('plant_id', sa.Integer(), nullable=True),
+            sa.Column('title', sa.String(length=200), nullable=False),
+            sa.Column('description', sa.Text(), nullable=True),
+            sa.Column('event_date', sa.Date(), nullable=False),
+            sa.Column('event_type', sa.String(length=50), nullable=True),
+            sa.Column('completed', sa.Boolean(), nullable=True),
+            sa.Column('reminder_sent', sa.Boolean(), nullable=True),
+            sa.Column('google_event_id', sa.String(length=200), nullable=True),
+            sa.Column('google_calendar_id', sa.String(length=200), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['plant_id'], ['plant.id']),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+    if not has_table('garden_plot'):
+        op.create_table('garden_plot',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('plant_id', sa.Integer(), nullable=True),
+            sa.Column('name', sa.String(length=100), nullable=False),
+            sa.Column('x_position', sa.Float(), nullable=False),
+            sa.Column('y_position', sa.Float(), nullable=False),
+            sa.Column('width', sa.Float(), nullable=True),
+            sa.Column('height', sa.Float(), nullable=True),
+            sa.Column('soil_type', sa.String(length=50), nullable=True),
+            sa.Column('sun_exposure', sa.String(length=20), nullable=True),
+            sa.Column('notes', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['plant_id'], ['plant.id']),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+    if not has_table('plot_area'):
+        op.create_table('plot_area',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('garden_location_id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(length=200), nullable=True),
+            sa.Column('plot_type', sa.String(length=50), nullable=True),
+            sa.Column('coordinates', sa.JSON(), nullable=True),
+            sa.Column('center_x', sa.Float(), nullable=True),
+            sa.Column('center_y', sa.Float(), nullable=True),
+            sa.Column('width', sa.Float(), nullable=True),
+            sa.Column('height', sa.Float(), nullable=True),
+            sa.Column('soil_quality', sa.String(length=50), nullable=True),
+            sa.Column('sun_exposure', sa.String(length=50), nullable=True),
+            sa.Column('irrigation_type', sa.String(length=50), nullable=True),
+            sa.Column('notes', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['garden_location_id'], ['garden_location.id']),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+    if not has_table('plant_placement'):
+        op.create_table('plant_placement',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('plant_id', sa.Integer(), nullable=False),
+            sa.Column('plot_id', sa.Integer(), nullable=False),
+            sa.Column('x_position', sa.Float(), nullable=False),
+            sa.Column('y_position', sa.Float(), nullable=False),
+            sa.Column('planted_date', sa.Date(), nullable=True),
+            sa.Column('removed_date', sa.Date(), nullable=True),
+            sa.Column('notes', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['plant_id'], ['plant.id']),
+            sa.ForeignKeyConstraint(['plot_id'], ['plot_area.id']),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+    if not has_table('plant_journal'):
+        op.create_table('plant_journal',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('plant_id', sa.Integer(), nullable=False),
+            sa.Column('placement_id', sa.Integer(), nullable=True),
+            sa.Column('entry_date', sa.Date(), nullable=False),
+            sa.Column('entry_type', sa.String(length=50), nullable=True),
+            sa.Column('title', sa.String(length=200), nullable=True),
+            sa.Column('content', sa.Text(), nullable=False),
+            sa.Column('mood', sa.String(length=20), nullable=True),
+            sa.Column('weather', sa.String(length=100), nullable=True),
+            sa.Column('temperature', sa.Float(), nullable=True),
+            sa.Column('photos', sa.JSON(), nullable=True),
+            sa.Column('tags', sa.JSON(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['placement_id'], ['plant_placement.id']),
+            sa.ForeignKeyConstraint(['plant_id'], ['plant.id']),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+
+
+def downgrade() -> None:
+    for table in ('plant_journal', 'plant_placement', 'plot_area', 'garden_plot', 'calendar_event',
+                  'plant', 'garden_location', 'user', 'plant_type'):
+        op.drop_table(table)
@@ -0,0 +1,106 @@
+"""Layout analysis cache, calendar sync state and background jobs
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+
+Adds the layout_analysis and job tables, the generated-event flag and Google
+sync state of calendar events and plots, and the partial unique indexes that
+deduplicate generated events and queued jobs. Objects that already exist
+(databases created with db.create_all()) are skipped.
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def has_table(name: str) -> bool:
+    if context.is_offline_mode():
+        return False
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def has_column(table: str, column: str) -> bool:
+    if context.is_offline_mode():
+        return False
+    return column in {item['name'] for item in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade() -> None:
+    if not has_table('layout_analysis'):
+        op.create_table('layout_analysis',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('compatibility_version', sa.String(length=20), nullable=True),
+            sa.Column('state', sa.JSON(), nullable=True),
+            sa.Column('analysis', sa.JSON(), nullable=True),
+            sa.Column('total_plants', sa.Integer(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('user_id')
+        )
+    
+    # Constant defaults fill existing rows without rewriting the table on Postgres 11+;
+    # events from before delta sync are pushed once more
+    if not has_column('calendar_event', 'auto_generated'):
+        op.add_column('calendar_event', sa.Column('auto_generated', sa.Boolean(), nullable=True, server_default=sa.false()))
+    if not has_column('calendar_event', 'google_sync_pending'):
+        op.add_column('calendar_event', sa.Column('google_sync_pending', sa.Boolean(), nullable=True, server_default=sa.true()))
+    if not has_column('plot_area', 'google_calendar_id'):
+        op.add_column('plot_area', sa.Column('google_calendar_id', sa.String(length=200), nullable=True))
+    if not has_column('plot_area', 'google_sync_token'):
+        op.add_column('plot_area', sa.Column('google_sync_token', sa.String(length=500), nullable=True))
+    
+    if not has_table('job'):
+        op.create_table('job',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('kind', sa.String(length=50), nullable=False),
+            sa.Column('status', sa.String(length=20), nullable=True),
+            sa.Column('payload', sa.JSON(), nullable=True),
+            sa.Column('result', sa.JSON(), nullable=True),
+            sa.Column('error', sa.Text(), nullable=True),
+            sa.Column('attempts', sa.Integer(), nullable=True),
+            sa.Column('max_attempts', sa.Integer(), nullable=True),
+            sa.Column('run_after', sa.DateTime(), nullable=True),
+            sa.Column('locked_by', sa.String(length=200), nullable=True),
+            sa.Column('locked_until', sa.DateTime(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('started_at', sa.DateTime(), nullable=True),
+            sa.Column('finished_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+    
+    op.create_index(
+        'uq_calendar_event_generated', 'calendar_event', ['user_id', 'plant_id', 'event_date', 'event_type'],
+        unique=True, if_not_exists=True,
+        postgresql_where=sa.text('auto_generated'), sqlite_where=sa.text('auto_generated')
+    )
+    op.create_index(
+        'uq_job_queued', 'job', ['user_id', 'kind'],
+        unique=True, if_not_exists=True,
+        postgresql_where=sa.text("status = 'queued'"), sqlite_where=sa.text("status = 'queued'")
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_job_queued', table_name='job')
+    op.drop_index('uq_calendar_event_generated', table_name='calendar_event')
+    op.drop_table('job')
+    with op.batch_alter_table('plot_area') as batch_op:
+        batch_op.drop_column('google_sync_token')
+        batch_op.drop_column('google_calendar_id')
+    with op.batch_alter_table('calendar_event') as batch_op:
+        batch_op.drop_column('google_sync_pending')
+        batch_op.drop_column('auto_generated')
+    op.drop_table('layout_analysis')
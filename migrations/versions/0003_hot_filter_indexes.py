@@ -0,0 +1,43 @@
+"""Composite indexes for the user-scoped filters used by the API routes
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+
+On Postgres the indexes are built CONCURRENTLY, outside a transaction, so
+the tables stay writable while a large index builds.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ('ix_calendar_event_user_date', 'calendar_event', ['user_id', 'event_date', 'id']),
+    ('ix_calendar_event_user_open', 'calendar_event', ['user_id', 'completed', 'event_date']),
+    ('ix_calendar_event_user_type', 'calendar_event', ['user_id', 'event_type', 'completed', 'event_date']),
+    ('ix_calendar_event_user_plant', 'calendar_event', ['user_id', 'plant_id', 'event_date']),
+    ('ix_plant_placement_user_plot', 'plant_placement', ['user_id', 'plot_id', 'removed_date']),
+    ('ix_plant_placement_plot', 'plant_placement', ['plot_id']),
+    ('ix_plant_journal_user_plant_date', 'plant_journal', ['user_id', 'plant_id', 'entry_date']),
+    ('ix_plant_user_status', 'plant', ['user_id', 'status']),
+    ('ix_job_claim', 'job', ['status', 'run_after']),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
@@ -0,0 +1,44 @@
+"""Per-user plant counters behind /api/plants/stats
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+
+Rows are created from the plant table on first read, so none are backfilled.
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def has_table(name: str) -> bool:
+    if context.is_offline_mode():
+        return False
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade() -> None:
+    if not has_table('plant_stats'):
+        op.create_table('plant_stats',
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('total_plants', sa.Integer(), nullable=False),
+            sa.Column('planned_plants', sa.Integer(), nullable=False),
+            sa.Column('planted_plants', sa.Integer(), nullable=False),
+            sa.Column('growing_plants', sa.Integer(), nullable=False),
+            sa.Column('harvested_plants', sa.Integer(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+            sa.PrimaryKeyConstraint('user_id')
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('plant_stats')
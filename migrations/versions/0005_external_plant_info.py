@@ -0,0 +1,43 @@
+"""Cache of external API plant info behind /api/plants/external-info
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+
+Entries are fetched on first lookup or by prefetch_plant_info.py, so none are backfilled.
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def has_table(name: str) -> bool:
+    if context.is_offline_mode():
+        return False
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade() -> None:
+    if not has_table('external_plant_info'):
+        op.create_table('external_plant_info',
+            sa.Column('key', sa.String(length=200), nullable=False),
+            sa.Column('name', sa.String(length=200), nullable=False),
+            sa.Column('data', sa.JSON(), nullable=True),
+            sa.Column('fetched_at', sa.DateTime(), nullable=False),
+            sa.Column('fresh_until', sa.DateTime(), nullable=False),
+            sa.Column('stale_until', sa.DateTime(), nullable=False),
+            sa.Column('refreshing_until', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('key')
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('external_plant_info')
@@ -0,0 +1,39 @@
+"""Token buckets of the Perenual and Trefle quotas
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+
+Buckets are created full on first use, so none are backfilled.
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def has_table(name: str) -> bool:
+    if context.is_offline_mode():
+        return False
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade() -> None:
+    if not has_table('rate_limit_bucket'):
+        op.create_table('rate_limit_bucket',
+            sa.Column('provider', sa.String(length=50), nullable=False),
+            sa.Column('tokens', sa.Float(), nullable=False),
+            sa.Column('updated_at', sa.Float(), nullable=False),
+            sa.PrimaryKeyConstraint('provider')
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('rate_limit_bucket')
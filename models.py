@@ -1,5 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
+from sqlalchemy.orm import selectinload
 from datetime import datetime
 
 db = SQLAlchemy()
@@ -69,11 +70,16 @@ class Plant(db.Model):
     notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_plant_user_status', 'user_id', 'status'),  # Plant lists and stats by status
+    )
+    
     # Relationship
     plant_type = db.relationship('PlantType', backref='user_plants')
     
-    def to_dict(self):
-        return {
+    def to_dict(self, compact=False):
+        """Plant with its type nested, or with only plant_type_id when compact"""
+        data = {
             'id': self.id,
             'custom_name': self.custom_name,
             'planted_date': self.planted_date.isoformat() if self.planted_date else None,
@@ -81,9 +87,13 @@ class Plant(db.Model):
             'actual_harvest_date': self.actual_harvest_date.isoformat() if self.actual_harvest_date else None,
             'status': self.status,
             'notes': self.notes,
-            'plant_type': self.plant_type.to_dict() if self.plant_type else None,
             'created_at': self.created_at.isoformat()
         }
+        if compact:
+            data['plant_type_id'] = self.plant_type_id
+        else:
+            data['plant_type'] = self.plant_type.to_dict() if self.plant_type else None
+        return data
 
 class GardenPlot(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -129,22 +139,69 @@ class CalendarEvent(db.Model):
     reminder_sent = db.Column(db.Boolean, default=False)
     google_event_id = db.Column(db.String(200))  # Google Calendar event ID for sync
     google_calendar_id = db.Column(db.String(200))  # Which Google Calendar this event belongs to
+    auto_generated = db.Column(db.Boolean, default=False)  # Created by generate-schedule
+    google_sync_pending = db.Column(db.Boolean, default=True)  # Changed since last pushed to Google Calendar
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        # Generated care tasks are unique per plant, day and type; manual events are not restricted
+        db.Index(
+            'uq_calendar_event_generated', 'user_id', 'plant_id', 'event_date', 'event_type',
+            unique=True,
+            postgresql_where=db.text('auto_generated'),
+            sqlite_where=db.text('auto_generated')
+        ),
+        db.Index('ix_calendar_event_user_date', 'user_id', 'event_date', 'id'),  # Calendar list and its cursor pages
+        db.Index('ix_calendar_event_user_open', 'user_id', 'completed', 'event_date'),  # Upcoming and overdue
+        db.Index('ix_calendar_event_user_type', 'user_id', 'event_type', 'completed', 'event_date'),  # Smart insights
+        db.Index('ix_calendar_event_user_plant', 'user_id', 'plant_id', 'event_date'),  # Events of one plant
+    )
+    
     # Relationship
     plant = db.relationship('Plant', backref='calendar_events')
     
-    def to_dict(self):
-        return {
+    def to_dict(self, compact=False):
+        """Event with its plant nested, or with only plant_id when compact"""
+        data = {
             'id': self.id,
             'title': self.title,
             'description': self.description,
             'event_date': self.event_date.isoformat(),
             'event_type': self.event_type,
             'completed': self.completed,
-            'plant': self.plant.to_dict() if self.plant else None,
             'created_at': self.created_at.isoformat()
         }
+        if compact:
+            data['plant_id'] = self.plant_id
+        else:
+            data['plant'] = self.plant.to_dict() if self.plant else None
+        return data
+    
+    @staticmethod
+    def load_plants():
+        """
+        Loader option for event lists: plants and their types are fetched with one
+        IN query each, so serializing N events costs 3 queries instead of 1 + 2N
+        """
+        return selectinload(CalendarEvent.plant).selectinload(Plant.plant_type)
+    
+    @staticmethod
+    def serialize_list(events, compact=False):
+        """
+        Events as dicts. In compact mode each plant and plant type is sent once
+        in side tables and events reference them by id:
+        {'events': [...], 'plants': [...], 'plant_types': [...]}
+        """
+        if not compact:
+            return [event.to_dict() for event in events]
+        
+        plants = {event.plant.id: event.plant for event in events if event.plant}
+        plant_types = {plant.plant_type.id: plant.plant_type for plant in plants.values() if plant.plant_type}
+        return {
+            'events': [event.to_dict(compact=True) for event in events],
+            'plants': [plant.to_dict(compact=True) for plant in plants.values()],
+            'plant_types': [plant_type.to_dict() for plant_type in plant_types.values()]
+        }
 
 class GardenLocation(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -190,12 +247,18 @@ class PlotArea(db.Model):
     sun_exposure = db.Column(db.String(50))  # full_sun, partial_sun, partial_shade, full_shade
     irrigation_type = db.Column(db.String(50))  # manual, drip, sprinkler, none
     notes = db.Column(db.Text)
+    google_calendar_id = db.Column(db.String(200))  # Google Calendar holding this plot's tasks
+    google_sync_token = db.Column(db.String(500))  # Google syncToken for pulling changes to that calendar
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     garden_location = db.relationship('GardenLocation', backref='plots')
     
-    def to_dict(self):
-        return {
+    def to_dict(self, include_placements=True, plant_count=None):
+        """
+        Plot with its placements nested. Listings pass include_placements=False
+        and a plant_count computed in SQL, so placements are never loaded.
+        """
+        data = {
             'id': self.id,
             'name': self.name,
             'plot_type': self.plot_type,
@@ -209,9 +272,11 @@ class PlotArea(db.Model):
             'irrigation_type': self.irrigation_type,
             'notes': self.notes,
             'created_at': self.created_at.isoformat(),
-            'plant_placements': [placement.to_dict() for placement in self.plant_placements],
-            'plant_count': len(self.plant_placements)
+            'plant_count': plant_count if plant_count is not None else len(self.plant_placements)
         }
+        if include_placements:
+            data['plant_placements'] = [placement.to_dict() for placement in self.plant_placements]
+        return data
 
 class PlantPlacement(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -225,6 +290,11 @@ class PlantPlacement(db.Model):
     notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_plant_placement_user_plot', 'user_id', 'plot_id', 'removed_date'),  # Active plants of a plot
+        db.Index('ix_plant_placement_plot', 'plot_id'),  # Plot plant counts and plot deletes
+    )
+    
     plant = db.relationship('Plant', backref='placements')
     plot = db.relationship('PlotArea', backref='plant_placements')
     
@@ -314,6 +384,10 @@ class PlantJournal(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_plant_journal_user_plant_date', 'user_id', 'plant_id', 'entry_date'),  # Journal of one plant
+    )
+    
     plant = db.relationship('Plant', backref='journal_entries')
     placement = db.relationship('PlantPlacement', backref='journal_entries')
     
@@ -334,4 +408,96 @@ class PlantJournal(db.Model):
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat(),
             'plant': self.plant.to_dict() if self.plant else None
-        } 
\ No newline at end of file
+        }
+
+class LayoutAnalysis(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, unique=True)
+    compatibility_version = db.Column(db.String(20))  # PlantDataService.compatibility_version it was built with
+    state = db.Column(db.JSON)  # Plant counts and spacing conflicts, updated incrementally
+    analysis = db.Column(db.JSON)  # Rendered analysis returned by /api/garden/analyze-layout
+    total_plants = db.Column(db.Integer, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'analysis': self.analysis,
+            'total_plants': self.total_plants,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class PlantStats(db.Model):
+    """Per-user plant counters behind /api/plants/stats, maintained by the plant handlers"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    total_plants = db.Column(db.Integer, nullable=False, default=0)
+    planned_plants = db.Column(db.Integer, nullable=False, default=0)
+    planted_plants = db.Column(db.Integer, nullable=False, default=0)
+    growing_plants = db.Column(db.Integer, nullable=False, default=0)
+    harvested_plants = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'total_plants': self.total_plants,
+            'planned_plants': self.planned_plants,
+            'planted_plants': self.planted_plants,
+            'growing_plants': self.growing_plants,
+            'harvested_plants': self.harvested_plants
+        }
+
+class ExternalPlantInfo(db.Model):
+    """Perenual and Trefle data per species behind /api/plants/external-info, see services/plant_info_cache.py"""
+    key = db.Column(db.String(200), primary_key=True)  # Normalised plant name
+    name = db.Column(db.String(200), nullable=False)  # Name as last looked up
+    data = db.Column(db.JSON)  # None when no API knows the name
+    fetched_at = db.Column(db.DateTime, nullable=False)
+    fresh_until = db.Column(db.DateTime, nullable=False)
+    stale_until = db.Column(db.DateTime, nullable=False)  # Served while being refreshed until then
+    refreshing_until = db.Column(db.DateTime)  # Lease of the worker refreshing the entry
+
+class RateLimitBucket(db.Model):
+    """Token bucket of a third-party API quota, shared by all workers, see services/rate_limiter.py"""
+    provider = db.Column(db.String(50), primary_key=True)
+    tokens = db.Column(db.Float, nullable=False)  # Negative while calls wait for tokens still to come
+    updated_at = db.Column(db.Float, nullable=False)  # Unix time tokens was computed for
+
+class Job(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    kind = db.Column(db.String(50), nullable=False)  # generate_schedule, google_sync
+    status = db.Column(db.String(20), default='queued')  # queued, running, succeeded, failed
+    payload = db.Column(db.JSON)
+    result = db.Column(db.JSON)
+    error = db.Column(db.Text)
+    attempts = db.Column(db.Integer, default=0)
+    max_attempts = db.Column(db.Integer, default=3)
+    run_after = db.Column(db.DateTime, default=datetime.utcnow)  # Not claimed before this time (retry backoff)
+    locked_by = db.Column(db.String(200))  # Worker running the job
+    locked_until = db.Column(db.DateTime)  # Lease; an expired lease makes a running job claimable again
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    # At most one queued job per user and kind, enqueueing again returns that job
+    __table_args__ = (
+        db.Index(
+            'uq_job_queued', 'user_id', 'kind',
+            unique=True,
+            postgresql_where=db.text("status = 'queued'"),
+            sqlite_where=db.text("status = 'queued'")
+        ),
+        db.Index('ix_job_claim', 'status', 'run_after'),  # Workers polling for due jobs
+    )
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'attempts': self.attempts,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Warm the external plant info cache for every plant type in the database.
+Fetches Perenual and Trefle data for each PlantType name whose cached info is
+missing or no longer fresh, so /api/plants/external-info answers from the cache.
+
+Usage: python prefetch_plant_info.py [--force]
+(--force fetches every name again, fresh or not)
+"""
+
+import sys
+import asyncio
+import logging
+import argparse
+
+from app import app
+from models import PlantType
+from services.plant_data_service import plant_data_service
+from services.plant_info_cache import plant_info_cache
+
+def main():
+    parser = argparse.ArgumentParser(description='Prefetch external plant info for all plant types')
+    parser.add_argument('--force', action='store_true', help='fetch names whose cached info is still fresh too')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if not (plant_data_service.perenual_api_key or plant_data_service.trefle_api_key):
+        print("❌ Set PERENUAL_API_KEY or TREFLE_API_KEY to prefetch plant info")
+        sys.exit(1)
+
+    with app.app_context():
+        names = [name for name, in PlantType.query.with_entities(PlantType.name).order_by(PlantType.name)]
+        counts = asyncio.run(plant_info_cache.prefetch(names, plant_data_service.fetch_api_plant_info,
+                                                       force=args.force))
+
+    print(f"✅ {len(names)} plant types: {counts['fetched']} fetched, {counts['fresh']} already fresh, "
+          f"{counts['failed']} failed")
+    sys.exit(1 if counts['failed'] else 0)
+
+if __name__ == '__main__':
+    main()
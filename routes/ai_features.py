@@ -5,6 +5,9 @@ import os
 from datetime import datetime
 from models import db, Plant, PlantType, GardenLocation, PlantJournal, PlantPlacement
 from services.ai_plant_analysis import ai_plant_service
+from services.image_preprocessing import image_preprocessor
+from services.identification_cache import identification_cache
+from services.http_client import http_client
 
 ai_bp = Blueprint('ai', __name__)
 
@@ -12,6 +15,17 @@ ai_bp = Blueprint('ai', __name__)
 UPLOAD_FOLDER = 'uploads/plant_photos'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 
+OPENAI_CHAT_URL = f"{ai_plant_service.openai_base_url}/chat/completions"
+VISION_MODEL = ai_plant_service.VISION_MODEL
+IDENTIFY_PROMPT = '''Identify this plant species. Please provide:
+                                1. Common name
+                                2. Scientific name (if identifiable)
+                                3. Plant family
+                                4. Basic care instructions
+                                5. Any notable characteristics
+                                
+                                Be specific and accurate. If you're not certain, mention your confidence level.'''
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
@@ -23,8 +37,6 @@ def ensure_upload_dir():
 @login_required
 def identify_plant():
     """Identify plant species from uploaded photo"""
-    ensure_upload_dir()
-    
     if 'image' not in request.files:
         return jsonify({'error': 'No image uploaded'}), 400
     
@@ -33,84 +45,47 @@ def identify_plant():
         return jsonify({'error': 'No file selected'}), 400
     
     if file and allowed_file(file.filename):
-        # Save uploaded file
-        filename = secure_filename(f"{current_user.id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{file.filename}")
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(filepath)
+        # Downscale the upload in memory to what the vision model uses
+        try:
+            image = image_preprocessor.prepare(file.stream)
+        except ValueError as e:
+            return jsonify({'error': 'Invalid image', 'debug': str(e)}), 400
+        
+        # The same or a nearly identical photo was identified before
+        cached = identification_cache.get(image.dhash, IDENTIFY_PROMPT, VISION_MODEL)
+        if cached is not None:
+            return jsonify({'success': True, 'identification': cached,
+                            'suggested_plants': _find_matching_plant_types(cached), 'cached': True})
         
         try:
-            # Use direct API call for plant identification
-            import base64
-            import requests
-            
             api_key = os.getenv('OPENAI_API_KEY')
             if not api_key:
                 return jsonify({'error': 'OpenAI API key not configured'}), 500
             
-            # Encode image to base64
-            with open(filepath, "rb") as image_file:
-                base64_image = base64.b64encode(image_file.read()).decode('utf-8')
-            
-            headers = {
-                'Authorization': f'Bearer {api_key}',
-                'Content-Type': 'application/json'
-            }
-            
-            payload = {
-                'model': 'gpt-4-vision-preview',
-                'messages': [
-                    {
-                        'role': 'user',
-                        'content': [
-                            {
-                                'type': 'text',
-                                'text': '''Identify this plant species. Please provide:
-                                1. Common name
-                                2. Scientific name (if identifiable)
-                                3. Plant family
-                                4. Basic care instructions
-                                5. Any notable characteristics
-                                
-                                Be specific and accurate. If you're not certain, mention your confidence level.'''
-                            },
-                            {
-                                'type': 'image_url',
-                                'image_url': {
-                                    'url': f'data:image/jpeg;base64,{base64_image}'
-                                }
-                            }
-                        ]
-                    }
-                ],
-                'max_tokens': 500
-            }
-            
-            response = requests.post(
-                'https://api.openai.com/v1/chat/completions',
-                headers=headers,
-                json=payload,
-                timeout=30
-            )
+            # PlantNet and the vision model are queried concurrently
+            result = ai_plant_service.identify_plant_species(image, prompt=IDENTIFY_PROMPT, max_tokens=500)
             
-            if response.status_code == 200:
-                result = response.json()
-                analysis = result['choices'][0]['message']['content']
+            if result.get('ai_analysis') is not None:
+                identification = {
+                    'ai_analysis': result['ai_analysis'],
+                    'confidence_score': result['confidence_score'],
+                    'plantnet_suggestions': result['plantnet_suggestions'],
+                    'success': True,
+                    'model_used': VISION_MODEL
+                }
+                identification_cache.set(image.dhash, IDENTIFY_PROMPT, VISION_MODEL, identification)
                 
                 return jsonify({
                     'success': True,
-                    'identification': {
-                        'ai_analysis': analysis,
-                        'confidence_score': 0.8,  # Default confidence for GPT-4V
-                        'plantnet_suggestions': [],  # Could add PlantNet later
-                        'success': True,
-                        'model_used': 'gpt-4-vision-preview'
-                    },
-                    'suggested_plants': []  # Could populate based on identification
+                    'identification': identification,
+                    'suggested_plants': _find_matching_plant_types(identification),
+                    'cached': False
                 })
             else:
-                current_app.logger.error(f"OpenAI Vision API error: {response.status_code} - {response.text}")
+                error = result.get('errors', {}).get('openai') or result.get('error')
+                current_app.logger.error(f"OpenAI Vision API error: {error}")
                 return jsonify({
-                    'error': f'Plant identification failed: {response.status_code}',
+                    'error': f'Plant identification failed: {error}',
                     'debug': 'Vision API call failed'
                 }), 500
                 
@@ -120,6 +95,15 @@ def identify_plant():
     
     return jsonify({'error': 'Invalid file format'}), 400
 
+@ai_bp.route('/api/ai/identify-plant/cache', methods=['GET'])
+@login_required
+def identification_cache_stats():
+    """Hit and miss counters of the identification cache"""
+    try:
+        return jsonify({'success': True, 'cache': identification_cache.stats()})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @ai_bp.route('/api/ai/analyze-health', methods=['POST'])
 @login_required
 def analyze_plant_health():
@@ -135,16 +119,14 @@ def analyze_plant_health():
     placement_id = request.form.get('placement_id')
     
     if file and allowed_file(file.filename):
-        # Save uploaded file
-        filename = secure_filename(f"health_{current_user.id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{file.filename}")
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(filepath)
+        # Downscale the upload in memory to what the vision model uses
+        try:
+            image = image_preprocessor.prepare(file.stream)
+        except ValueError as e:
+            return jsonify({'error': 'Invalid image', 'debug': str(e)}), 400
         
         try:
             # Use direct API call for health analysis
-            import base64
-            import requests
-            
             api_key = os.getenv('OPENAI_API_KEY')
             if not api_key:
                 return jsonify({'error': 'OpenAI API key not configured'}), 500
@@ -162,10 +144,6 @@ def analyze_plant_health():
                     - Current status: {plant.status}
                     """
             
-            # Encode image to base64
-            with open(filepath, "rb") as image_file:
-                base64_image = base64.b64encode(image_file.read()).decode('utf-8')
-            
             headers = {
                 'Authorization': f'Bearer {api_key}',
                 'Content-Type': 'application/json'
@@ -194,7 +172,7 @@ def analyze_plant_health():
                             {
                                 'type': 'image_url',
                                 'image_url': {
-                                    'url': f'data:image/jpeg;base64,{base64_image}'
+                                    'url': image.data_url()
                                 }
                             }
                         ]
@@ -203,11 +181,10 @@ def analyze_plant_health():
                 'max_tokens': 500
             }
             
-            response = requests.post(
-                'https://api.openai.com/v1/chat/completions',
+            response = http_client.post(
+                'openai', OPENAI_CHAT_URL,
                 headers=headers,
-                json=payload,
-                timeout=30
+                json=payload
             )
             
             if response.status_code == 200:
@@ -218,6 +195,13 @@ def analyze_plant_health():
                 journal_entry_id = None
                 if plant_id:
                     try:
+                        # Keep the downscaled photo with the journal entry
+                        filename = secure_filename(f"health_{current_user.id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_"
+                                                   f"{os.path.splitext(file.filename)[0]}.{image.extension}")
+                        filepath = os.path.join(UPLOAD_FOLDER, filename)
+                        with open(filepath, 'wb') as photo:
+                            photo.write(image.data)
+                        
                         journal_entry = PlantJournal(
                             user_id=current_user.id,
                             plant_id=plant_id,
@@ -280,7 +264,6 @@ def get_garden_advice():
     
     try:
         # Use direct API call to bypass library issues
-        import requests
         import os
         
         api_key = os.getenv('OPENAI_API_KEY')
@@ -325,11 +308,10 @@ def get_garden_advice():
             'temperature': 0.7
         }
         
-        response = requests.post(
-            'https://api.openai.com/v1/chat/completions',
+        response = http_client.post(
+            'openai', OPENAI_CHAT_URL,
             headers=headers,
-            json=payload,
-            timeout=30
+            json=payload
         )
         
         if response.status_code == 200:
@@ -414,7 +396,6 @@ def plant_care_assistant():
     
     try:
         # Use direct API call like our working garden advice endpoint
-        import requests
         import os
         
         api_key = os.getenv('OPENAI_API_KEY')
@@ -466,11 +447,10 @@ def plant_care_assistant():
             'temperature': 0.7
         }
         
-        response = requests.post(
-            'https://api.openai.com/v1/chat/completions',
+        response = http_client.post(
+            'openai', OPENAI_CHAT_URL,
             headers=headers,
-            json=payload,
-            timeout=30
+            json=payload
         )
         
         if response.status_code == 200:
@@ -547,7 +527,6 @@ def test_openai_simple():
     """Simple OpenAI test bypassing AI service"""
     try:
         import os
-        import requests
         import json
         
         api_key = os.getenv('OPENAI_API_KEY')
@@ -569,11 +548,10 @@ def test_openai_simple():
         }
         
         # Direct HTTP request to OpenAI API
-        response = requests.post(
-            'https://api.openai.com/v1/chat/completions',
+        response = http_client.post(
+            'openai', OPENAI_CHAT_URL,
             headers=headers,
-            json=data,
-            timeout=30
+            json=data
         )
         
         if response.status_code == 200:
@@ -604,7 +582,6 @@ def test_openai_connection():
     """Simple public test endpoint to verify OpenAI connectivity"""
     try:
         # Simple test query
-        import requests
         import json
         
         api_key = os.getenv('OPENAI_API_KEY')
@@ -629,11 +606,10 @@ def test_openai_connection():
             'max_tokens': 50
         }
         
-        response = requests.post(
-            'https://api.openai.com/v1/chat/completions',
+        response = http_client.post(
+            'openai', OPENAI_CHAT_URL,
             headers=headers,
-            json=payload,
-            timeout=30
+            json=payload
         )
         
         if response.status_code == 200:
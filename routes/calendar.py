@@ -1,19 +1,43 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
 from flask_login import login_required, current_user
 from models import db, CalendarEvent, PlotArea
 from datetime import datetime, date
+from collections import defaultdict
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import joinedload
 from services.garden_scheduler import garden_scheduler
+from services.job_queue import job_queue
 import asyncio
+import json
 
 calendar_bp = Blueprint('calendar', __name__)
 
+MAX_PAGE_SIZE = 500
+STREAM_BATCH_SIZE = 1000  # Rows fetched per round trip from the server-side cursor
+
+def _is_compact():
+    """?compact=true asks list endpoints for plant references plus side tables instead of nested plants"""
+    return request.args.get('compact', 'false').lower() == 'true'
+
 @calendar_bp.route('/api/calendar', methods=['GET'])
 @login_required
 def get_calendar_events():
-    """Get all calendar events for the current user"""
+    """
+    Get calendar events for the current user, ordered by date.
+    
+    Returns every event as one list unless asked for:
+    - ?limit=N (at most 500) pages by (event_date, id); the response is
+      {'events': [...], 'next_cursor': ...} and ?after=<next_cursor> gets the next page
+    - ?format=ndjson or ?format=stream streams all events, one JSON object per
+      line or as a JSON array, without holding them in memory (for exports)
+    """
     # Optional date filtering
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
+    limit = request.args.get('limit', type=int)
+    after = request.args.get('after')
+    output_format = request.args.get('format', 'json').lower()
+    compact = _is_compact()
     
     query = CalendarEvent.query.filter_by(user_id=current_user.id)
     
@@ -25,8 +49,57 @@ def get_calendar_events():
         end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
         query = query.filter(CalendarEvent.event_date <= end_date)
     
-    events = query.order_by(CalendarEvent.event_date).all()
-    return jsonify([event.to_dict() for event in events])
+    if after:
+        try:
+            after_date, after_id = after.split('_')
+            after_date, after_id = datetime.strptime(after_date, '%Y-%m-%d').date(), int(after_id)
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        query = query.filter(or_(
+            CalendarEvent.event_date > after_date,
+            and_(CalendarEvent.event_date == after_date, CalendarEvent.id > after_id)
+        ))
+    
+    query = query.options(CalendarEvent.load_plants()).order_by(CalendarEvent.event_date, CalendarEvent.id)
+    
+    if output_format in ('ndjson', 'stream'):
+        return _stream_events(query, output_format, compact)
+    
+    if limit is None:
+        return jsonify(CalendarEvent.serialize_list(query.all(), compact=compact))
+    
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    events = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(events) > limit:
+        events = events[:limit]
+        next_cursor = f"{events[-1].event_date.isoformat()}_{events[-1].id}"
+    
+    page = CalendarEvent.serialize_list(events, compact=compact)
+    if not compact:
+        page = {'events': page}
+    page['next_cursor'] = next_cursor
+    return jsonify(page)
+
+def _stream_events(query, output_format, compact):
+    """
+    Stream the query's events in batches from a server-side cursor, so peak memory
+    does not depend on how many events the user has
+    """
+    def generate():
+        if output_format == 'stream':
+            yield '['
+        for number, event in enumerate(query.yield_per(STREAM_BATCH_SIZE)):
+            line = json.dumps(event.to_dict(compact=compact))
+            if output_format == 'ndjson':
+                yield line + '\n'
+            else:
+                yield (',' if number else '') + line
+        if output_format == 'stream':
+            yield ']'
+    
+    mimetype = 'application/x-ndjson' if output_format == 'ndjson' else 'application/json'
+    return Response(stream_with_context(generate()), mimetype=mimetype)
 
 @calendar_bp.route('/api/calendar', methods=['POST'])
 @login_required
@@ -43,7 +116,8 @@ def create_calendar_event():
         description=data.get('description'),
         event_date=event_date,
         event_type=data.get('event_type'),
-        completed=data.get('completed', False)
+        completed=data.get('completed', False),
+        google_sync_pending=True
     )
     
     db.session.add(event)
@@ -87,6 +161,7 @@ def update_calendar_event(event_id):
     if 'completed' in data:
         event.completed = data['completed']
     
+    event.google_sync_pending = True  # Push the change on the next Google Calendar sync
     db.session.commit()
     
     return jsonify(event.to_dict())
@@ -115,6 +190,7 @@ def complete_calendar_event(event_id):
         return jsonify({'error': 'Calendar event not found'}), 404
     
     event.completed = True
+    event.google_sync_pending = True
     db.session.commit()
     
     return jsonify(event.to_dict())
@@ -130,9 +206,9 @@ def get_upcoming_events():
         completed=False
     ).filter(
         CalendarEvent.event_date >= today
-    ).order_by(CalendarEvent.event_date).limit(10).all()
+    ).options(CalendarEvent.load_plants()).order_by(CalendarEvent.event_date).limit(10).all()
     
-    return jsonify([event.to_dict() for event in events])
+    return jsonify(CalendarEvent.serialize_list(events, compact=_is_compact()))
 
 @calendar_bp.route('/api/calendar/overdue', methods=['GET'])
 @login_required
@@ -145,187 +221,152 @@ def get_overdue_events():
         completed=False
     ).filter(
         CalendarEvent.event_date < today
-    ).order_by(CalendarEvent.event_date).all()
+    ).options(CalendarEvent.load_plants()).order_by(CalendarEvent.event_date).all()
     
-    return jsonify([event.to_dict() for event in events])
+    return jsonify(CalendarEvent.serialize_list(events, compact=_is_compact()))
 
 @calendar_bp.route('/api/calendar/generate-schedule', methods=['POST'])
 @login_required
 def generate_smart_schedule():
-    """Generate intelligent garden schedule for all plots"""
+    """Queue generation of an intelligent garden schedule for all plots, poll /api/jobs/<id> for the result"""
     try:
-        from models import PlotArea, PlantPlacement, Plant, PlantType, GardenLocation
-        from datetime import timedelta
-        
-        # Get user's plots with plants
-        plots = PlotArea.query.filter_by(user_id=current_user.id).all()
-        
-        if not plots:
+        if not PlotArea.query.filter_by(user_id=current_user.id).first():
             return jsonify({
                 'success': False,
                 'error': 'No garden plots found. Please create some plots first.'
             }), 400
         
-        total_events = 0
-        plot_schedules = {}
-        
-        # Simple plant care database
-        care_schedules = {
-            'tomato': {
-                'watering_days': [2, 4, 6, 8, 10, 12, 14],  # Every 2 days for 2 weeks
-                'fertilizing_days': [14, 35, 56],
-                'pruning_days': [21, 42, 63],
-                'harvest_days': [75, 90, 105]
-            },
-            'lettuce': {
-                'watering_days': [1, 2, 3, 4, 5, 6, 7, 8, 9, 10],  # Daily for 10 days
-                'fertilizing_days': [7, 21, 35],
-                'harvest_days': [45, 50, 55, 60]
-            },
-            'carrot': {
-                'watering_days': [3, 6, 9, 12, 15, 18, 21],  # Every 3 days
-                'fertilizing_days': [21, 49],
-                'harvest_days': [70, 85, 100]
-            },
-            'bell_pepper': {
-                'watering_days': [2, 4, 6, 8, 10, 12, 14],
-                'fertilizing_days': [14, 35, 56, 77],
-                'pruning_days': [28, 49],
-                'harvest_days': [70, 85, 100, 115]
-            }
-        }
-        
-        # Generate events for each plot
-        for plot in plots:
-            plot_events = []
-            
-            # Get plants in this plot
-            placements = PlantPlacement.query.filter_by(plot_id=plot.id, user_id=current_user.id).filter(
-                PlantPlacement.removed_date.is_(None)
-            ).all()
-            
-            for placement in placements:
-                if not placement.planted_date or not placement.plant or not placement.plant.plant_type:
-                    continue
-                
-                plant_name = placement.plant.plant_type.name.lower()
-                care_schedule = care_schedules.get(plant_name, care_schedules['tomato'])  # Default to tomato
-                
-                # Generate watering events
-                for days_after in care_schedule['watering_days']:
-                    event_date = placement.planted_date + timedelta(days=days_after)
-                    if event_date >= date.today():  # Only future events
-                        
-                        # Check if event already exists
-                        existing = CalendarEvent.query.filter_by(
-                            user_id=current_user.id,
-                            plant_id=placement.plant_id,
-                            event_date=event_date,
-                            event_type='watering'
-                        ).first()
-                        
-                        if not existing:
-                            plant_display_name = placement.plant.custom_name if placement.plant.custom_name else placement.plant.plant_type.name
-                            event = CalendarEvent(
-                                user_id=current_user.id,
-                                plant_id=placement.plant_id,
-                                title=f'💧 Water {plant_display_name}',
-                                description=f'Water your {plant_name} in {plot.name}',
-                                event_date=event_date,
-                                event_type='watering',
-                                completed=False
-                            )
-                            db.session.add(event)
-                            plot_events.append(event)
-                            total_events += 1
-                
-                # Generate fertilizing events
-                for days_after in care_schedule.get('fertilizing_days', []):
-                    event_date = placement.planted_date + timedelta(days=days_after)
-                    if event_date >= date.today():
-                        
-                        existing = CalendarEvent.query.filter_by(
-                            user_id=current_user.id,
-                            plant_id=placement.plant_id,
-                            event_date=event_date,
-                            event_type='fertilizing'
-                        ).first()
-                        
-                        if not existing:
-                            plant_display_name = placement.plant.custom_name if placement.plant.custom_name else placement.plant.plant_type.name
-                            event = CalendarEvent(
-                                user_id=current_user.id,
-                                plant_id=placement.plant_id,
-                                title=f'🌱 Fertilize {plant_display_name}',
-                                description=f'Apply fertilizer to your {plant_name} in {plot.name}',
-                                event_date=event_date,
-                                event_type='fertilizing',
-                                completed=False
-                            )
-                            db.session.add(event)
-                            plot_events.append(event)
-                            total_events += 1
-                
-                # Generate harvest events
-                for days_after in care_schedule.get('harvest_days', []):
-                    event_date = placement.planted_date + timedelta(days=days_after)
-                    if event_date >= date.today():
-                        
-                        existing = CalendarEvent.query.filter_by(
-                            user_id=current_user.id,
-                            plant_id=placement.plant_id,
-                            event_date=event_date,
-                            event_type='harvesting'
-                        ).first()
-                        
-                        if not existing:
-                            plant_display_name = placement.plant.custom_name if placement.plant.custom_name else placement.plant.plant_type.name
-                            event = CalendarEvent(
-                                user_id=current_user.id,
-                                plant_id=placement.plant_id,
-                                title=f'🌾 Harvest {plant_display_name}',
-                                description=f'Check if your {plant_name} is ready to harvest in {plot.name}',
-                                event_date=event_date,
-                                event_type='harvesting',
-                                completed=False
-                            )
-                            db.session.add(event)
-                            plot_events.append(event)
-                            total_events += 1
-            
-            plot_schedules[plot.id] = len(plot_events)
-        
-        # Commit all events to database
-        db.session.commit()
-        
-        # Auto-sync to Google Calendar if enabled
-        google_sync_message = ""
-        if current_user.calendar_enabled:
-            try:
-                from services.google_calendar_service import google_calendar_service
-                sync_success, sync_message = google_calendar_service.sync_all_events(current_user)
-                if sync_success:
-                    google_sync_message = f" Events synced to Google Calendar! 📅"
-                else:
-                    google_sync_message = f" (Google Calendar sync failed: {sync_message})"
-            except Exception as e:
-                google_sync_message = f" (Google Calendar sync error)"
+        job = job_queue.enqueue(current_user.id, 'generate_schedule')
         
         return jsonify({
             'success': True,
-            'message': f'Generated {total_events} garden tasks across {len(plots)} plots{google_sync_message}',
-            'plot_schedules': plot_schedules,
-            'total_events': total_events,
-            'google_synced': current_user.calendar_enabled
-        })
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': f'/api/jobs/{job.id}'
+        }), 202
         
     except Exception as e:
         db.session.rollback()
-        import traceback
-        print(f"Error generating schedule: {e}")
-        print(traceback.format_exc())
+        print(f"Error queueing schedule generation: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@job_queue.handler('generate_schedule')
+def generate_schedule_job(job):
+    """Generate intelligent garden schedule for all plots of the job's user"""
+    from models import PlantPlacement, Plant, User
+    from datetime import timedelta
+    
+    user = db.session.get(User, job.user_id)
+    plots = PlotArea.query.filter_by(user_id=user.id).all()
+    
+    # Simple plant care database
+    care_schedules = {
+        'tomato': {
+            'watering_days': [2, 4, 6, 8, 10, 12, 14],  # Every 2 days for 2 weeks
+            'fertilizing_days': [14, 35, 56],
+            'pruning_days': [21, 42, 63],
+            'harvest_days': [75, 90, 105]
+        },
+        'lettuce': {
+            'watering_days': [1, 2, 3, 4, 5, 6, 7, 8, 9, 10],  # Daily for 10 days
+            'fertilizing_days': [7, 21, 35],
+            'harvest_days': [45, 50, 55, 60]
+        },
+        'carrot': {
+            'watering_days': [3, 6, 9, 12, 15, 18, 21],  # Every 3 days
+            'fertilizing_days': [21, 49],
+            'harvest_days': [70, 85, 100]
+        },
+        'bell_pepper': {
+            'watering_days': [2, 4, 6, 8, 10, 12, 14],
+            'fertilizing_days': [14, 35, 56, 77],
+            'pruning_days': [28, 49],
+            'harvest_days': [70, 85, 100, 115]
+        }
+    }
+    
+    # Event types generated from the care schedules
+    scheduled_events = [
+        ('watering_days', 'watering', '💧 Water {display_name}', 'Water your {plant_name} in {plot_name}'),
+        ('fertilizing_days', 'fertilizing', '🌱 Fertilize {display_name}', 'Apply fertilizer to your {plant_name} in {plot_name}'),
+        ('harvest_days', 'harvesting', '🌾 Harvest {display_name}', 'Check if your {plant_name} is ready to harvest in {plot_name}')
+    ]
+    
+    # Get plants of all plots in one query
+    placements_by_plot = defaultdict(list)
+    placements = PlantPlacement.query.options(
+        joinedload(PlantPlacement.plant).joinedload(Plant.plant_type)
+    ).filter(
+        PlantPlacement.user_id == user.id,
+        PlantPlacement.plot_id.in_([plot.id for plot in plots]),
+        PlantPlacement.removed_date.is_(None)
+    ).order_by(PlantPlacement.id).all()
+    for placement in placements:
+        placements_by_plot[placement.plot_id].append(placement)
+    
+    # Compute every candidate event in memory, keyed like the existence check
+    today = date.today()
+    candidates = {}
+    for plot in plots:
+        for placement in placements_by_plot[plot.id]:
+            if not placement.planted_date or not placement.plant or not placement.plant.plant_type:
+                continue
+            
+            plant_name = placement.plant.plant_type.name.lower()
+            care_schedule = care_schedules.get(plant_name, care_schedules['tomato'])  # Default to tomato
+            plant_display_name = placement.plant.custom_name if placement.plant.custom_name else placement.plant.plant_type.name
+            
+            for schedule_key, event_type, title, description in scheduled_events:
+                for days_after in care_schedule.get(schedule_key, []):
+                    event_date = placement.planted_date + timedelta(days=days_after)
+                    key = (placement.plant_id, event_date, event_type)
+                    if event_date < today or key in candidates:  # Only future events, once per plant
+                        continue
+                    
+                    candidates[key] = (plot.id, {
+                        'user_id': user.id,
+                        'plant_id': placement.plant_id,
+                        'title': title.format(display_name=plant_display_name),
+                        'description': description.format(plant_name=plant_name, plot_name=plot.name),
+                        'event_date': event_date,
+                        'event_type': event_type
+                    })
+    
+    # Drop the events that already exist, using one range query
+    for key in garden_scheduler.existing_event_keys(user.id, candidates):
+        del candidates[key]
+    
+    inserted = garden_scheduler.bulk_insert_events([row for _, row in candidates.values()])
+    
+    plot_schedules = {plot.id: 0 for plot in plots}
+    for key in inserted:
+        plot_schedules[candidates[key][0]] += 1
+    total_events = len(inserted)
+    
+    # Commit all events to database
+    db.session.commit()
+    
+    # Auto-sync to Google Calendar if enabled
+    google_sync_message = ""
+    if user.calendar_enabled:
+        try:
+            from services.google_calendar_service import google_calendar_service
+            sync_success, sync_message = google_calendar_service.sync_all_events(user)
+            if sync_success:
+                google_sync_message = f" Events synced to Google Calendar! 📅"
+            else:
+                google_sync_message = f" (Google Calendar sync failed: {sync_message})"
+        except Exception as e:
+            google_sync_message = f" (Google Calendar sync error)"
+    
+    return {
+        'success': True,
+        'message': f'Generated {total_events} garden tasks across {len(plots)} plots{google_sync_message}',
+        'plot_schedules': plot_schedules,
+        'total_events': total_events,
+        'google_synced': user.calendar_enabled
+    }
+
 @calendar_bp.route('/api/calendar/weather-forecast', methods=['GET'])
 @login_required
 def get_weather_forecast():
@@ -456,7 +497,7 @@ def get_google_calendar_status():
 @calendar_bp.route('/api/calendar/google-sync', methods=['POST'])
 @login_required 
 def sync_to_google_calendar():
-    """Sync all garden events to Google Calendar"""
+    """Queue a sync of all garden events to Google Calendar, poll /api/jobs/<id> for the result"""
     try:
         if not current_user.calendar_enabled:
             return jsonify({
@@ -464,19 +505,14 @@ def sync_to_google_calendar():
                 'error': 'Google Calendar not connected. Please authorize access first.'
             }), 400
         
-        from services.google_calendar_service import google_calendar_service
-        success, message = google_calendar_service.sync_all_events(current_user)
+        job = job_queue.enqueue(current_user.id, 'google_sync')
         
-        if success:
-            return jsonify({
-                'success': True,
-                'message': message
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'error': message
-            }), 500
+        return jsonify({
+            'success': True,
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': f'/api/jobs/{job.id}'
+        }), 202
             
     except Exception as e:
         current_app.logger.error(f"Error syncing to Google Calendar: {e}")
@@ -485,6 +521,22 @@ def sync_to_google_calendar():
             'error': 'Failed to sync with Google Calendar'
         }), 500
 
+@job_queue.handler('google_sync')
+def google_sync_job(job):
+    """Sync all garden events of the job's user to Google Calendar"""
+    from models import User
+    from services.google_calendar_service import google_calendar_service
+    
+    user = db.session.get(User, job.user_id)
+    success, message = google_calendar_service.sync_all_events(user)
+    if not success:
+        raise RuntimeError(message)  # Retried by the job queue
+    
+    return {
+        'success': True,
+        'message': message
+    }
+
 @calendar_bp.route('/api/calendar/google-auth-url', methods=['GET'])
 @login_required
 def get_google_auth_url():
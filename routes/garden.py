@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
 from models import db, GardenPlot
+from services.layout_analysis_cache import layout_analysis_cache
 
 garden_bp = Blueprint('garden', __name__)
 
@@ -31,6 +32,8 @@ def create_garden_plot():
     )
     
     db.session.add(plot)
+    db.session.flush()
+    layout_analysis_cache.apply_change(current_user.id, None, layout_analysis_cache.plot_snapshot(plot, current_user.id))
     db.session.commit()
     
     return jsonify(plot.to_dict()), 201
@@ -50,12 +53,14 @@ def get_garden_plot(plot_id):
 @login_required
 def update_garden_plot(plot_id):
     """Update a specific garden plot"""
-    plot = GardenPlot.query.filter_by(id=plot_id, user_id=current_user.id).first()
+    # Locked until commit, so concurrent edits of the plot snapshot its committed position
+    plot = GardenPlot.query.filter_by(id=plot_id, user_id=current_user.id).with_for_update().first()
     
     if not plot:
         return jsonify({'error': 'Garden plot not found'}), 404
     
     data = request.get_json()
+    before = layout_analysis_cache.plot_snapshot(plot, current_user.id)
     
     # Update fields
     if 'plant_id' in data:
@@ -77,6 +82,8 @@ def update_garden_plot(plot_id):
     if 'notes' in data:
         plot.notes = data['notes']
     
+    db.session.flush()
+    layout_analysis_cache.apply_change(current_user.id, before, layout_analysis_cache.plot_snapshot(plot, current_user.id))
     db.session.commit()
     
     return jsonify(plot.to_dict())
@@ -85,12 +92,15 @@ def update_garden_plot(plot_id):
 @login_required
 def delete_garden_plot(plot_id):
     """Delete a specific garden plot"""
-    plot = GardenPlot.query.filter_by(id=plot_id, user_id=current_user.id).first()
+    plot = GardenPlot.query.filter_by(id=plot_id, user_id=current_user.id).with_for_update().first()
     
     if not plot:
         return jsonify({'error': 'Garden plot not found'}), 404
     
+    before = layout_analysis_cache.plot_snapshot(plot, current_user.id)
     db.session.delete(plot)
+    db.session.flush()
+    layout_analysis_cache.apply_change(current_user.id, before, None)
     db.session.commit()
     
     return jsonify({'message': 'Garden plot deleted successfully'})
@@ -137,6 +147,8 @@ def bulk_update_garden():
             )
             db.session.add(plot)
     
+    # Many plots may have changed, rebuild the layout analysis on the next read
+    layout_analysis_cache.invalidate(current_user.id)
     db.session.commit()
     
     # Return updated garden layout
@@ -2,11 +2,45 @@ from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
 from models import db, GardenLocation, PlotArea, PlantPlacement, PlantJournal, Plant, PlantType, CalendarEvent
 from datetime import datetime, date
+from sqlalchemy import func
+from sqlalchemy.orm import selectinload
+from services.plant_stats import plant_stats_counters
 import requests
 import os
 
 garden_layout_bp = Blueprint('garden_layout', __name__)
 
+MAX_PAGE_SIZE = 500
+
+def _keyset_page(query, model, row_id=lambda row: row.id):
+    """
+    Apply ?after=<id>&limit=<n> keyset pagination ordered by model.id.
+    Without limit every row is returned, as before pagination existed.
+    Returns the page and the cursor of the next one (None on the last page).
+    """
+    after = request.args.get('after', type=int)
+    limit = request.args.get('limit', type=int)
+    
+    if after is not None:
+        query = query.filter(model.id > after)
+    query = query.order_by(model.id)
+    if limit is None:
+        return query.all(), None
+    
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    rows = query.limit(limit + 1).all()
+    if len(rows) > limit:
+        return rows[:limit], row_id(rows[limit - 1])
+    return rows, None
+
+def _select_fields(data):
+    """Keep only the keys listed in ?fields=a,b,c (id is always kept)"""
+    fields = request.args.get('fields')
+    if not fields:
+        return data
+    keep = set(fields.split(',')) | {'id'}
+    return {key: value for key, value in data.items() if key in keep}
+
 # Garden Location Routes
 @garden_layout_bp.route('/api/garden/location', methods=['GET'])
 @login_required
@@ -82,9 +116,29 @@ def get_environmental_data(lat, lng):
 @garden_layout_bp.route('/api/garden/plots', methods=['GET'])
 @login_required
 def get_garden_plots():
-    """Get all user's garden plots"""
-    plots = PlotArea.query.filter_by(user_id=current_user.id).all()
-    return jsonify({'success': True, 'plots': [plot.to_dict() for plot in plots]})
+    """
+    Get user's garden plots with their plant_count. Placements are only
+    nested with ?include=placements; supports ?after=&limit= and ?fields=
+    """
+    include_placements = 'placements' in request.args.get('include', '').split(',')
+    
+    # Counted in SQL per plot of the page instead of loading every placement
+    plant_count = db.session.query(func.count(PlantPlacement.id)).filter(
+        PlantPlacement.plot_id == PlotArea.id
+    ).correlate(PlotArea).scalar_subquery()
+    
+    query = db.session.query(PlotArea, plant_count).filter(PlotArea.user_id == current_user.id)
+    if include_placements:
+        query = query.options(
+            selectinload(PlotArea.plant_placements).selectinload(PlantPlacement.plant).selectinload(Plant.plant_type)
+        )
+    rows, next_cursor = _keyset_page(query, PlotArea, row_id=lambda row: row[0].id)
+    
+    plots = [
+        _select_fields(plot.to_dict(include_placements=include_placements, plant_count=count))
+        for plot, count in rows
+    ]
+    return jsonify({'success': True, 'plots': plots, 'next_cursor': next_cursor})
 
 @garden_layout_bp.route('/api/garden/plots', methods=['POST'])
 @login_required
@@ -158,9 +212,17 @@ def delete_garden_plot(plot_id):
 @garden_layout_bp.route('/api/garden/placements', methods=['GET'])
 @login_required
 def get_plant_placements():
-    """Get all plant placements"""
-    placements = PlantPlacement.query.filter_by(user_id=current_user.id).all()
-    return jsonify({'success': True, 'placements': [placement.to_dict() for placement in placements]})
+    """Get user's plant placements, supports ?after=&limit= and ?fields="""
+    query = PlantPlacement.query.filter_by(user_id=current_user.id).options(
+        selectinload(PlantPlacement.plant).selectinload(Plant.plant_type),
+        selectinload(PlantPlacement.plot)
+    )
+    placements, next_cursor = _keyset_page(query, PlantPlacement)
+    return jsonify({
+        'success': True,
+        'placements': [_select_fields(placement.to_dict()) for placement in placements],
+        'next_cursor': next_cursor
+    })
 
 @garden_layout_bp.route('/api/garden/placements', methods=['POST'])
 @login_required
@@ -201,6 +263,7 @@ def create_plant_placement():
             )
             db.session.add(plant)
             db.session.flush()  # Get the ID
+            plant_stats_counters.plant_added(plant)
             plant_id = plant.id
         
         # Convert lat/lng to x/y positions (for now, just use the coordinates directly)
@@ -279,9 +342,11 @@ def get_plant_calendar_events(plant_id):
     events = CalendarEvent.query.filter_by(
         user_id=current_user.id,
         plant_id=plant_id
-    ).order_by(CalendarEvent.event_date.asc()).all()
+    ).options(CalendarEvent.load_plants()).order_by(CalendarEvent.event_date.asc()).all()
     
-    return jsonify({'success': True, 'events': [event.to_dict() for event in events]})
+    if request.args.get('compact', 'false').lower() == 'true':
+        return jsonify({'success': True, **CalendarEvent.serialize_list(events, compact=True)})
+    return jsonify({'success': True, 'events': CalendarEvent.serialize_list(events)})
 
 @garden_layout_bp.route('/api/garden/journal', methods=['POST'])
 @login_required
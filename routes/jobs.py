@@ -0,0 +1,16 @@
+from flask import Blueprint, jsonify
+from flask_login import login_required, current_user
+from services.job_queue import job_queue
+
+jobs_bp = Blueprint('jobs', __name__)
+
+@jobs_bp.route('/api/jobs/<int:job_id>', methods=['GET'])
+@login_required
+def get_job(job_id):
+    """Get the status (and result, once finished) of a background job"""
+    job = job_queue.get_job(job_id, current_user.id)
+    
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify(job.to_dict())
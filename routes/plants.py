@@ -1,8 +1,10 @@
 from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
-from models import db, Plant, PlantType, GardenPlot
+from models import db, Plant, PlantType
 from datetime import datetime, date
 from services.plant_data_service import plant_data_service
+from services.layout_analysis_cache import layout_analysis_cache
+from services.plant_stats import plant_stats_counters
 import asyncio
 
 plants_bp = Blueprint('plants', __name__)
@@ -71,6 +73,7 @@ def create_plant():
     )
     
     db.session.add(plant)
+    plant_stats_counters.plant_added(plant)
     db.session.commit()
     
     return jsonify(plant.to_dict()), 201
@@ -107,7 +110,10 @@ def update_plant(plant_id):
     if 'actual_harvest_date' in data and data['actual_harvest_date']:
         plant.actual_harvest_date = datetime.strptime(data['actual_harvest_date'], '%Y-%m-%d').date()
     if 'status' in data:
+        old_status = plant.status
         plant.status = data['status']
+        # After the assignment, so counters created from the plant table include the new status
+        plant_stats_counters.status_changed(current_user.id, old_status, plant.status)
     if 'notes' in data:
         plant.notes = data['notes']
     
@@ -125,6 +131,9 @@ def delete_plant(plant_id):
         return jsonify({'error': 'Plant not found'}), 404
     
     db.session.delete(plant)
+    plant_stats_counters.plant_removed(plant)
+    # Garden plots holding this plant drop out of the layout analysis
+    layout_analysis_cache.invalidate(current_user.id)
     db.session.commit()
     
     return jsonify({'message': 'Plant deleted successfully'})
@@ -133,19 +142,15 @@ def delete_plant(plant_id):
 @login_required
 def get_plant_stats():
     """Get plant statistics for the current user"""
-    total_plants = Plant.query.filter_by(user_id=current_user.id).count()
-    planned_plants = Plant.query.filter_by(user_id=current_user.id, status='planned').count()
-    planted_plants = Plant.query.filter_by(user_id=current_user.id, status='planted').count()
-    growing_plants = Plant.query.filter_by(user_id=current_user.id, status='growing').count()
-    harvested_plants = Plant.query.filter_by(user_id=current_user.id, status='harvested').count()
+    # Counters kept by the plant handlers; ?recount=true recounts them from the plant table
+    if request.args.get('recount', 'false').lower() == 'true':
+        stats = plant_stats_counters.rebuild(current_user.id)
+    else:
+        stats = plant_stats_counters.get(current_user.id)
+    counts = stats.to_dict()  # Before the commit expires the row
+    db.session.commit()
     
-    return jsonify({
-        'total_plants': total_plants,
-        'planned_plants': planned_plants,
-        'planted_plants': planted_plants,
-        'growing_plants': growing_plants,
-        'harvested_plants': harvested_plants
-    })
+    return jsonify(counts)
 
 @plants_bp.route('/api/plants/<int:plant_id>/compatibility/<int:other_plant_id>')
 @login_required
@@ -219,29 +224,24 @@ def get_companion_info(plant_name):
 def analyze_garden_layout():
     """Analyze the entire garden layout for compatibility issues"""
     try:
-        # Get all planted plants with positions
-        plants_with_positions = db.session.query(Plant, GardenPlot).join(
-            GardenPlot, Plant.id == GardenPlot.plant_id
-        ).filter(Plant.user_id == current_user.id).all()
-        
-        plant_positions = []
-        for plant, plot in plants_with_positions:
-            plant_positions.append({
-                'plant_name': plant.plant_type.name,
-                'x': plot.x_position * 12,  # Convert to inches
-                'y': plot.y_position * 12,  # Convert to inches
-                'id': str(plant.id),
-                'custom_name': plant.custom_name
-            })
+        # The analysis is kept up to date as garden plots change;
+        # ?refresh=true forces a full recompute, ?verify=true also checks the cached result
+        response = {'success': True}
+        if request.args.get('verify') == 'true':
+            response['consistent'] = layout_analysis_cache.verify(current_user.id)
+        elif request.args.get('refresh') == 'true':
+            layout_analysis_cache.recompute(current_user.id)
         
-        analysis = plant_data_service.analyze_garden_layout(plant_positions)
+        record = layout_analysis_cache.get_analysis(current_user.id)
+        db.session.commit()
         
-        return jsonify({
-            'success': True,
-            'analysis': analysis,
-            'total_plants': len(plant_positions)
+        response.update({
+            'analysis': record.analysis,
+            'total_plants': record.total_plants
         })
+        return jsonify(response)
     except Exception as e:
+        db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @plants_bp.route('/api/plants/<int:plant_id>/care-reminders')
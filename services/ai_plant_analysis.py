@@ -1,12 +1,12 @@
 import os
-import base64
-import requests
-from typing import Dict, List, Any, Optional
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Dict, List, Any, Optional, Union
 from flask import current_app
 import openai
-from PIL import Image
-import io
 from datetime import datetime
+from services.image_preprocessing import PreparedImage, image_preprocessor
+from services.http_client import http_client
 
 class AIPlantAnalysisService:
     """
@@ -19,9 +19,19 @@ class AIPlantAnalysisService:
     - Care recommendations
     """
     
+    VISION_MODEL = 'gpt-4-vision-preview'
+    IDENTIFY_PROMPT = "Identify this plant species. Provide the common name, scientific name, and brief care tips."
+    
     def __init__(self):
         self.openai_client = None
         self.plantnet_api_key = os.getenv('PLANTNET_API_KEY')
+        self.plantnet_base_url = os.getenv('PLANTNET_BASE_URL', 'https://my-api.plantnet.org/v2').rstrip('/')
+        self.openai_base_url = os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1').rstrip('/')
+        # Seconds each provider may take in total; identification waits for the slower one
+        self.plantnet_timeout = float(os.getenv('PLANTNET_TIMEOUT', 10))
+        self.vision_timeout = float(os.getenv('OPENAI_VISION_TIMEOUT', 30))
+        # Own pool rather than the loop's default one, so asyncio.run does not wait for a timed out call
+        self._executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='ai-provider')
         
     def _get_openai_client(self):
         """Lazy initialization of OpenAI client"""
@@ -43,30 +53,67 @@ class AIPlantAnalysisService:
                     raise e
         return self.openai_client
         
-    def identify_plant_species(self, image_path: str) -> Dict[str, Any]:
-        """Identify plant species using PlantNet API + OpenAI Vision"""
+    def identify_plant_species(self, image: Union[str, BinaryIO, PreparedImage], prompt: Optional[str] = None,
+                               max_tokens: int = 1000) -> Dict[str, Any]:
+        """Identify plant species using PlantNet API + OpenAI Vision, queried concurrently"""
         try:
-            # First try PlantNet for scientific accuracy
-            plantnet_result = self._query_plantnet(image_path)
-            
-            # Then use OpenAI Vision for additional context
-            openai_result = self._analyze_with_openai_vision(image_path, 
-                "Identify this plant species. Provide the common name, scientific name, and brief care tips.")
-            
-            return {
-                'success': True,
-                'plantnet_suggestions': plantnet_result,
-                'ai_analysis': openai_result,
-                'confidence_score': self._calculate_confidence(plantnet_result, openai_result)
-            }
-            
+            prepared = image if isinstance(image, PreparedImage) else image_preprocessor.prepare(image)
+            return asyncio.run(self._identify(prepared, prompt or self.IDENTIFY_PROMPT, max_tokens))
+        
         except Exception as e:
             current_app.logger.error(f"Plant identification error: {e}")
             return {'success': False, 'error': str(e)}
     
-    def analyze_plant_health(self, image_path: str, plant_info: Dict) -> Dict[str, Any]:
+    async def _identify(self, image: PreparedImage, prompt: str, max_tokens: int) -> Dict[str, Any]:
+        """Query both providers at once and merge each result as it arrives"""
+        result = {
+            'success': False,
+            'plantnet_suggestions': [],
+            'ai_analysis': None,
+            'model_used': self.VISION_MODEL,
+            'errors': {}
+        }
+        
+        calls = {
+            asyncio.create_task(self._call_provider(self.vision_timeout, self._request_openai_vision,
+                                                    image, prompt, max_tokens)): 'openai'
+        }
+        if self.plantnet_api_key:
+            calls[asyncio.create_task(self._call_provider(self.plantnet_timeout, self._query_plantnet, image))] = 'plantnet'
+        
+        pending = set(calls)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                provider = calls[task]
+                try:
+                    value = task.result()
+                except Exception as e:
+                    current_app.logger.error(f"{provider} identification error: {e!r}")
+                    result['errors'][provider] = str(e) or type(e).__name__
+                    continue
+                
+                if provider == 'plantnet':
+                    result['plantnet_suggestions'] = value
+                else:
+                    result['ai_analysis'] = value
+        
+        result['success'] = result['ai_analysis'] is not None or bool(result['plantnet_suggestions'])
+        result['confidence_score'] = self._calculate_confidence(result['plantnet_suggestions'], result['ai_analysis'] or '')
+        return result
+    
+    async def _call_provider(self, timeout: float, call, *args):
+        """Run a blocking provider call in a worker thread, giving up after timeout seconds"""
+        loop = asyncio.get_running_loop()
+        try:
+            return await asyncio.wait_for(loop.run_in_executor(self._executor, call, *args), timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"no response within {timeout:g}s")
+    
+    def analyze_plant_health(self, image: Union[str, BinaryIO], plant_info: Dict) -> Dict[str, Any]:
         """Analyze plant health from photo"""
         try:
+            prepared = image_preprocessor.prepare(image)
             prompt = f"""
             Analyze this {plant_info.get('name', 'plant')} for health issues. Look for:
             1. Disease symptoms (spots, wilting, discoloration)
@@ -79,7 +126,7 @@ class AIPlantAnalysisService:
             Format response as JSON with: health_score, issues_detected, recommendations, urgency_level
             """
             
-            analysis = self._analyze_with_openai_vision(image_path, prompt)
+            analysis = self._analyze_with_openai_vision(prepared, prompt)
             
             return {
                 'success': True,
@@ -147,62 +194,61 @@ class AIPlantAnalysisService:
             current_app.logger.error(f"Garden recommendation error: {e}")
             return {'success': False, 'error': str(e)}
     
-    def _query_plantnet(self, image_path: str) -> List[Dict]:
-        """Query PlantNet API for plant identification"""
-        if not self.plantnet_api_key:
-            return []
-            
-        try:
-            files = {'images': open(image_path, 'rb')}
-            data = {
-                'organs': 'leaf',  # Can be leaf, flower, fruit, bark
-                'modifiers': 'planted',
-                'language': 'en',
-                'api-key': self.plantnet_api_key
-            }
-            
-            response = requests.post(
-                'https://my-api.plantnet.org/v2/identify/world',
-                files=files,
-                data=data
-            )
-            
-            if response.status_code == 200:
-                return response.json().get('results', [])
-            return []
-            
-        except Exception as e:
-            current_app.logger.error(f"PlantNet API error: {e}")
+    def _query_plantnet(self, image: PreparedImage) -> List[Dict]:
+        """Query PlantNet API for plant identification, blocking"""
+        files = {'images': (f'plant.{image.extension}', image.data, image.mime_type)}
+        data = {
+            'organs': 'leaf',  # Can be leaf, flower, fruit, bark
+            'modifiers': 'planted',
+            'language': 'en'
+        }
+        
+        response = http_client.post(
+            'plantnet', f"{self.plantnet_base_url}/identify/world",
+            params={'api-key': self.plantnet_api_key},
+            files=files,
+            data=data,
+            timeout=(3.05, self.plantnet_timeout)
+        )
+        
+        # PlantNet answers 404 when no species matches
+        if response.status_code == 404:
             return []
+        response.raise_for_status()
+        return response.json().get('results', [])
     
-    def _analyze_with_openai_vision(self, image_path: str, prompt: str) -> str:
-        """Analyze image using OpenAI Vision API"""
-        try:
-            # Encode image to base64
-            with open(image_path, "rb") as image_file:
-                base64_image = base64.b64encode(image_file.read()).decode('utf-8')
-            
-            response = self._get_openai_client().chat.completions.create(
-                model="gpt-4-vision-preview",
-                messages=[
+    def _request_openai_vision(self, image: PreparedImage, prompt: str, max_tokens: int = 1000) -> str:
+        """Send the image and prompt to the OpenAI Vision API, blocking"""
+        api_key = os.getenv('OPENAI_API_KEY')
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY environment variable not set")
+        
+        response = http_client.post(
+            'openai', f"{self.openai_base_url}/chat/completions",
+            headers={'Authorization': f'Bearer {api_key}'},
+            json={
+                'model': self.VISION_MODEL,
+                'messages': [
                     {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}"
-                                }
-                            }
+                        'role': 'user',
+                        'content': [
+                            {'type': 'text', 'text': prompt},
+                            {'type': 'image_url', 'image_url': {'url': image.data_url()}}
                         ]
                     }
                 ],
-                max_tokens=1000
-            )
-            
-            return response.choices[0].message.content
-            
+                'max_tokens': max_tokens
+            },
+            timeout=(3.05, self.vision_timeout)
+        )
+        response.raise_for_status()
+        return response.json()['choices'][0]['message']['content']
+    
+    def _analyze_with_openai_vision(self, image: PreparedImage, prompt: str) -> str:
+        """Analyze image using OpenAI Vision API"""
+        try:
+            return self._request_openai_vision(image, prompt)
+        
         except Exception as e:
             current_app.logger.error(f"OpenAI Vision API error: {e}")
             return "Analysis failed"
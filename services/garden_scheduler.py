@@ -1,9 +1,15 @@
-import requests
+import os
+import asyncio
 import json
+import logging
 from datetime import datetime, date, timedelta
 from typing import List, Dict, Any, Optional
 from models import db, CalendarEvent, PlantPlacement, PlotArea, Plant, PlantType, GardenLocation
 from sqlalchemy import and_
+from services.weather_cache import weather_cache
+from services.http_client import http_client
+
+logger = logging.getLogger(__name__)
 
 class GardenScheduler:
     """
@@ -18,7 +24,9 @@ class GardenScheduler:
     """
     
     def __init__(self):
-        self.weather_api_key = "your_openweather_api_key"  # Configure in environment
+        self.weather_api_key = os.getenv('OPENWEATHER_API_KEY', "your_openweather_api_key")
+        self.weather_base_url = os.getenv('OPENWEATHER_BASE_URL', 'http://api.openweathermap.org/data/2.5').rstrip('/')
+        self.weather_timeout = (3.05, float(os.getenv('OPENWEATHER_TIMEOUT', 10)))  # (connect, read) seconds
         self.plant_care_database = self._load_plant_care_database()
         self.pest_calendar = self._load_pest_calendar()
         
@@ -145,42 +153,49 @@ class GardenScheduler:
             }
         }
     
+    def _fetch_weather(self, endpoint: str, params: Dict) -> Dict:
+        """Blocking GET of an OpenWeather endpoint, run in a worker thread"""
+        response = http_client.get(
+            'openweather', f"{self.weather_base_url}/{endpoint}", params=params, timeout=self.weather_timeout
+        )
+        response.raise_for_status()
+        return response.json()
+    
     async def get_weather_data(self, latitude: float, longitude: float) -> Dict[str, Any]:
-        """Get current weather and 7-day forecast"""
+        """Get current weather and 7-day forecast, cached per weather grid cell"""
         try:
-            # Current weather
-            current_url = f"http://api.openweathermap.org/data/2.5/weather?lat={latitude}&lon={longitude}&appid={self.weather_api_key}&units=metric"
-            
-            # 7-day forecast
-            forecast_url = f"http://api.openweathermap.org/data/2.5/forecast?lat={latitude}&lon={longitude}&appid={self.weather_api_key}&units=metric"
-            
             # For development, return mock data if no API key
             if self.weather_api_key == "your_openweather_api_key":
                 return self._get_mock_weather_data()
             
-            current_response = requests.get(current_url)
-            forecast_response = requests.get(forecast_url)
+            return await weather_cache.get_or_fetch(
+                latitude, longitude, lambda: self._fetch_weather_data(latitude, longitude)
+            )
             
-            if current_response.status_code == 200 and forecast_response.status_code == 200:
-                current_data = current_response.json()
-                forecast_data = forecast_response.json()
-                
-                return {
-                    'current': {
-                        'temperature': current_data['main']['temp'],
-                        'humidity': current_data['main']['humidity'],
-                        'description': current_data['weather'][0]['description'],
-                        'precipitation': current_data.get('rain', {}).get('1h', 0)
-                    },
-                    'forecast': self._process_forecast_data(forecast_data)
-                }
-            else:
-                return self._get_mock_weather_data()
-                
         except Exception as e:
             print(f"Weather API error: {e}")
             return self._get_mock_weather_data()
     
+    async def _fetch_weather_data(self, latitude: float, longitude: float) -> Dict[str, Any]:
+        """Fetch and process current weather and forecast from the API"""
+        params = {'lat': latitude, 'lon': longitude, 'appid': self.weather_api_key, 'units': 'metric'}
+        
+        # Current weather and 7-day forecast, fetched concurrently off the event loop
+        current_data, forecast_data = await asyncio.gather(
+            asyncio.to_thread(self._fetch_weather, 'weather', params),
+            asyncio.to_thread(self._fetch_weather, 'forecast', params)
+        )
+        
+        return {
+            'current': {
+                'temperature': current_data['main']['temp'],
+                'humidity': current_data['main']['humidity'],
+                'description': current_data['weather'][0]['description'],
+                'precipitation': current_data.get('rain', {}).get('1h', 0)
+            },
+            'forecast': self._process_forecast_data(forecast_data)
+        }
+    
     def _get_mock_weather_data(self) -> Dict[str, Any]:
         """Mock weather data for development"""
         return {
@@ -375,30 +390,81 @@ class GardenScheduler:
         
         return all_events
     
-    async def sync_to_database(self, events: List[Dict], user_id: int) -> None:
-        """Save generated events to database"""
-        for event_data in events:
-            # Check if event already exists
-            existing = CalendarEvent.query.filter_by(
-                user_id=user_id,
-                plant_id=event_data.get('plant_id'),
-                event_date=event_data['date'],
-                event_type=event_data['type']
-            ).first()
+    def existing_event_keys(self, user_id: int, keys) -> set:
+        """(plant_id, event_date, event_type) keys among `keys` that the user already has, in one range query"""
+        keys = set(keys)
+        if not keys:
+            return set()
+        
+        event_dates = [key[1] for key in keys]
+        existing = db.session.query(
+            CalendarEvent.plant_id, CalendarEvent.event_date, CalendarEvent.event_type
+        ).filter(
+            CalendarEvent.user_id == user_id,
+            CalendarEvent.event_type.in_({key[2] for key in keys}),
+            CalendarEvent.event_date.between(min(event_dates), max(event_dates))
+        ).all()
+        return keys & {tuple(key) for key in existing}
+    
+    def bulk_insert_events(self, rows: List[Dict]) -> List[tuple]:
+        """
+        Bulk insert generated CalendarEvent rows, returning the (plant_id, event_date, event_type)
+        keys that were inserted. On PostgreSQL and SQLite rows that hit the generated event
+        unique index (e.g. from a concurrent request) are skipped.
+        """
+        table = CalendarEvent.__table__
+        dialect = db.session.get_bind().dialect.name
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        elif dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            insert = None
+        
+        inserted = []
+        created_at = datetime.utcnow()
+        for start in range(0, len(rows), 500):  # Stay below bind parameter limits
+            chunk = [
+                dict(row, completed=False, reminder_sent=False, auto_generated=True, google_sync_pending=True, created_at=created_at)
+                for row in rows[start:start + 500]
+            ]
+            if insert is None:
+                db.session.execute(table.insert(), chunk)
+                inserted.extend((row['plant_id'], row['event_date'], row['event_type']) for row in chunk)
+                continue
             
-            if not existing:
-                event = CalendarEvent(
-                    user_id=user_id,
-                    plant_id=event_data.get('plant_id'),
-                    title=event_data['title'],
-                    description=event_data['description'],
-                    event_date=event_data['date'],
-                    event_type=event_data['type'],
-                    completed=False
-                )
-                db.session.add(event)
+            statement = insert(table).values(chunk).on_conflict_do_nothing().returning(
+                table.c.plant_id, table.c.event_date, table.c.event_type
+            )
+            inserted.extend(tuple(key) for key in db.session.execute(statement))
+        return inserted
+    
+    async def sync_to_database(self, events: List[Dict], user_id: int) -> Dict[str, int]:
+        """Save generated events to database in one transaction, returning inserted and skipped counts"""
+        rows = {}
+        for event_data in events:
+            key = (event_data.get('plant_id'), event_data['date'], event_data['type'])
+            if key not in rows:  # First event wins for a plant, day and type
+                rows[key] = {
+                    'user_id': user_id,
+                    'plant_id': event_data.get('plant_id'),
+                    'title': event_data['title'],
+                    'description': event_data['description'],
+                    'event_date': event_data['date'],
+                    'event_type': event_data['type']
+                }
         
-        db.session.commit()
+        for key in self.existing_event_keys(user_id, rows):
+            del rows[key]
+        
+        try:
+            inserted = self.bulk_insert_events(list(rows.values()))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        
+        return {'inserted': len(inserted), 'skipped': len(events) - len(inserted)}
     
     async def generate_all_garden_schedules(self, user_id: int) -> Dict[int, List[Dict]]:
         """Generate schedules for all plots in user's garden"""
@@ -408,9 +474,11 @@ class GardenScheduler:
         for plot in plots:
             schedule = await self.generate_plot_schedule(plot.id, user_id)
             plot_schedules[plot.id] = schedule
-            
-            # Save to database
-            await self.sync_to_database(schedule, user_id)
+        
+        # Save all plots to database at once
+        all_events = [event for schedule in plot_schedules.values() for event in schedule]
+        counts = await self.sync_to_database(all_events, user_id)
+        logger.info(f"Synced garden schedules for user {user_id}: {counts['inserted']} inserted, {counts['skipped']} skipped")
         
         return plot_schedules
 
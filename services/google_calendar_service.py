@@ -2,15 +2,24 @@ import os
 import json
 import pickle
 import base64
+import time
+import random
+import hashlib
+import threading
+from collections import defaultdict
 from typing import List, Dict, Any, Optional
 from datetime import datetime, date, timedelta
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import Flow
 from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build_from_document
 from googleapiclient.errors import HttpError
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
 from flask import current_app
-from models import CalendarEvent, PlotArea, PlantPlacement, GardenLocation, db, User
+from models import CalendarEvent, Plant, PlotArea, PlantPlacement, GardenLocation, db, User
 
 class GoogleCalendarService:
     """
@@ -30,9 +39,22 @@ class GoogleCalendarService:
         'https://www.googleapis.com/auth/userinfo.profile'
     ]
     
+    # How long a client is reused when the stored credentials have no known expiry
+    CLIENT_MAX_AGE = timedelta(minutes=50)
+    
+    COMPLETED_PREFIX = '✅ '  # Marks completed tasks in Google Calendar
+    
+    # Google allows up to 50 calls per Calendar API batch request
+    BATCH_SIZE = 50
+    BATCH_MAX_RETRIES = 5
+    BATCH_BACKOFF_SECONDS = 1.0
+    
+    _discovery_document = None  # Parsed calendar v3 discovery document, shared by all clients
+    
     def __init__(self):
         self.service = None
         self.credentials = None
+        self._clients = threading.local()  # Clients are not thread-safe, so cache them per thread
     
     def get_authorization_url(self):
         """Get Google OAuth authorization URL for calendar access"""
@@ -83,7 +105,8 @@ class GoogleCalendarService:
             'token_uri': credentials.token_uri,
             'client_id': credentials.client_id,
             'client_secret': credentials.client_secret,
-            'scopes': credentials.scopes
+            'scopes': credentials.scopes,
+            'expiry': credentials.expiry.isoformat() if credentials.expiry else None
         }
         
         # Store as base64 encoded JSON (in production, use proper encryption)
@@ -111,7 +134,8 @@ class GoogleCalendarService:
                 token_uri=creds_dict['token_uri'],
                 client_id=creds_dict['client_id'],
                 client_secret=creds_dict['client_secret'],
-                scopes=creds_dict['scopes']
+                scopes=creds_dict['scopes'],
+                expiry=datetime.fromisoformat(creds_dict['expiry']) if creds_dict.get('expiry') else None
             )
             
             # Check if credentials need refresh
@@ -127,17 +151,273 @@ class GoogleCalendarService:
             return None
     
     def get_service(self, user):
-        """Get authenticated Google Calendar service"""
+        """Get authenticated Google Calendar service, reusing this thread's client until the token expires"""
+        if not user.google_credentials:
+            return None
+        
+        clients = getattr(self._clients, 'by_user', None)
+        if clients is None:
+            clients = self._clients.by_user = {}
+        
+        cached = clients.get(user.id)
+        if cached and cached['fingerprint'] == self._credentials_fingerprint(user) and cached['expires_at'] > datetime.utcnow():
+            return cached['service']
+        
         credentials = self.load_credentials(user)
         if not credentials:
             return None
         
         try:
-            service = build('calendar', 'v3', credentials=credentials)
-            return service
+            service = build_from_document(self._get_discovery_document(), credentials=credentials)
         except Exception as e:
             current_app.logger.error(f"Error building calendar service: {e}")
             return None
+        
+        # Keyed by the stored credentials, which change when the token is refreshed or revoked
+        clients[user.id] = {
+            'fingerprint': self._credentials_fingerprint(user),
+            'expires_at': credentials.expiry - timedelta(minutes=1) if credentials.expiry else datetime.utcnow() + self.CLIENT_MAX_AGE,
+            'service': service
+        }
+        return service
+    
+    def _credentials_fingerprint(self, user):
+        return hashlib.sha256(user.google_credentials.encode()).hexdigest() if user.google_credentials else None
+    
+    def _get_discovery_document(self):
+        """Calendar v3 discovery document, parsed once per process from a static file instead of fetched"""
+        if GoogleCalendarService._discovery_document is None:
+            path = os.getenv('GOOGLE_CALENDAR_DISCOVERY_FILE')
+            if path:
+                with open(path) as discovery_file:
+                    document = discovery_file.read()
+            else:
+                document = discovery_cache.get_static_doc('calendar', 'v3')  # Bundled with google-api-python-client
+            document = json.loads(document)
+            
+            # Point the client (including batch requests) at another server, e.g. a local fake API
+            api_root = os.getenv('GOOGLE_CALENDAR_API_ROOT')
+            if api_root:
+                document['rootUrl'] = api_root.rstrip('/') + '/'
+                document['baseUrl'] = document['rootUrl'] + document['servicePath']
+            GoogleCalendarService._discovery_document = document
+        return GoogleCalendarService._discovery_document
+    
+    def garden_calendar_summary(self, plot_name):
+        """Title of the Google calendar created for a garden plot"""
+        return f'🌱 {plot_name} - Garden Tasks'
+    
+    def ensure_plot_calendars(self, service, user, plots):
+        """
+        Map of plot id to its Google calendar ID, creating calendars only for plots
+        that have none stored yet. Registering a plot adopts a calendar created for it
+        by earlier syncs and deletes the duplicates those syncs left behind.
+        """
+        unregistered = [plot for plot in plots if not plot.google_calendar_id]
+        if unregistered:
+            self._register_plot_calendars(service, user, plots, unregistered)
+        
+        return {plot.id: plot.google_calendar_id for plot in plots if plot.google_calendar_id}
+    
+    def _register_plot_calendars(self, service, user, plots, unregistered):
+        claimed = {plot.google_calendar_id for plot in plots if plot.google_calendar_id}
+        summaries = {self.garden_calendar_summary(plot.name) for plot in unregistered}
+        
+        # Garden calendars from earlier syncs, the one most used by local events first
+        usage = dict(db.session.query(
+            CalendarEvent.google_calendar_id, func.count(CalendarEvent.id)
+        ).filter(
+            CalendarEvent.user_id == user.id,
+            CalendarEvent.google_calendar_id.isnot(None)
+        ).group_by(CalendarEvent.google_calendar_id).all())
+        
+        existing = defaultdict(list)
+        for calendar in self._list_owned_calendars(service):
+            if calendar.get('summary') in summaries and calendar['id'] not in claimed:
+                existing[calendar['summary']].append(calendar['id'])
+        for calendar_ids in existing.values():
+            calendar_ids.sort(key=lambda calendar_id: usage.get(calendar_id, 0), reverse=True)
+        
+        for plot in unregistered:
+            candidates = existing.get(self.garden_calendar_summary(plot.name))
+            plot.google_calendar_id = candidates.pop(0) if candidates else self.create_garden_calendar(user, plot.name)
+        
+        # Whatever is left are duplicates, their events get recreated in the plot calendars
+        duplicates = [calendar_id for calendar_ids in existing.values() for calendar_id in calendar_ids]
+        for calendar_id in duplicates:
+            try:
+                service.calendars().delete(calendarId=calendar_id).execute()
+            except HttpError as e:
+                current_app.logger.warning(f"Error deleting duplicate calendar {calendar_id}: {e}")
+        
+        if duplicates:
+            CalendarEvent.query.filter(
+                CalendarEvent.user_id == user.id,
+                CalendarEvent.google_calendar_id.in_(duplicates)
+            ).update(
+                {'google_event_id': None, 'google_calendar_id': None, 'google_sync_pending': True},
+                synchronize_session='fetch'
+            )
+        db.session.commit()
+    
+    def _list_owned_calendars(self, service):
+        page_token = None
+        while True:
+            page = service.calendarList().list(minAccessRole='owner', pageToken=page_token).execute()
+            yield from page.get('items', [])
+            page_token = page.get('nextPageToken')
+            if not page_token:
+                return
+    
+    def _calendar_exists(self, service, calendar_id):
+        try:
+            service.calendars().get(calendarId=calendar_id).execute()
+            return True
+        except HttpError as e:
+            if e.resp.status in (404, 410):
+                return False
+            raise
+    
+    def _replace_plot_calendar(self, user, plot):
+        """Create a new calendar for a plot whose calendar was deleted in Google and queue its events"""
+        current_app.logger.info(f"Calendar of plot {plot.id} was deleted in Google, creating a new one")
+        old_calendar_id = plot.google_calendar_id
+        plot.google_calendar_id = self.create_garden_calendar(user, plot.name)
+        plot.google_sync_token = None
+        
+        CalendarEvent.query.filter_by(user_id=user.id, google_calendar_id=old_calendar_id).update(
+            {'google_event_id': None, 'google_calendar_id': None, 'google_sync_pending': True},
+            synchronize_session='fetch'
+        )
+        db.session.commit()
+    
+    def _recover_missing_events(self, service, user, plots, missing):
+        """
+        Handle events whose batch call returned 404. If the plot calendar itself was
+        deleted in Google a new one is created; either way the events stay pending
+        and are created again by the next push.
+        """
+        plots_by_calendar = {plot.google_calendar_id: plot for plot in plots}
+        for calendar_id in {calendar_id for _, calendar_id in missing}:
+            plot = plots_by_calendar.get(calendar_id)
+            if plot and not self._calendar_exists(service, calendar_id):
+                self._replace_plot_calendar(user, plot)
+        
+        for calendar_event, _ in missing:
+            calendar_event.google_event_id = None
+            calendar_event.google_calendar_id = None
+        db.session.commit()
+    
+    def pull_remote_changes(self, service, user, plot):
+        """
+        Apply edits made in Google to the plot's calendar since the last pull, using the
+        stored syncToken. The first pull only lists the calendar to obtain a token.
+        Local changes that are still pending win over remote ones, and so does the local
+        date of a generated task moved onto a day that already has the same task.
+        Returns the number of local events changed.
+        """
+        had_token = bool(plot.google_sync_token)
+        params = {'calendarId': plot.google_calendar_id, 'maxResults': 2500}
+        if had_token:
+            params['syncToken'] = plot.google_sync_token
+        
+        items = []
+        page_token = None
+        try:
+            while True:
+                page = service.events().list(pageToken=page_token, **params).execute()
+                items.extend(page.get('items', []))
+                page_token = page.get('nextPageToken')
+                if not page_token:
+                    break
+        except HttpError as e:
+            if e.resp.status == 410 and had_token:
+                # Token expired, start over with a full listing
+                plot.google_sync_token = None
+                return self.pull_remote_changes(service, user, plot)
+            raise
+        
+        plot.google_sync_token = page.get('nextSyncToken')
+        if not had_token or not items:
+            db.session.commit()
+            return 0
+        
+        local_events = {
+            event.google_event_id: event
+            for event in CalendarEvent.query.filter(
+                CalendarEvent.user_id == user.id,
+                CalendarEvent.google_event_id.in_([item['id'] for item in items])
+            ).all()
+        }
+        
+        changed = 0
+        for item in items:
+            event = local_events.get(item['id'])
+            if event is None or event.google_sync_pending:
+                continue
+            
+            if item.get('status') == 'cancelled':
+                # Deleted in Google, keep the local task but stop syncing it
+                event.google_event_id = None
+                event.google_calendar_id = None
+                changed += 1
+                continue
+            
+            summary = item.get('summary', '')
+            completed = summary.startswith(self.COMPLETED_PREFIX)
+            title = summary[len(self.COMPLETED_PREFIX):] if completed else summary
+            start = item.get('start', {})
+            event_date = date.fromisoformat((start.get('date') or start.get('dateTime', ''))[:10] or event.event_date.isoformat())
+            
+            remote = {'title': title, 'description': item.get('description'), 'event_date': event_date, 'completed': completed}
+            if any(getattr(event, field) != value for field, value in remote.items()):
+                try:
+                    with db.session.begin_nested():
+                        for field, value in remote.items():
+                            setattr(event, field, value)
+                except IntegrityError:
+                    # The day already has this generated task: keep the local date and push it back
+                    current_app.logger.info(f"Event {event.id} was moved in Google onto a duplicate task, keeping its date")
+                    remote.pop('event_date')
+                    for field, value in remote.items():
+                        setattr(event, field, value)
+                    event.google_sync_pending = True
+                changed += 1
+        
+        db.session.commit()
+        return changed
+    
+    def _pending_event_calendars(self, user, plot_calendar_map):
+        """
+        (event, calendar ID) pairs of the events changed since they were last pushed.
+        Events of plants without a placement in a plot with a calendar are not read;
+        they stay pending and are pushed once the plant is placed in such a plot.
+        """
+        if not plot_calendar_map:
+            return []
+        placed_plants = db.session.query(PlantPlacement.plant_id).filter(
+            PlantPlacement.plot_id.in_(list(plot_calendar_map))
+        )
+        events = CalendarEvent.query.filter(
+            CalendarEvent.user_id == user.id,
+            CalendarEvent.google_sync_pending.is_(True),
+            CalendarEvent.plant_id.in_(placed_plants)
+        ).options(
+            selectinload(CalendarEvent.plant).selectinload(Plant.placements)
+        ).all()
+        event_calendars = []
+        
+        for event in events:
+            if event.plant and hasattr(event.plant, 'placements') and event.plant.placements:
+                # Find which plot this event belongs to
+                placement = event.plant.placements[0]  # Use first placement
+                if placement.plot_id in plot_calendar_map:
+                    calendar_id = plot_calendar_map[placement.plot_id]
+                    if event.google_calendar_id != calendar_id:
+                        event.google_event_id = None  # Not in this calendar yet, create it there
+                    event_calendars.append((event, calendar_id))
+        
+        return event_calendars
     
     def create_garden_calendar(self, user, plot_name):
         """Create a dedicated calendar for a garden plot"""
@@ -147,7 +427,7 @@ class GoogleCalendarService:
         
         try:
             calendar_body = {
-                'summary': f'🌱 {plot_name} - Garden Tasks',
+                'summary': self.garden_calendar_summary(plot_name),
                 'description': f'Garden care tasks and reminders for {plot_name}',
                 'timeZone': 'UTC'
             }
@@ -176,27 +456,7 @@ class GoogleCalendarService:
             return False
         
         try:
-            # Convert event to Google Calendar format
-            google_event = {
-                'summary': calendar_event.title,
-                'description': calendar_event.description,
-                'start': {
-                    'date': calendar_event.event_date.isoformat(),
-                    'timeZone': 'UTC'
-                },
-                'end': {
-                    'date': calendar_event.event_date.isoformat(),
-                    'timeZone': 'UTC'
-                },
-                'reminders': {
-                    'useDefault': False,
-                    'overrides': [
-                        {'method': 'popup', 'minutes': 480},  # 8 hours before
-                        {'method': 'popup', 'minutes': 60}    # 1 hour before
-                    ]
-                },
-                'colorId': self.get_event_color_id(calendar_event.event_type)
-            }
+            google_event = self.to_google_event(calendar_event)
             
             if calendar_event.google_event_id:
                 # Update existing event
@@ -205,6 +465,8 @@ class GoogleCalendarService:
                     eventId=calendar_event.google_event_id,
                     body=google_event
                 ).execute()
+                calendar_event.google_sync_pending = False
+                db.session.commit()
                 return True
             else:
                 # Create new event
@@ -216,6 +478,7 @@ class GoogleCalendarService:
                 # Update local event with Google IDs
                 calendar_event.google_event_id = created_event['id']
                 calendar_event.google_calendar_id = google_calendar_id
+                calendar_event.google_sync_pending = False
                 db.session.commit()
                 return True
                 
@@ -242,6 +505,123 @@ class GoogleCalendarService:
             current_app.logger.error(f"Error deleting Google event: {e}")
             return False
     
+    def to_google_event(self, calendar_event):
+        """Convert a local calendar event to Google Calendar format"""
+        return {
+            'summary': f'{self.COMPLETED_PREFIX}{calendar_event.title}' if calendar_event.completed else calendar_event.title,
+            'description': calendar_event.description,
+            'start': {
+                'date': calendar_event.event_date.isoformat(),
+                'timeZone': 'UTC'
+            },
+            'end': {
+                'date': calendar_event.event_date.isoformat(),
+                'timeZone': 'UTC'
+            },
+            'reminders': {
+                'useDefault': False,
+                'overrides': [
+                    {'method': 'popup', 'minutes': 480},  # 8 hours before
+                    {'method': 'popup', 'minutes': 60}    # 1 hour before
+                ]
+            },
+            'colorId': self.get_event_color_id(calendar_event.event_type)
+        }
+    
+    def sync_events_batch(self, service, event_calendars):
+        """
+        Sync (calendar_event, google_calendar_id) pairs using HTTP batch requests.
+        Items that fail with a rate limit or server error are retried with exponential
+        backoff; new Google IDs are committed in one transaction at the end.
+        Returns the number of events synced and the items that got a 404.
+        """
+        pending = list(event_calendars)
+        synced = []
+        missing = []
+        
+        for attempt in range(self.BATCH_MAX_RETRIES + 1):
+            if attempt:
+                time.sleep(self.BATCH_BACKOFF_SECONDS * 2 ** (attempt - 1) * random.uniform(1, 1.5))
+            
+            retry = []
+            for start in range(0, len(pending), self.BATCH_SIZE):
+                chunk = pending[start:start + self.BATCH_SIZE]
+                succeeded, failed, not_found = self._execute_event_batch(service, chunk)
+                synced.extend(succeeded)
+                retry.extend(failed)
+                missing.extend(not_found)
+            
+            pending = retry
+            if not pending:
+                break
+        
+        if pending:
+            current_app.logger.error(f"Giving up on {len(pending)} Google Calendar events after {self.BATCH_MAX_RETRIES} retries")
+        
+        # Store the Google IDs of created events
+        for calendar_event, google_calendar_id, google_event_id in synced:
+            calendar_event.google_event_id = google_event_id
+            calendar_event.google_calendar_id = google_calendar_id
+            calendar_event.google_sync_pending = False
+        db.session.commit()
+        
+        return len(synced), missing
+    
+    def _execute_event_batch(self, service, chunk):
+        """Run one batch request, returning (succeeded, retryable failures, not found)"""
+        items = {str(index): item for index, item in enumerate(chunk)}
+        succeeded = []
+        failed = []
+        not_found = []
+        
+        def callback(request_id, response, exception):
+            calendar_event, google_calendar_id = items[request_id]
+            if exception is None:
+                succeeded.append((calendar_event, google_calendar_id, response['id']))
+            elif isinstance(exception, HttpError) and exception.resp.status in (404, 410):
+                not_found.append(items[request_id])
+            elif self._is_retryable(exception):
+                failed.append(items[request_id])
+            else:
+                current_app.logger.error(f"Error syncing event {calendar_event.id} to Google: {exception}")
+        
+        batch = service.new_batch_http_request(callback=callback)
+        for request_id, (calendar_event, google_calendar_id) in items.items():
+            if calendar_event.google_event_id:
+                # Update existing event
+                request = service.events().update(
+                    calendarId=google_calendar_id,
+                    eventId=calendar_event.google_event_id,
+                    body=self.to_google_event(calendar_event)
+                )
+            else:
+                # Create new event
+                request = service.events().insert(
+                    calendarId=google_calendar_id,
+                    body=self.to_google_event(calendar_event)
+                )
+            batch.add(request, request_id=request_id)
+        
+        try:
+            batch.execute()
+        except Exception as e:
+            # The whole batch failed in transit, retry every item that has no response yet
+            current_app.logger.warning(f"Google Calendar batch request failed: {e}")
+            answered = {id(item[0]) for item in succeeded + failed + not_found}
+            failed.extend(item for item in chunk if id(item[0]) not in answered)
+        
+        return succeeded, failed, not_found
+    
+    def _is_retryable(self, exception):
+        """Rate limit and server errors are worth retrying, other errors are not"""
+        if not isinstance(exception, HttpError):
+            return True
+        
+        status = exception.resp.status
+        if status == 403:
+            return b'ratelimitexceeded' in (exception.content or b'').lower()
+        return status == 429 or status >= 500
+    
     def get_event_color_id(self, event_type):
         """Get Google Calendar color ID for different event types"""
         color_map = {
@@ -254,8 +634,11 @@ class GoogleCalendarService:
         }
         return color_map.get(event_type, '1')  # Default to blue
     
-    def sync_all_events(self, user):
-        """Sync all user's calendar events to Google Calendar"""
+    def sync_all_events(self, user, batch=True):
+        """
+        Two-way delta sync with Google Calendar: pull remote edits using sync tokens,
+        then push events changed locally, in HTTP batches unless batch=False
+        """
         if not user.calendar_enabled:
             return False, "Calendar sync not enabled"
         
@@ -264,30 +647,39 @@ class GoogleCalendarService:
             return False, "Unable to connect to Google Calendar"
         
         try:
-            # Get user's plots and create calendars if needed
+            # Get user's plots and their calendars, created only for new plots
             plots = PlotArea.query.filter_by(user_id=user.id).all()
+            plot_calendar_map = self.ensure_plot_calendars(service, user, plots)
             
-            plot_calendar_map = {}
-            
+            # Pull edits made in Google since the last sync
+            pulled_count = 0
             for plot in plots:
-                # Create calendar for this plot
-                calendar_id = self.create_garden_calendar(user, plot.name)
-                if calendar_id:
-                    plot_calendar_map[plot.id] = calendar_id
+                if plot.google_calendar_id:
+                    try:
+                        pulled_count += self.pull_remote_changes(service, user, plot)
+                    except HttpError as e:
+                        if e.resp.status != 404:
+                            raise
+                        self._replace_plot_calendar(user, plot)
+            plot_calendar_map = {plot.id: plot.google_calendar_id for plot in plots if plot.google_calendar_id}
             
-            # Sync events to appropriate calendars
-            events = CalendarEvent.query.filter_by(user_id=user.id).all()
-            synced_count = 0
-            
-            for event in events:
-                if event.plant and hasattr(event.plant, 'placements') and event.plant.placements:
-                    # Find which plot this event belongs to
-                    placement = event.plant.placements[0]  # Use first placement
-                    if placement.plot_id in plot_calendar_map:
-                        calendar_id = plot_calendar_map[placement.plot_id]
-                        if self.sync_event_to_google(user, event, calendar_id):
-                            synced_count += 1
+            # Push events changed locally to their plot calendars
+            event_calendars = self._pending_event_calendars(user, plot_calendar_map)
+            if batch:
+                synced_count, missing = self.sync_events_batch(service, event_calendars)
+                if missing:
+                    self._recover_missing_events(service, user, plots, missing)
+                    plot_calendar_map = {plot.id: plot.google_calendar_id for plot in plots if plot.google_calendar_id}
+                    retried_count, _ = self.sync_events_batch(service, self._pending_event_calendars(user, plot_calendar_map))
+                    synced_count += retried_count
+            else:
+                synced_count = sum(
+                    1 for event, calendar_id in event_calendars
+                    if self.sync_event_to_google(user, event, calendar_id)
+                )
             
+            if pulled_count:
+                return True, f"Successfully synced {synced_count} events to Google Calendar and {pulled_count} changes from it"
             return True, f"Successfully synced {synced_count} events to Google Calendar"
             
         except Exception as e:
@@ -0,0 +1,227 @@
+import os
+import time
+import random
+import bisect
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional, Tuple
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in milliseconds of the latency histogram buckets; the last one is open
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of calling an upstream whose circuit breaker is open"""
+
+class Upstream:
+    """
+    Settings and health of one external integration
+    
+    Each setting can be overridden with HTTP_<NAME>_<SETTING>, e.g.
+    HTTP_PERENUAL_READ_TIMEOUT=5 or HTTP_OPENAI_RETRIES=0.
+    """
+    
+    def __init__(self, name: str, connect_timeout: float = 3.05, read_timeout: float = 10, retries: int = 2,
+                 backoff: float = 0.5, max_backoff: float = 8, failure_threshold: int = 5, reset_after: float = 30):
+        prefix = f"HTTP_{name.upper()}_"
+        self.name = name
+        self.timeout = (float(os.getenv(prefix + 'CONNECT_TIMEOUT', connect_timeout)),
+                        float(os.getenv(prefix + 'READ_TIMEOUT', read_timeout)))
+        self.retries = int(os.getenv(prefix + 'RETRIES', retries))
+        self.backoff = float(os.getenv(prefix + 'BACKOFF', backoff))
+        self.max_backoff = float(os.getenv(prefix + 'MAX_BACKOFF', max_backoff))
+        self.failure_threshold = int(os.getenv(prefix + 'FAILURE_THRESHOLD', failure_threshold))
+        self.reset_after = float(os.getenv(prefix + 'RESET_AFTER', reset_after))
+        
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_running = False
+        self._latency_counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self._latency_total_ms = 0.0
+        self._outcomes: Dict[str, int] = {}
+    
+    def state(self) -> str:
+        if self._opened_at is None:
+            return 'closed'
+        return 'half_open' if time.monotonic() - self._opened_at >= self.reset_after else 'open'
+    
+    def allow_request(self) -> bool:
+        """Closed lets everything through; half-open lets a single trial call through"""
+        with self._lock:
+            state = self.state()
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+    
+    def record(self, outcome: str, elapsed: float, failed: bool) -> None:
+        """Count one attempt in the histograms and update the circuit breaker"""
+        elapsed_ms = elapsed * 1000
+        with self._lock:
+            self._latency_counts[bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+            self._latency_total_ms += elapsed_ms
+            self._outcomes[outcome] = self._outcomes.get(outcome, 0) + 1
+            
+            self._trial_running = False
+            if not failed:
+                self._failures = 0
+                self._opened_at = None
+                return
+            self._failures += 1
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning(f"Circuit for {self.name} opened after {self._failures} failures")
+                self._opened_at = time.monotonic()
+    
+    def count(self, outcome: str) -> None:
+        """Count an outcome that made no call, like a request refused by the open circuit"""
+        with self._lock:
+            self._outcomes[outcome] = self._outcomes.get(outcome, 0) + 1
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = sum(self._latency_counts)
+            labels = [f"le_{bound}ms" for bound in LATENCY_BUCKETS_MS] + [f"gt_{LATENCY_BUCKETS_MS[-1]}ms"]
+            return {
+                'circuit': self.state(),
+                'consecutive_failures': self._failures,
+                'calls': calls,
+                'mean_latency_ms': round(self._latency_total_ms / calls, 1) if calls else None,
+                'latency_ms': dict(zip(labels, self._latency_counts)),
+                'outcomes': dict(self._outcomes)
+            }
+
+class HttpClient:
+    """
+    Shared HTTP client for all outbound integrations
+    
+    One requests.Session keeps a keep-alive connection pool per host, so
+    repeated calls to an API skip the TCP and TLS handshakes. Each named
+    upstream has its own timeouts, retries with full-jitter exponential
+    backoff (connection errors, 429 and 503 answers unless their Retry-After
+    exceeds max_backoff, and read timeouts and 502/504 answers of idempotent
+    requests), a circuit breaker that fails fast after consecutive failures,
+    and latency and outcome histograms.
+    """
+    
+    RETRY_STATUSES = {429, 503}  # The request was not processed
+    GATEWAY_STATUSES = {502, 504}  # It may have been, like a read timeout
+    IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+    
+    def __init__(self):
+        self.pool_size = int(os.getenv('HTTP_POOL_SIZE', 16))
+        self.upstreams: Dict[str, Upstream] = {}
+        self._session = None
+        self._lock = threading.Lock()
+        
+        self.register('openai', read_timeout=30, retries=1)
+        self.register('plantnet', read_timeout=10, retries=1)
+        self.register('perenual', read_timeout=10)
+        self.register('trefle', read_timeout=10)
+        self.register('openweather', read_timeout=float(os.getenv('OPENWEATHER_TIMEOUT', 10)), retries=1)
+    
+    def register(self, name: str, **settings) -> Upstream:
+        """Add or replace an upstream with the given defaults"""
+        upstream = Upstream(name, **settings)
+        self.upstreams[name] = upstream
+        return upstream
+    
+    def _get_session(self) -> requests.Session:
+        """Lazy initialization of the pooled session"""
+        with self._lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=len(self.upstreams) * 2,
+                                                        pool_maxsize=self.pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._session = session
+            return self._session
+    
+    def get(self, upstream: str, url: str, **kwargs) -> requests.Response:
+        return self.request(upstream, 'GET', url, **kwargs)
+    
+    def post(self, upstream: str, url: str, **kwargs) -> requests.Response:
+        return self.request(upstream, 'POST', url, **kwargs)
+    
+    def request(self, upstream: str, method: str, url: str, timeout: Optional[Tuple[float, float]] = None,
+                **kwargs) -> requests.Response:
+        """
+        Send a request to a named upstream, retrying transient failures.
+        Returns the final response whatever its status, like requests does, and
+        raises the last connection error or timeout, or CircuitOpenError.
+        """
+        config = self.upstreams[upstream]
+        method = method.upper()
+        timeout = timeout or config.timeout
+        
+        attempt = 0
+        while True:
+            if not config.allow_request():
+                config.count('circuit_open')
+                raise CircuitOpenError(f"{upstream} is unavailable (circuit open), not calling {url}")
+            
+            started = time.perf_counter()
+            try:
+                response = self._get_session().request(method, url, timeout=timeout, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                config.record(type(e).__name__, time.perf_counter() - started, failed=True)
+                # A read timeout may mean the request was processed, only repeat it if that is harmless
+                retryable = method in self.IDEMPOTENT_METHODS or not isinstance(e, requests.exceptions.ReadTimeout)
+                if attempt < config.retries and retryable:
+                    self._sleep(config, attempt)
+                    attempt += 1
+                    continue
+                raise
+            except requests.exceptions.RequestException as e:
+                # Invalid URL and the like: not the upstream's fault, but it ends a half-open trial
+                config.record(type(e).__name__, time.perf_counter() - started, failed=False)
+                raise
+            
+            config.record(str(response.status_code), time.perf_counter() - started, failed=response.status_code >= 500)
+            retryable = response.status_code in self.RETRY_STATUSES or (
+                response.status_code in self.GATEWAY_STATUSES and method in self.IDEMPOTENT_METHODS
+            )
+            if retryable and attempt < config.retries:
+                retry_after = self.retry_after(response)
+                if retry_after is not None and retry_after > config.max_backoff:
+                    # E.g. a used up daily quota; retrying sooner is doomed, let the caller fall back
+                    return response
+                self._sleep(config, attempt, retry_after)
+                response.close()
+                attempt += 1
+                continue
+            return response
+    
+    @staticmethod
+    def retry_after(response: requests.Response) -> Optional[float]:
+        """Seconds the server asked to wait in Retry-After, None when it did not say"""
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(float(value), 0)
+        except ValueError:
+            try:
+                return max(parsedate_to_datetime(value).timestamp() - time.time(), 0)
+            except (TypeError, ValueError):
+                return None
+    
+    def _sleep(self, config: Upstream, attempt: int, delay: Optional[float] = None) -> None:
+        """Full-jitter exponential backoff, unless the server said how long to wait"""
+        if delay is None:
+            delay = random.uniform(0, min(config.max_backoff, config.backoff * 2 ** attempt))
+        time.sleep(delay)
+    
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Circuit state, latency histogram and outcome counts per upstream"""
+        return {name: upstream.stats() for name, upstream in self.upstreams.items()}
+
+# Global client instance
+http_client = HttpClient()
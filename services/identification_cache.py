@@ -0,0 +1,169 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+HASH_BITS = 64
+BANDS = 8  # The hash is indexed as 8 bands of 8 bits
+BAND_BITS = HASH_BITS // BANDS
+
+def hamming(a: int, b: int) -> int:
+    return ((a ^ b) & ((1 << HASH_BITS) - 1)).bit_count()
+
+def _signed(value: int) -> int:
+    """SQLite integers are signed 64-bit"""
+    return value - (1 << HASH_BITS) if value >= 1 << (HASH_BITS - 1) else value
+
+class IdentificationCache:
+    """
+    Plant identification results keyed by a perceptual hash of the photo
+    
+    Lookups match any stored photo within IDENTIFICATION_CACHE_MAX_DISTANCE
+    bits of the photo's difference hash, for the same prompt and model. Two
+    hashes that close agree exactly on at least one of the eight indexed
+    8-bit bands, so up to a distance of 7 only rows sharing a band are compared.
+    Entries live in an SQLite file shared by the worker processes of one host,
+    evicted least recently used first once their results exceed
+    IDENTIFICATION_CACHE_MAX_BYTES. Hits and misses are counted in the same file.
+    """
+    
+    def __init__(self):
+        self.path = os.getenv('IDENTIFICATION_CACHE_PATH', 'identification_cache.db')
+        self.max_distance = int(os.getenv('IDENTIFICATION_CACHE_MAX_DISTANCE', 4))
+        self.max_bytes = int(os.getenv('IDENTIFICATION_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+        self.enabled = self.max_bytes > 0
+        self._local = threading.local()
+        self._created = False
+    
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')  # Losing the last results in a crash is fine
+            connection.create_function('hamming', 2, hamming, deterministic=True)
+            self._local.connection = connection
+            if not self._created:
+                self._create_tables(connection)
+                self._created = True
+        return connection
+    
+    def _create_tables(self, connection: sqlite3.Connection) -> None:
+        bands = ', '.join(f'band{i} INTEGER NOT NULL' for i in range(BANDS))
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS identification_cache (id INTEGER PRIMARY KEY, namespace TEXT NOT NULL, '
+            f'hash INTEGER NOT NULL, {bands}, result TEXT NOT NULL, size INTEGER NOT NULL, used_at REAL NOT NULL)'
+        )
+        for i in range(BANDS):
+            connection.execute(
+                f'CREATE INDEX IF NOT EXISTS ix_identification_cache_band{i} ON identification_cache (namespace, band{i})'
+            )
+        connection.execute('CREATE INDEX IF NOT EXISTS ix_identification_cache_used ON identification_cache (used_at)')
+        connection.execute('CREATE TABLE IF NOT EXISTS identification_cache_stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+    
+    def namespace(self, prompt: str, model: str) -> str:
+        """Results only apply to the prompt and model version that produced them"""
+        return hashlib.sha256(f'{model}\n{prompt}'.encode('utf-8')).hexdigest()[:32]
+    
+    def _bands(self, image_hash: int):
+        return [(image_hash >> (i * BAND_BITS)) & ((1 << BAND_BITS) - 1) for i in range(BANDS)]
+    
+    def get(self, image_hash: int, prompt: str, model: str) -> Optional[Dict[str, Any]]:
+        """Result of the closest cached photo within max_distance, or None"""
+        if not self.enabled:
+            return None
+        try:
+            connection = self._connection()
+            namespace = self.namespace(prompt, model)
+            if self.max_distance < BANDS:
+                # One index search per band; SQLite does not use the band indexes for an OR of them
+                candidates = ' UNION '.join(
+                    f'SELECT id FROM identification_cache WHERE namespace = ? AND band{i} = ?' for i in range(BANDS)
+                )
+                bands = [value for band in self._bands(image_hash) for value in (namespace, band)]
+                row = connection.execute(
+                    f'SELECT id, result FROM identification_cache WHERE id IN ({candidates}) '
+                    'AND hamming(hash, ?) <= ? ORDER BY hamming(hash, ?) LIMIT 1',
+                    (*bands, _signed(image_hash), self.max_distance, _signed(image_hash))
+                ).fetchone()
+            else:
+                row = connection.execute(
+                    'SELECT id, result FROM identification_cache WHERE namespace = ? '
+                    'AND hamming(hash, ?) <= ? ORDER BY hamming(hash, ?) LIMIT 1',
+                    (namespace, _signed(image_hash), self.max_distance, _signed(image_hash))
+                ).fetchone()
+            
+            if row is None:
+                self._count(connection, 'misses')
+                return None
+            connection.execute('UPDATE identification_cache SET used_at = ? WHERE id = ?', (time.time(), row[0]))
+            self._count(connection, 'hits')
+            return json.loads(row[1])
+        except Exception as e:
+            logger.warning(f"Identification cache read failed: {e}")
+            return None
+    
+    def set(self, image_hash: int, prompt: str, model: str, result: Dict[str, Any]) -> None:
+        """Store a result, then evict the least recently used ones over max_bytes"""
+        if not self.enabled:
+            return
+        try:
+            connection = self._connection()
+            value = json.dumps(result)
+            columns = ', '.join(f'band{i}' for i in range(BANDS))
+            connection.execute(
+                f'INSERT INTO identification_cache (namespace, hash, {columns}, result, size, used_at) '
+                f'VALUES (?, ?, {", ".join("?" * BANDS)}, ?, ?, ?)',
+                (self.namespace(prompt, model), _signed(image_hash), *self._bands(image_hash),
+                 value, len(value), time.time())
+            )
+            if self._count(connection, 'size_bytes', len(value)) <= self.max_bytes:
+                return
+            connection.execute(
+                'DELETE FROM identification_cache WHERE id IN (SELECT id FROM '
+                '(SELECT id, SUM(size) OVER (ORDER BY used_at DESC, id DESC) AS total FROM identification_cache) '
+                'WHERE total > ?)',
+                (self.max_bytes,)
+            )
+            connection.execute(
+                "UPDATE identification_cache_stats SET value = (SELECT COALESCE(SUM(size), 0) FROM identification_cache) "
+                "WHERE name = 'size_bytes'"
+            )
+        except Exception as e:
+            logger.warning(f"Identification cache write failed: {e}")
+    
+    def _count(self, connection: sqlite3.Connection, name: str, amount: int = 1) -> int:
+        """Add to a shared counter, returning its new value"""
+        return connection.execute(
+            'INSERT INTO identification_cache_stats (name, value) VALUES (?, ?) '
+            'ON CONFLICT (name) DO UPDATE SET value = value + excluded.value RETURNING value',
+            (name, amount)
+        ).fetchall()[0][0]  # Step the statement to completion so the write is not left open
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit and miss counters and the current size of the cache"""
+        if not self.enabled:
+            return {'enabled': False}
+        connection = self._connection()
+        counters = dict(connection.execute('SELECT name, value FROM identification_cache_stats').fetchall())
+        entries = connection.execute('SELECT COUNT(*) FROM identification_cache').fetchone()[0]
+        hits, misses = counters.get('hits', 0), counters.get('misses', 0)
+        return {
+            'enabled': True,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 3) if hits + misses else None,
+            'entries': entries,
+            'size_bytes': counters.get('size_bytes', 0),
+            'max_bytes': self.max_bytes,
+            'max_distance': self.max_distance
+        }
+
+# Global cache instance
+identification_cache = IdentificationCache()
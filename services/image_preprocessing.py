@@ -0,0 +1,116 @@
+import io
+import os
+import base64
+import logging
+from typing import BinaryIO, NamedTuple, Tuple, Union
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+class PreparedImage(NamedTuple):
+    """Downscaled, re-encoded photo ready to send to a vision API"""
+    data: bytes
+    mime_type: str
+    size: Tuple[int, int]
+    original_size: Tuple[int, int]
+    dhash: int  # 64-bit difference hash, equal or close for near-identical photos
+    
+    @property
+    def extension(self) -> str:
+        return self.mime_type.split('/')[1].replace('jpeg', 'jpg')
+    
+    def base64(self) -> str:
+        return base64.b64encode(self.data).decode('ascii')
+    
+    def data_url(self) -> str:
+        return f"data:{self.mime_type};base64,{self.base64()}"
+
+class ImagePreprocessor:
+    """
+    Shrinks uploaded photos to the resolution the vision models actually use
+    
+    OpenAI vision scales images to fit 2048 px and then to 768 px on the short
+    side, so anything bigger only costs upload time and memory. The upload is
+    decoded straight from its stream: JPEGs are decoded at a reduced DCT scale
+    (Image.draft) and other formats are shrunk with Image.reduce before the
+    final resample. The result is rotated upright, stripped of EXIF and other
+    metadata and re-encoded until it fits IMAGE_MAX_BYTES.
+    """
+    
+    FORMATS = {'jpeg': ('JPEG', 'image/jpeg'), 'webp': ('WEBP', 'image/webp')}
+    MIN_QUALITY = 50
+    
+    def __init__(self):
+        self.max_short_side = int(os.getenv('IMAGE_MAX_SHORT_SIDE', 768))
+        self.max_long_side = int(os.getenv('IMAGE_MAX_LONG_SIDE', 2048))
+        self.max_bytes = int(os.getenv('IMAGE_MAX_BYTES', 512 * 1024))
+        self.quality = int(os.getenv('IMAGE_QUALITY', 85))
+        image_format = os.getenv('IMAGE_FORMAT', 'jpeg').lower()
+        if image_format not in self.FORMATS:
+            raise ValueError(f"Unknown IMAGE_FORMAT: {image_format}")
+        self.format, self.mime_type = self.FORMATS[image_format]
+    
+    def target_size(self, size: Tuple[int, int]) -> Tuple[int, int]:
+        """Largest size with the same aspect ratio that fits both side limits"""
+        width, height = size
+        scale = min(1.0, self.max_short_side / min(width, height), self.max_long_side / max(width, height))
+        return max(1, round(width * scale)), max(1, round(height * scale))
+    
+    def prepare(self, source: Union[str, BinaryIO]) -> PreparedImage:
+        """Decode a photo from a path or file object and return it downscaled and re-encoded"""
+        try:
+            image = Image.open(source)
+            original_size = image.size
+            # Let the JPEG decoder skip detail we would throw away; a no-op for other formats
+            image.draft('RGB', self.target_size(image.size))
+            image = ImageOps.exif_transpose(image)
+        except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+            raise ValueError(f"Unsupported or corrupt image: {e}") from e
+        
+        image = self._to_rgb(image)
+        target = self.target_size(image.size)
+        if image.size != target:
+            image = image.resize(target, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        
+        data = self._encode(image)
+        return PreparedImage(data, self.mime_type, image.size, original_size, self.dhash(image))
+    
+    def dhash(self, image: Image.Image) -> int:
+        """Difference hash: one bit per horizontally adjacent pair of a 9x8 grayscale thumbnail"""
+        pixels = list(image.convert('L').resize((9, 8), Image.Resampling.BOX).getdata())
+        value = 0
+        for row in range(8):
+            for column in range(8):
+                value = (value << 1) | (pixels[row * 9 + column] > pixels[row * 9 + column + 1])
+        return value
+    
+    def _to_rgb(self, image: Image.Image) -> Image.Image:
+        """Flatten transparency onto white, as the models expect opaque photos"""
+        if image.mode == 'RGB':
+            return image
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            return background
+        return image.convert('RGB')
+    
+    def _encode(self, image: Image.Image) -> bytes:
+        """Encode without metadata, lowering quality and then size until under max_bytes"""
+        quality = self.quality
+        while True:
+            buffer = io.BytesIO()
+            image.save(buffer, self.format, quality=quality, optimize=True)
+            if buffer.tell() <= self.max_bytes:
+                return buffer.getvalue()
+            
+            if quality > self.MIN_QUALITY:
+                quality = max(self.MIN_QUALITY, quality - 10)
+            elif min(image.size) > 64:
+                image = image.resize((image.width * 3 // 4, image.height * 3 // 4), Image.Resampling.LANCZOS)
+            else:
+                logger.warning(f"Image still {buffer.tell()} bytes at {image.size}, sending as is")
+                return buffer.getvalue()
+
+# Global preprocessor instance
+image_preprocessor = ImagePreprocessor()
@@ -0,0 +1,161 @@
+import os
+import socket
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+from models import db, Job
+
+logger = logging.getLogger(__name__)
+
+class JobQueue:
+    """
+    Persistent background job queue backed by the application database
+    
+    Workers (worker.py) claim jobs with a conditional UPDATE and hold them
+    under a lease. A job whose worker dies is claimed again once the lease
+    expires, so delivery is at-least-once and handlers must be safe to run
+    twice. Failed jobs are retried with backoff up to max_attempts.
+    Enqueueing a kind that is already queued for the user returns that job.
+    """
+    
+    RETRY_BACKOFF = timedelta(seconds=30)  # Doubled after every failed attempt
+    
+    def __init__(self):
+        self.handlers: Dict[str, Callable[[Job], Any]] = {}
+        self.lease = timedelta(seconds=int(os.getenv('JOB_LEASE_SECONDS', 600)))
+        self.max_attempts = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+        self.poll_interval = float(os.getenv('JOB_POLL_INTERVAL', 1.0))
+        # Run jobs in the request that enqueues them, for development without a worker
+        self.run_inline = os.getenv('JOB_QUEUE_INLINE', 'false').lower() == 'true'
+    
+    def handler(self, kind: str):
+        """Register the function running jobs of a kind; it gets the Job and returns a JSON result"""
+        def register(function):
+            self.handlers[kind] = function
+            return function
+        return register
+    
+    def enqueue(self, user_id: int, kind: str, payload: Dict = None) -> Job:
+        """Queue a job, or return the job of this kind already queued for the user"""
+        job = self._queued_job(user_id, kind)
+        if job is None:
+            job = Job(user_id=user_id, kind=kind, payload=payload, status='queued', max_attempts=self.max_attempts)
+            try:
+                with db.session.begin_nested():
+                    db.session.add(job)
+            except IntegrityError:
+                # A concurrent request queued the same job first
+                job = self._queued_job(user_id, kind)
+            db.session.commit()
+        
+        if self.run_inline:
+            claimed = self.claim('inline', job_id=job.id)
+            if claimed:
+                self.run(claimed)
+        return job
+    
+    def get_job(self, job_id: int, user_id: int) -> Optional[Job]:
+        return Job.query.filter_by(id=job_id, user_id=user_id).first()
+    
+    def claim(self, worker_id: str, job_id: int = None) -> Optional[Job]:
+        """Atomically take the next due job (or the given one), None if there is none"""
+        now = datetime.utcnow()
+        claimable = or_(
+            and_(Job.status == 'queued', Job.run_after <= now),
+            and_(Job.status == 'running', Job.locked_until < now)  # Worker died or hung
+        )
+        
+        query = db.session.query(Job.id).filter(claimable)
+        if job_id is not None:
+            query = query.filter(Job.id == job_id)
+        candidates = [row.id for row in query.order_by(Job.run_after, Job.id).limit(10)]
+        
+        for candidate in candidates:
+            # Only one worker's UPDATE can match while the job is still claimable
+            claimed = Job.query.filter(Job.id == candidate, claimable).update({
+                'status': 'running',
+                'locked_by': worker_id,
+                'locked_until': now + self.lease,
+                'attempts': Job.attempts + 1,
+                'started_at': now
+            }, synchronize_session=False)
+            db.session.commit()
+            if claimed:
+                return db.session.get(Job, candidate, populate_existing=True)
+        return None
+    
+    def run(self, job: Job) -> None:
+        """Run a claimed job and record its outcome"""
+        handler = self.handlers.get(job.kind)
+        try:
+            if handler is None:
+                raise ValueError(f"No handler registered for job kind {job.kind}")
+            if job.attempts > job.max_attempts:
+                raise RuntimeError(f"Lease expired after {job.max_attempts} attempts")
+            result = handler(job)
+        except Exception as e:
+            logger.exception(f"Job {job.id} ({job.kind}) failed on attempt {job.attempts}")
+            db.session.rollback()
+            self._record_failure(job, e)
+        else:
+            job.status = 'succeeded'
+            job.result = result
+            job.error = None
+            self._release(job)
+        db.session.commit()
+    
+    def work(self, app, concurrency: int = None, stop_event: threading.Event = None) -> None:
+        """Run worker threads until stop_event is set (or forever)"""
+        concurrency = concurrency or int(os.getenv('JOB_WORKER_CONCURRENCY', 2))
+        stop_event = stop_event or threading.Event()
+        worker_prefix = f"{socket.gethostname()}:{os.getpid()}"
+        
+        threads = [
+            threading.Thread(target=self._work_loop, args=(app, f"{worker_prefix}:{number}", stop_event), daemon=True)
+            for number in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        logger.info(f"Job worker {worker_prefix} started with {concurrency} threads")
+        
+        for thread in threads:
+            thread.join()
+    
+    def _work_loop(self, app, worker_id: str, stop_event: threading.Event) -> None:
+        while not stop_event.is_set():
+            try:
+                with app.app_context():
+                    job = self.claim(worker_id)
+                    if job:
+                        self.run(job)
+                        continue
+            except Exception as e:
+                logger.exception(f"Job worker {worker_id} error: {e}")
+            stop_event.wait(self.poll_interval)
+    
+    def _queued_job(self, user_id: int, kind: str) -> Optional[Job]:
+        return Job.query.filter_by(user_id=user_id, kind=kind, status='queued').first()
+    
+    def _record_failure(self, job: Job, error: Exception) -> None:
+        job = db.session.get(Job, job.id, populate_existing=True)
+        job.error = str(error)
+        
+        # Retry unless out of attempts, or a newer job of the same kind is already queued
+        if job.attempts < job.max_attempts and self._queued_job(job.user_id, job.kind) is None:
+            job.status = 'queued'
+            job.run_after = datetime.utcnow() + self.RETRY_BACKOFF * 2 ** (job.attempts - 1)
+        else:
+            job.status = 'failed'
+        self._release(job)
+    
+    def _release(self, job: Job) -> None:
+        job.locked_by = None
+        job.locked_until = None
+        if job.status in ('succeeded', 'failed'):
+            job.finished_at = datetime.utcnow()
+
+# Global queue instance
+job_queue = JobQueue()
@@ -0,0 +1,160 @@
+import logging
+from typing import Dict, List, Optional
+from sqlalchemy.orm.attributes import flag_modified
+from models import db, GardenPlot, LayoutAnalysis, Plant, PlantType
+from services.plant_data_service import plant_data_service
+
+logger = logging.getLogger(__name__)
+
+class LayoutAnalysisCache:
+    """
+    Persisted garden layout analysis per user
+    
+    The analysis is stored together with the layout state it was rendered
+    from, so a garden plot change only re-checks that plot's neighbours and
+    reading the analysis is a single row lookup. A full recompute is used
+    when there is no usable state and to verify the incremental result.
+    """
+    
+    def get_analysis(self, user_id: int) -> LayoutAnalysis:
+        """Cached analysis, recomputed if missing or built from older companion data"""
+        record = LayoutAnalysis.query.filter_by(user_id=user_id).first()
+        if record is None or record.compatibility_version != plant_data_service.compatibility_version:
+            record = self.recompute(user_id)
+        return record
+    
+    def recompute(self, user_id: int) -> LayoutAnalysis:
+        """Analyse the whole garden from scratch and store the result"""
+        plants = self._positioned_plants(user_id)
+        state = plant_data_service.build_layout_state(plants, orders=[plant['order'] for plant in plants])
+        
+        record = LayoutAnalysis.query.filter_by(user_id=user_id).first()
+        if record is None:
+            record = LayoutAnalysis(user_id=user_id)
+            db.session.add(record)
+        self._store(record, state)
+        return record
+    
+    def verify(self, user_id: int) -> bool:
+        """Compare the cached analysis with a full recompute, keeping the recomputed one"""
+        record = LayoutAnalysis.query.filter_by(user_id=user_id).first()
+        cached_analysis = record.analysis if record else None
+        
+        record = self.recompute(user_id)
+        consistent = cached_analysis is None or cached_analysis == record.analysis
+        if not consistent:
+            logger.warning(f"Incremental layout analysis for user {user_id} drifted from a full recompute")
+        return consistent
+    
+    def invalidate(self, user_id: int) -> None:
+        """Drop the cached analysis, it is rebuilt on the next read"""
+        LayoutAnalysis.query.filter_by(user_id=user_id).delete()
+    
+    def plot_snapshot(self, plot: GardenPlot, user_id: int) -> Optional[Dict]:
+        """What the layout analysis sees of a garden plot, None if it holds no plant of the user"""
+        plant = db.session.get(Plant, plot.plant_id) if plot.plant_id else None
+        if plant is None or plant.user_id != user_id or plant.plant_type is None:
+            return None
+        
+        return {
+            'plant_name': plant.plant_type.name,
+            'order': plot.id,
+            'x': plot.x_position * 12,  # Convert to inches
+            'y': plot.y_position * 12
+        }
+    
+    def apply_change(self, user_id: int, before: Optional[Dict], after: Optional[Dict]) -> None:
+        """
+        Update the cached analysis for one plot change.
+        before/after are plot_snapshot() results from either side of the change
+        (None for a created or deleted plot); the change must already be flushed.
+        Locks the user's analysis row until commit, so concurrent plot changes
+        are applied one after the other to the latest committed state.
+        """
+        if before == after:
+            return
+        
+        record = LayoutAnalysis.query.filter_by(user_id=user_id).with_for_update().populate_existing().first()
+        if record is None or record.compatibility_version != plant_data_service.compatibility_version:
+            return  # Nothing usable to update, the next read recomputes
+        
+        try:
+            with db.session.begin_nested():
+                state = record.state
+                if before:
+                    self._remove_plant(user_id, state, before)
+                if after:
+                    self._add_plant(user_id, state, after)
+                self._store(record, state)
+        except Exception as e:
+            logger.error(f"Incremental layout analysis failed for user {user_id}: {e}")
+            self.invalidate(user_id)
+    
+    def _add_plant(self, user_id: int, state: Dict, plant: Dict) -> None:
+        plant_data_service.add_layout_plant(state, plant['plant_name'], plant['order'], plant['x'], plant['y'])
+        
+        if plant_data_service.get_companion_planting_info(plant['plant_name']):
+            neighbours = self._positioned_plants(user_id, near=plant)
+            plant_data_service.add_layout_conflicts(state, plant, neighbours)
+    
+    def _remove_plant(self, user_id: int, state: Dict, plant: Dict) -> None:
+        plant_data_service.remove_layout_conflicts(state, plant['order'])
+        
+        entry = state['plants'].get(plant['plant_name'])
+        if entry is None:
+            raise ValueError(f"{plant['plant_name']} is missing from the cached layout state")
+        
+        entry['count'] -= 1
+        if entry['count'] == 0:
+            del state['plants'][plant['plant_name']]
+            return
+        
+        # Refill the first two plants of this name if the removed plant was one of them
+        second = entry['second'] or {}
+        if plant['order'] in (entry['first']['order'], second.get('order')):
+            remaining = self._positioned_plants(user_id, plant_name=plant['plant_name'], exclude=plant['order'], limit=2)
+            entry['first'] = {key: remaining[0][key] for key in ('order', 'x', 'y')}
+            entry['second'] = {key: remaining[1][key] for key in ('order', 'x', 'y')} if len(remaining) > 1 else None
+    
+    def _positioned_plants(self, user_id: int, plant_name: str = None, exclude: int = None,
+                           near: Dict = None, limit: int = None) -> List[Dict]:
+        """Garden plots holding one of the user's plants, in plot id order"""
+        query = db.session.query(
+            GardenPlot.id, GardenPlot.x_position, GardenPlot.y_position, PlantType.name
+        ).join(
+            Plant, Plant.id == GardenPlot.plant_id
+        ).join(
+            PlantType, PlantType.id == Plant.plant_type_id
+        ).filter(Plant.user_id == user_id)
+        
+        if plant_name is not None:
+            query = query.filter(PlantType.name == plant_name)
+        if exclude is not None:
+            query = query.filter(GardenPlot.id != exclude)
+        if near is not None:
+            # Bounding box in grid units, one inch wider to absorb rounding
+            radius = (plant_data_service.layout_spacing_radius() + 1) / 12
+            x, y = near['x'] / 12, near['y'] / 12
+            query = query.filter(
+                GardenPlot.x_position.between(x - radius, x + radius),
+                GardenPlot.y_position.between(y - radius, y + radius)
+            )
+        
+        query = query.order_by(GardenPlot.id)
+        if limit is not None:
+            query = query.limit(limit)
+        
+        return [
+            {'plant_name': name, 'order': plot_id, 'x': x_position * 12, 'y': y_position * 12}
+            for plot_id, x_position, y_position, name in query.all()
+        ]
+    
+    def _store(self, record: LayoutAnalysis, state: Dict) -> None:
+        record.state = state
+        flag_modified(record, 'state')  # State is usually mutated in place
+        record.analysis = plant_data_service.render_layout_analysis(state)
+        record.total_plants = sum(entry['count'] for entry in state['plants'].values())
+        record.compatibility_version = plant_data_service.compatibility_version
+
+# Global cache instance
+layout_analysis_cache = LayoutAnalysisCache()
@@ -1,26 +1,55 @@
-import requests
 import os
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, NamedTuple, Optional, Tuple
 from datetime import datetime, timedelta
+import hashlib
 import json
 import logging
+import math
+from services.http_client import http_client
+from services.plant_info_cache import plant_info_cache
+from services.rate_limiter import rate_limiter
+
+# NumPy is optional; without it the layout analyser uses the pure Python grid
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class PairCompatibility(NamedTuple):
+    """Precomputed, distance-independent compatibility of two species"""
+    compatible: bool
+    score: int
+    required_distance: float
+    warnings: Tuple[str, ...]
+    benefits: Tuple[str, ...]
+    shared_pests: frozenset
+    shared_diseases: frozenset
+
 class PlantDataService:
     """
     Service for fetching plant data from external APIs and providing 
     companion planting intelligence.
     """
     
+    # Gardens at least this large are analysed with NumPy when it is installed
+    NUMPY_LAYOUT_THRESHOLD = int(os.getenv('NUMPY_LAYOUT_THRESHOLD', 500))
+    # Distance blocks for the NumPy engine: rows per block and max rows x columns
+    NUMPY_ROW_BLOCK = 256
+    NUMPY_BLOCK_ELEMENTS = 1_000_000
+    
     def __init__(self):
         # External API configurations
         self.perenual_api_key = os.getenv('PERENUAL_API_KEY')  # Free tier available
         self.trefle_api_key = os.getenv('TREFLE_API_KEY')      # Free tier available
+        self.perenual_base_url = os.getenv('PERENUAL_BASE_URL', 'https://perenual.com/api').rstrip('/')
+        self.trefle_base_url = os.getenv('TREFLE_BASE_URL', 'https://trefle.io/api/v1').rstrip('/')
         
         # Companion planting data (comprehensive database)
+        # Assigning it also builds the species-pair compatibility matrix
         self.companion_data = self._load_companion_data()
         
         # Plant care schedules and problem indicators
@@ -233,9 +262,116 @@ class PlantDataService:
             }
         }
     
+    @property
+    def companion_data(self) -> Dict:
+        return self._companion_data
+    
+    @companion_data.setter
+    def companion_data(self, data: Dict):
+        self._companion_data = data
+        self._build_compatibility_matrix()
+    
+    def update_companion_data(self, plant_name: str, plant_data: Dict) -> None:
+        """Add or replace one plant's companion data and rebuild the matrix"""
+        companion_data = dict(self._companion_data)
+        companion_data[self._species_key(plant_name)] = plant_data
+        self.companion_data = companion_data
+    
+    @staticmethod
+    def _species_key(plant_name: str) -> str:
+        """Normalise a plant name into a companion_data key"""
+        return plant_name.lower().replace(' ', '_')
+    
+    def _build_compatibility_matrix(self) -> None:
+        """
+        Precompute compatibility for every species pair in companion_data.
+        check_plant_compatibility then only needs an index lookup.
+        Changes to companion_data must go through the property (or
+        update_companion_data) so the matrix and version stay in sync.
+        """
+        species = list(self._companion_data)
+        self.species_index = {key: index for index, key in enumerate(species)}
+        self.compatibility_matrix = [
+            [self._compute_pair_compatibility(key1, key2) for key2 in species]
+            for key1 in species
+        ]
+        
+        # Dense copy of the required distances for batch lookups
+        self.required_distance_table = None
+        if np is not None:
+            self.required_distance_table = np.array(
+                [[entry.required_distance for entry in row] for row in self.compatibility_matrix],
+                dtype=float
+            ).reshape(len(species), len(species))
+        
+        # Stable across processes, so it can be persisted alongside cached results
+        serialized = json.dumps(self._companion_data, sort_keys=True, default=str)
+        self.compatibility_version = hashlib.sha1(serialized.encode()).hexdigest()[:12]
+    
+    def _compute_pair_compatibility(self, plant1_key: str, plant2_key: str) -> PairCompatibility:
+        """Distance-independent compatibility between two companion_data entries"""
+        plant1_data = self._companion_data[plant1_key]
+        plant2_data = self._companion_data[plant2_key]
+        
+        compatible = True
+        score = 0
+        warnings = []
+        benefits = []
+        
+        # Check if plant2 is in plant1's good companions
+        if plant2_key in plant1_data.get('good_companions', []):
+            score += 5
+            benefits.append(plant1_data.get('reasons', {}).get(plant2_key, 'Good companion plant'))
+        
+        # Check if plant2 is in plant1's bad companions
+        if plant2_key in plant1_data.get('bad_companions', []):
+            compatible = False
+            score -= 5
+            warnings.append(plant1_data.get('reasons', {}).get(plant2_key, 'Incompatible companion plants'))
+        
+        # Check reverse compatibility
+        if plant1_key in plant2_data.get('good_companions', []):
+            score += 5
+            benefits.append(plant2_data.get('reasons', {}).get(plant1_key, 'Mutually beneficial'))
+        
+        if plant1_key in plant2_data.get('bad_companions', []):
+            compatible = False
+            score -= 5
+            warnings.append(plant2_data.get('reasons', {}).get(plant1_key, 'Plants negatively affect each other'))
+        
+        # Spacing requirement, applied by the caller once a distance is known
+        plant1_spacing = plant1_data.get('spacing_requirements', {})
+        plant2_spacing = plant2_data.get('spacing_requirements', {})
+        plant1_min = plant1_spacing.get('preferred_distance', plant1_spacing.get('min_distance', 0))
+        plant2_min = plant2_spacing.get('preferred_distance', plant2_spacing.get('min_distance', 0))
+        
+        # Check for shared pest/disease vulnerabilities
+        shared_pests = set(plant1_data.get('pest_warnings', [])).intersection(plant2_data.get('pest_warnings', []))
+        if shared_pests:
+            warnings.append(f"Shared pest vulnerabilities: {', '.join(shared_pests)}")
+            score -= 1
+        
+        shared_diseases = set(plant1_data.get('disease_warnings', [])).intersection(plant2_data.get('disease_warnings', []))
+        if shared_diseases:
+            warnings.append(f"Shared disease vulnerabilities: {', '.join(shared_diseases)}")
+            score -= 1
+        
+        return PairCompatibility(
+            compatible=compatible,
+            score=score,
+            required_distance=max(plant1_min, plant2_min),
+            warnings=tuple(warnings),
+            benefits=tuple(benefits),
+            shared_pests=frozenset(shared_pests),
+            shared_diseases=frozenset(shared_diseases)
+        )
+    
     async def get_plant_info_from_apis(self, plant_name: str) -> Dict:
         """
         Fetch comprehensive plant information from external APIs
+        
+        The API part comes from plant_info_cache, so repeated lookups of a
+        species skip the Perenual and Trefle calls.
         """
         plant_info = {
             'name': plant_name,
@@ -246,25 +382,13 @@ class PlantDataService:
             'api_sources': []
         }
         
-        # Try Perenual API first (good for detailed plant care)
-        if self.perenual_api_key:
-            try:
-                perenual_data = await self._fetch_from_perenual(plant_name)
-                if perenual_data:
-                    plant_info.update(perenual_data)
-                    plant_info['api_sources'].append('perenual')
-            except Exception as e:
-                logger.warning(f"Perenual API error for {plant_name}: {e}")
-        
-        # Try Trefle API for botanical information
-        if self.trefle_api_key:
+        if self.perenual_api_key or self.trefle_api_key:
             try:
-                trefle_data = await self._fetch_from_trefle(plant_name)
-                if trefle_data:
-                    plant_info.update(trefle_data)
-                    plant_info['api_sources'].append('trefle')
+                api_info = await plant_info_cache.get_or_fetch(plant_name, self.fetch_api_plant_info)
+                if api_info:
+                    plant_info.update(api_info)
             except Exception as e:
-                logger.warning(f"Trefle API error for {plant_name}: {e}")
+                logger.warning(f"External plant info unavailable for {plant_name}: {e}")
         
         # Enrich with our companion planting data
         companion_info = self.get_companion_planting_info(plant_name.lower())
@@ -278,90 +402,132 @@ class PlantDataService:
         
         return plant_info
     
+    async def fetch_api_plant_info(self, plant_name: str) -> Optional[Dict]:
+        """
+        Query the configured APIs for a plant, bypassing the cache.
+        Returns None when none of them knows the name, lists the providers that
+        failed under 'api_errors', and raises when all of them failed.
+        """
+        plant_info = {'api_sources': [], 'api_errors': []}
+        providers = [
+            ('perenual', self.perenual_api_key, self._fetch_from_perenual),  # Good for detailed plant care
+            ('trefle', self.trefle_api_key, self._fetch_from_trefle)         # Botanical information
+        ]
+        
+        for provider, api_key, fetch in providers:
+            if not api_key:
+                continue
+            try:
+                data = await fetch(plant_name)
+            except Exception as e:
+                logger.warning(f"{provider.capitalize()} API error for {plant_name}: {e}")
+                plant_info['api_errors'].append(provider)
+                continue
+            if data:
+                plant_info.update(data)
+                plant_info['api_sources'].append(provider)
+        
+        if not plant_info['api_sources']:
+            if plant_info['api_errors']:
+                raise RuntimeError(f"{', '.join(plant_info['api_errors'])} lookup failed")
+            return None
+        return plant_info
+    
+    async def _get_within_quota(self, provider: str, url: str, params: Dict):
+        """
+        GET from a quota-limited API once rate_limiter grants a token.
+        Raises RateLimitExceeded without calling when none comes in time, so the
+        caller falls back to cached or local data; a 429 pauses all workers.
+        """
+        await rate_limiter.acquire(provider)
+        response = http_client.get(provider, url, params=params)
+        if response.status_code == 429:
+            rate_limiter.exhausted(provider, http_client.retry_after(response))
+        response.raise_for_status()
+        return response
+    
     async def _fetch_from_perenual(self, plant_name: str) -> Optional[Dict]:
-        """Fetch data from Perenual Plant API"""
-        try:
-            # Search for plant
-            search_url = f"https://perenual.com/api/species-list"
-            params = {
-                'key': self.perenual_api_key,
-                'q': plant_name,
-                'indoor': 0  # Focus on garden plants
-            }
+        """Fetch data from Perenual Plant API, None when it has no match"""
+        # Search for plant
+        search_url = f"{self.perenual_base_url}/species-list"
+        params = {
+            'key': self.perenual_api_key,
+            'q': plant_name,
+            'indoor': 0  # Focus on garden plants
+        }
+        
+        response = await self._get_within_quota('perenual', search_url, params)
+        
+        data = response.json()
+        if data.get('data') and len(data['data']) > 0:
+            plant = data['data'][0]  # Take first match
             
-            response = requests.get(search_url, params=params, timeout=10)
-            response.raise_for_status()
+            # Get detailed information
+            detail_url = f"{self.perenual_base_url}/species/details/{plant['id']}"
+            detail_params = {'key': self.perenual_api_key}
             
-            data = response.json()
-            if data.get('data') and len(data['data']) > 0:
-                plant = data['data'][0]  # Take first match
-                
-                # Get detailed information
-                detail_url = f"https://perenual.com/api/species/details/{plant['id']}"
-                detail_params = {'key': self.perenual_api_key}
-                
-                detail_response = requests.get(detail_url, params=detail_params, timeout=10)
-                detail_response.raise_for_status()
-                detail_data = detail_response.json()
-                
-                return {
-                    'scientific_name': plant.get('scientific_name', []),
-                    'common_names': plant.get('common_name', ''),
-                    'cycle': plant.get('cycle', ''),
-                    'watering': plant.get('watering', ''),
-                    'sunlight': plant.get('sunlight', []),
-                    'care_level': detail_data.get('care_level', ''),
-                    'growth_rate': detail_data.get('growth_rate', ''),
-                    'hardiness': detail_data.get('hardiness', {}),
-                    'propagation': detail_data.get('propagation', []),
-                    'pruning_month': detail_data.get('pruning_month', [])
-                }
-        except Exception as e:
-            logger.error(f"Error fetching from Perenual API: {e}")
-            return None
+            detail_response = await self._get_within_quota('perenual', detail_url, detail_params)
+            detail_data = detail_response.json()
+            
+            return {
+                'scientific_name': plant.get('scientific_name', []),
+                'common_names': plant.get('common_name', ''),
+                'cycle': plant.get('cycle', ''),
+                'watering': plant.get('watering', ''),
+                'sunlight': plant.get('sunlight', []),
+                'care_level': detail_data.get('care_level', ''),
+                'growth_rate': detail_data.get('growth_rate', ''),
+                'hardiness': detail_data.get('hardiness', {}),
+                'propagation': detail_data.get('propagation', []),
+                'pruning_month': detail_data.get('pruning_month', [])
+            }
+        return None
     
     async def _fetch_from_trefle(self, plant_name: str) -> Optional[Dict]:
-        """Fetch data from Trefle API"""
-        try:
-            search_url = "https://trefle.io/api/v1/plants/search"
-            params = {
-                'token': self.trefle_api_key,
-                'q': plant_name,
-                'limit': 1
-            }
-            
-            response = requests.get(search_url, params=params, timeout=10)
-            response.raise_for_status()
+        """Fetch data from Trefle API, None when it has no match"""
+        search_url = f"{self.trefle_base_url}/plants/search"
+        params = {
+            'token': self.trefle_api_key,
+            'q': plant_name,
+            'limit': 1
+        }
+        
+        response = await self._get_within_quota('trefle', search_url, params)
+        
+        data = response.json()
+        if data.get('data') and len(data['data']) > 0:
+            plant = data['data'][0]
             
-            data = response.json()
-            if data.get('data') and len(data['data']) > 0:
-                plant = data['data'][0]
-                
-                return {
-                    'scientific_name': plant.get('scientific_name', ''),
-                    'family': plant.get('family', ''),
-                    'genus': plant.get('genus', ''),
-                    'year': plant.get('year', ''),
-                    'bibliography': plant.get('bibliography', ''),
-                    'author': plant.get('author', ''),
-                    'status': plant.get('status', ''),
-                    'rank': plant.get('rank', ''),
-                    'family_common_name': plant.get('family_common_name', '')
-                }
-        except Exception as e:
-            logger.error(f"Error fetching from Trefle API: {e}")
-            return None
+            return {
+                'scientific_name': plant.get('scientific_name', ''),
+                'family': plant.get('family', ''),
+                'genus': plant.get('genus', ''),
+                'year': plant.get('year', ''),
+                'bibliography': plant.get('bibliography', ''),
+                'author': plant.get('author', ''),
+                'status': plant.get('status', ''),
+                'rank': plant.get('rank', ''),
+                'family_common_name': plant.get('family_common_name', '')
+            }
+        return None
     
     def get_companion_planting_info(self, plant_name: str) -> Optional[Dict]:
         """Get companion planting information for a plant"""
-        plant_key = plant_name.lower().replace(' ', '_')
-        return self.companion_data.get(plant_key)
+        return self.companion_data.get(self._species_key(plant_name))
     
     def get_care_schedule(self, plant_name: str) -> Optional[Dict]:
         """Get care schedule for a plant"""
         plant_key = plant_name.lower().replace(' ', '_')
         return self.care_schedules.get(plant_key)
     
+    def get_pair_compatibility(self, plant1: str, plant2: str) -> Optional[PairCompatibility]:
+        """Look up the precomputed compatibility of two plants, None without data"""
+        index1 = self.species_index.get(self._species_key(plant1))
+        index2 = self.species_index.get(self._species_key(plant2))
+        if index1 is None or index2 is None:
+            return None
+        return self.compatibility_matrix[index1][index2]
+    
     def check_plant_compatibility(self, plant1: str, plant2: str, distance_inches: float = None) -> Dict:
         """
         Check compatibility between two plants
@@ -376,77 +542,121 @@ class PlantDataService:
             'spacing_issues': []
         }
         
-        plant1_data = self.get_companion_planting_info(plant1.lower())
-        plant2_data = self.get_companion_planting_info(plant2.lower())
-        
-        if not plant1_data or not plant2_data:
+        pair = self.get_pair_compatibility(plant1, plant2)
+        if pair is None:
             result['warnings'].append("Limited companion planting data available")
             return result
         
-        # Check direct compatibility
-        plant1_key = plant1.lower().replace(' ', '_')
-        plant2_key = plant2.lower().replace(' ', '_')
-        
-        # Check if plant2 is in plant1's good companions
-        if plant2_key in plant1_data.get('good_companions', []):
-            result['compatibility_score'] += 5
-            result['benefits'].append(plant1_data.get('reasons', {}).get(plant2_key, 'Good companion plant'))
-        
-        # Check if plant2 is in plant1's bad companions
-        if plant2_key in plant1_data.get('bad_companions', []):
-            result['compatible'] = False
-            result['compatibility_score'] -= 5
-            result['warnings'].append(plant1_data.get('reasons', {}).get(plant2_key, 'Incompatible companion plants'))
-        
-        # Check reverse compatibility
-        if plant1_key in plant2_data.get('good_companions', []):
-            result['compatibility_score'] += 5
-            result['benefits'].append(plant2_data.get('reasons', {}).get(plant1_key, 'Mutually beneficial'))
-        
-        if plant1_key in plant2_data.get('bad_companions', []):
-            result['compatible'] = False
-            result['compatibility_score'] -= 5
-            result['warnings'].append(plant2_data.get('reasons', {}).get(plant1_key, 'Plants negatively affect each other'))
+        result['compatible'] = pair.compatible
+        result['compatibility_score'] = pair.score
+        result['warnings'] = list(pair.warnings)
+        result['benefits'] = list(pair.benefits)
         
         # Check spacing requirements
         if distance_inches:
-            plant1_spacing = plant1_data.get('spacing_requirements', {})
-            plant2_spacing = plant2_data.get('spacing_requirements', {})
+            result['recommended_distance'] = pair.required_distance
             
-            plant1_min = plant1_spacing.get('preferred_distance', plant1_spacing.get('min_distance', 0))
-            plant2_min = plant2_spacing.get('preferred_distance', plant2_spacing.get('min_distance', 0))
-            
-            required_distance = max(plant1_min, plant2_min)
-            result['recommended_distance'] = required_distance
-            
-            if distance_inches < required_distance:
-                result['spacing_issues'].append(f"Plants too close. Recommended distance: {required_distance} inches")
+            if distance_inches < pair.required_distance:
+                result['spacing_issues'].append(f"Plants too close. Recommended distance: {pair.required_distance} inches")
                 result['compatibility_score'] -= 2
         
-        # Check for shared pest/disease vulnerabilities
-        plant1_pests = set(plant1_data.get('pest_warnings', []))
-        plant2_pests = set(plant2_data.get('pest_warnings', []))
-        shared_pests = plant1_pests.intersection(plant2_pests)
+        return result
+    
+    def analyze_garden_layout(self, plant_positions: List[Dict], engine: str = None) -> Dict:
+        """
+        Analyze an entire garden layout for compatibility issues
+        plant_positions: [{'plant_name': str, 'x': float, 'y': float, 'id': str}, ...]
+        engine: 'grid' or 'numpy', picked from the garden size when omitted
+
+        Companion effects only depend on the two species involved, so they are
+        scored once per plant name pair and multiplied by the number of plant
+        pairs. Spacing is the only distance-dependent check and is limited to
+        neighbours, found through a spatial grid or NumPy distance blocks.
+        """
+        return self.render_layout_analysis(self.build_layout_state(plant_positions, engine))
+    
+    def build_layout_state(self, plant_positions: List[Dict], engine: str = None, orders: List[int] = None) -> Dict:
+        """
+        Reduce a layout to what its analysis depends on: per plant name, the
+        plant count and the first two plants, plus every spacing conflict.
+        The state is JSON serialisable and can be updated one plant at a time.
+        orders: ascending sort key for each plant, defaults to its list index
+        """
+        if engine is None:
+            use_numpy = np is not None and len(plant_positions) >= self.NUMPY_LAYOUT_THRESHOLD
+            engine = 'numpy' if use_numpy else 'grid'
+        if engine == 'numpy' and np is None:
+            raise ValueError("The numpy layout engine requires NumPy to be installed")
+        if orders is None:
+            orders = list(range(len(plant_positions)))
         
-        if shared_pests:
-            result['warnings'].append(f"Shared pest vulnerabilities: {', '.join(shared_pests)}")
-            result['compatibility_score'] -= 1
+        state = {'plants': {}, 'conflicts': []}
+        for plant, order in zip(plant_positions, orders):
+            self.add_layout_plant(state, plant['plant_name'], order, plant['x'], plant['y'])
         
-        plant1_diseases = set(plant1_data.get('disease_warnings', []))
-        plant2_diseases = set(plant2_data.get('disease_warnings', []))
-        shared_diseases = plant1_diseases.intersection(plant2_diseases)
+        if engine == 'numpy':
+            spacing_conflicts = self._find_spacing_conflicts_numpy(plant_positions)
+        else:
+            spacing_conflicts = self._find_spacing_conflicts(plant_positions)
         
-        if shared_diseases:
-            result['warnings'].append(f"Shared disease vulnerabilities: {', '.join(shared_diseases)}")
-            result['compatibility_score'] -= 1
+        for i, j, distance, required_distance in spacing_conflicts:
+            state['conflicts'].append([
+                orders[i], orders[j],
+                plant_positions[i]['plant_name'], plant_positions[j]['plant_name'],
+                distance, required_distance
+            ])
+        return state
+    
+    def add_layout_plant(self, state: Dict, plant_name: str, order: int, x: float, y: float) -> None:
+        """Count a plant in a layout state, tracking the first two plants per name"""
+        position = {'order': order, 'x': x, 'y': y}
+        entry = state['plants'].get(plant_name)
+        if entry is None:
+            state['plants'][plant_name] = {'count': 1, 'first': position, 'second': None}
+            return
         
-        return result
+        entry['count'] += 1
+        if order < entry['first']['order']:
+            entry['second'] = entry['first']
+            entry['first'] = position
+        elif entry['second'] is None or order < entry['second']['order']:
+            entry['second'] = position
     
-    def analyze_garden_layout(self, plant_positions: List[Dict]) -> Dict:
+    def add_layout_conflicts(self, state: Dict, plant: Dict, neighbours: List[Dict]) -> None:
         """
-        Analyze an entire garden layout for compatibility issues
-        plant_positions: [{'plant_name': str, 'x': float, 'y': float, 'id': str}, ...]
+        Record spacing conflicts between one plant and nearby plants.
+        plant and neighbours: {'plant_name': str, 'order': int, 'x': float, 'y': float}
         """
+        for neighbour in neighbours:
+            if neighbour['order'] == plant['order']:
+                continue
+            pair = self.get_pair_compatibility(plant['plant_name'], neighbour['plant_name'])
+            if pair is None:
+                continue
+            
+            plant1, plant2 = sorted((plant, neighbour), key=lambda item: item['order'])
+            distance = self._distance(plant1, plant2)
+            if distance and distance < pair.required_distance:
+                state['conflicts'].append([
+                    plant1['order'], plant2['order'],
+                    plant1['plant_name'], plant2['plant_name'],
+                    distance, pair.required_distance
+                ])
+    
+    def remove_layout_conflicts(self, state: Dict, order: int) -> None:
+        """Drop every spacing conflict involving one plant"""
+        state['conflicts'] = [
+            conflict for conflict in state['conflicts']
+            if conflict[0] != order and conflict[1] != order
+        ]
+    
+    def layout_spacing_radius(self) -> float:
+        """Largest distance at which two plants can have a spacing conflict"""
+        size = len(self.compatibility_matrix)
+        return max([self.compatibility_matrix[index][index].required_distance for index in range(size)] or [0])
+    
+    def render_layout_analysis(self, state: Dict) -> Dict:
+        """Turn a layout state into the analysis returned by analyze_garden_layout"""
         analysis = {
             'overall_score': 0,
             'compatibility_issues': [],
@@ -455,45 +665,37 @@ class PlantDataService:
             'critical_warnings': []
         }
         
-        # Check each pair of plants
-        for i, plant1 in enumerate(plant_positions):
-            for j, plant2 in enumerate(plant_positions[i+1:], i+1):
-                # Calculate distance (assuming coordinates are in inches)
-                distance = ((plant1['x'] - plant2['x'])**2 + (plant1['y'] - plant2['y'])**2)**0.5
-                
-                compatibility = self.check_plant_compatibility(
-                    plant1['plant_name'], 
-                    plant2['plant_name'], 
-                    distance
-                )
-                
-                analysis['overall_score'] += compatibility['compatibility_score']
-                
-                if not compatibility['compatible']:
-                    analysis['critical_warnings'].append({
-                        'plant1': plant1['plant_name'],
-                        'plant2': plant2['plant_name'],
-                        'distance': distance,
-                        'issues': compatibility['warnings']
-                    })
-                
-                if compatibility['spacing_issues']:
-                    analysis['compatibility_issues'].extend([
-                        {
-                            'plant1': plant1['plant_name'],
-                            'plant2': plant2['plant_name'],
-                            'issue': issue
-                        } for issue in compatibility['spacing_issues']
-                    ])
-                
-                if compatibility['benefits']:
-                    analysis['benefits'].extend([
-                        {
-                            'plant1': plant1['plant_name'],
-                            'plant2': plant2['plant_name'],
-                            'benefit': benefit
-                        } for benefit in compatibility['benefits']
-                    ])
+        # Companion benefits and conflicts, aggregated by plant name pair
+        for plant1, plant2, pair_count in self._plant_name_pairs(state['plants']):
+            compatibility = self.check_plant_compatibility(plant1['plant_name'], plant2['plant_name'])
+            analysis['overall_score'] += compatibility['compatibility_score'] * pair_count
+            
+            if not compatibility['compatible']:
+                analysis['critical_warnings'].append({
+                    'plant1': plant1['plant_name'],
+                    'plant2': plant2['plant_name'],
+                    'distance': self._distance(plant1, plant2),
+                    'issues': compatibility['warnings'],
+                    'count': pair_count
+                })
+            
+            analysis['benefits'].extend([
+                {
+                    'plant1': plant1['plant_name'],
+                    'plant2': plant2['plant_name'],
+                    'benefit': benefit,
+                    'count': pair_count
+                } for benefit in compatibility['benefits']
+            ])
+        
+        # Spacing issues between neighbouring plants
+        for order1, order2, plant1_name, plant2_name, distance, required_distance in sorted(state['conflicts']):
+            analysis['overall_score'] -= 2
+            analysis['compatibility_issues'].append({
+                'plant1': plant1_name,
+                'plant2': plant2_name,
+                'issue': f"Plants too close. Recommended distance: {required_distance} inches"
+            })
         
         # Generate recommendations
         if analysis['critical_warnings']:
@@ -507,6 +709,165 @@ class PlantDataService:
         
         return analysis
     
+    def _plant_name_pairs(self, plants: Dict) -> List[Tuple[Dict, Dict, int]]:
+        """
+        Group all plant pairs by plant name.
+        Returns (plant1, plant2, pair_count) for every name pair, where plant1 and
+        plant2 are the first pair of plants with those names in layout order.
+        """
+        names = sorted(plants, key=lambda name: plants[name]['first']['order'])
+        pairs = []
+        for a, name1 in enumerate(names):
+            entry1 = plants[name1]
+            first1 = dict(entry1['first'], plant_name=name1)
+            if entry1['count'] > 1:
+                second1 = dict(entry1['second'], plant_name=name1)
+                pairs.append((first1, second1, entry1['count'] * (entry1['count'] - 1) // 2))
+            for name2 in names[a+1:]:
+                entry2 = plants[name2]
+                first2 = dict(entry2['first'], plant_name=name2)
+                pairs.append((first1, first2, entry1['count'] * entry2['count']))
+        
+        pairs.sort(key=lambda pair: (pair[0]['order'], pair[1]['order']))
+        return pairs
+    
+    def _find_spacing_conflicts(self, plant_positions: List[Dict]) -> List[Tuple[int, int, float, float]]:
+        """
+        Find plant pairs closer than their recommended distance.
+        Plants are bucketed into a grid whose cells are as wide as the largest
+        spacing requirement, so only plants in adjacent cells are compared.
+        Returns (i, j, distance, required_distance) sorted by (i, j).
+        """
+        species = {}
+        for name in {plant['plant_name'] for plant in plant_positions}:
+            species[name] = self.species_index.get(self._species_key(name))
+        
+        # A species paired with itself needs exactly its own preferred distance
+        cell_size = max([
+            self.compatibility_matrix[index][index].required_distance
+            for index in species.values() if index is not None
+        ] or [0])
+        if cell_size <= 0:
+            return []
+        
+        grid = {}
+        for index, plant in enumerate(plant_positions):
+            if species[plant['plant_name']] is None:
+                continue
+            cell = (math.floor(plant['x'] / cell_size), math.floor(plant['y'] / cell_size))
+            grid.setdefault(cell, []).append(index)
+        
+        conflicts = []
+        for (cell_x, cell_y), members in grid.items():
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    neighbours = grid.get((cell_x + dx, cell_y + dy))
+                    if not neighbours:
+                        continue
+                    for i in members:
+                        plant1 = plant_positions[i]
+                        row = self.compatibility_matrix[species[plant1['plant_name']]]
+                        for j in neighbours:
+                            if j <= i:
+                                continue
+                            plant2 = plant_positions[j]
+                            distance = self._distance(plant1, plant2)
+                            required_distance = row[species[plant2['plant_name']]].required_distance
+                            # A zero distance is treated as "unknown", like check_plant_compatibility does
+                            if distance and distance < required_distance:
+                                conflicts.append((i, j, distance, required_distance))
+        
+        conflicts.sort()
+        return conflicts
+    
+    def _find_spacing_conflicts_numpy(self, plant_positions: List[Dict]) -> List[Tuple[int, int, float, float]]:
+        """
+        NumPy version of _find_spacing_conflicts.
+        Plants are sorted by x so each block of rows only needs the columns
+        within the largest spacing requirement; blocks are capped at
+        NUMPY_BLOCK_ELEMENTS entries to keep memory bounded. Required
+        distances are gathered from required_distance_table in batch.
+        """
+        indexes = []
+        species = []
+        for index, plant in enumerate(plant_positions):
+            species_index = self.species_index.get(self._species_key(plant['plant_name']))
+            if species_index is not None:
+                indexes.append(index)
+                species.append(species_index)
+        if len(indexes) < 2:
+            return []
+        
+        indexes = np.array(indexes)
+        species = np.array(species)
+        max_distance = self.required_distance_table[species, species].max()
+        if max_distance <= 0:
+            return []
+        
+        xs = np.array([plant_positions[index]['x'] for index in indexes], dtype=float)
+        ys = np.array([plant_positions[index]['y'] for index in indexes], dtype=float)
+        order = np.argsort(xs, kind='stable')
+        indexes, species, xs, ys = indexes[order], species[order], xs[order], ys[order]
+        
+        count = len(indexes)
+        row_block = min(count, self.NUMPY_ROW_BLOCK)
+        column_block = max(1, self.NUMPY_BLOCK_ELEMENTS // row_block)
+        max_squared = max_distance * max_distance
+        found_i, found_j, found_distance = [], [], []
+        
+        for row_start in range(0, count, row_block):
+            row_stop = min(row_start + row_block, count)
+            # Columns past this x cannot be within the largest spacing requirement
+            column_limit = np.searchsorted(xs, xs[row_stop - 1] + max_distance, side='right')
+            rows = np.arange(row_start, row_stop)
+            
+            for column_start in range(row_start, column_limit, column_block):
+                column_stop = min(column_start + column_block, column_limit)
+                columns = np.arange(column_start, column_stop)
+                
+                dx = xs[rows, None] - xs[None, columns]
+                dy = ys[rows, None] - ys[None, columns]
+                squared = dx * dx + dy * dy
+                
+                # Upper triangle only; zero distances are "unknown" as in check_plant_compatibility
+                near = (columns[None, :] > rows[:, None]) & (squared > 0) & (squared < max_squared)
+                row_hits, column_hits = np.nonzero(near)
+                if not len(row_hits):
+                    continue
+                
+                hit_rows = rows[row_hits]
+                hit_columns = columns[column_hits]
+                distance = np.sqrt(squared[row_hits, column_hits])
+                required = self.required_distance_table[species[hit_rows], species[hit_columns]]
+                too_close = distance < required
+                found_i.append(indexes[hit_rows[too_close]])
+                found_j.append(indexes[hit_columns[too_close]])
+                found_distance.append(distance[too_close])
+        
+        if not found_i:
+            return []
+        
+        first = np.concatenate(found_i)
+        second = np.concatenate(found_j)
+        distances = np.concatenate(found_distance)
+        i = np.minimum(first, second)
+        j = np.maximum(first, second)
+        order = np.lexsort((j, i))
+        
+        # Map back to plain Python values; the matrix keeps required distances as
+        # declared, so messages read "24 inches" rather than "24.0 inches"
+        species_by_index = dict(zip(indexes.tolist(), species.tolist()))
+        conflicts = []
+        for first_index, second_index, distance in zip(i[order].tolist(), j[order].tolist(), distances[order].tolist()):
+            pair = self.compatibility_matrix[species_by_index[first_index]][species_by_index[second_index]]
+            conflicts.append((first_index, second_index, distance, pair.required_distance))
+        return conflicts
+    
+    @staticmethod
+    def _distance(plant1: Dict, plant2: Dict) -> float:
+        """Distance between two positioned plants (coordinates are in inches)"""
+        return ((plant1['x'] - plant2['x'])**2 + (plant1['y'] - plant2['y'])**2)**0.5
+    
     def get_seasonal_care_reminders(self, plant_name: str, current_date: datetime = None) -> List[Dict]:
         """
         Get care reminders based on plant type and current season
@@ -0,0 +1,188 @@
+import os
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+from flask import current_app
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from models import db, ExternalPlantInfo
+
+logger = logging.getLogger(__name__)
+
+# Looks up a normalised plant name: its data, None when no API knows the name, or raises when the APIs could not answer
+Fetch = Callable[[str], Awaitable[Optional[Dict[str, Any]]]]
+
+class PlantInfoCache:
+    """
+    External API plant info per species, shared by all users and workers
+    
+    Entries are keyed by the normalised plant name and stored in the
+    application database. They are fresh for PLANT_INFO_TTL seconds (30 days).
+    For PLANT_INFO_STALE_TTL seconds after that they are still served, while
+    one worker, holding a lease on the row, refreshes them in the background.
+    Names no API knows, and results missing a provider that failed, are kept
+    for PLANT_INFO_NEGATIVE_TTL seconds (1 day). Lookups that fail are not
+    stored; an expired entry is served instead when there is one.
+    """
+    
+    REFRESH_LEASE = timedelta(minutes=5)  # A refresh not finished by then may be claimed again
+    
+    def __init__(self):
+        self.ttl = timedelta(seconds=int(os.getenv('PLANT_INFO_TTL', 30 * 24 * 60 * 60)))
+        self.stale_ttl = timedelta(seconds=int(os.getenv('PLANT_INFO_STALE_TTL', 180 * 24 * 60 * 60)))
+        self.negative_ttl = timedelta(seconds=int(os.getenv('PLANT_INFO_NEGATIVE_TTL', 24 * 60 * 60)))
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='plant-info-refresh')
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def normalise(plant_name: str) -> str:
+        """'  Cherry_Tomato ' and 'cherry tomato' share an entry"""
+        return ' '.join(plant_name.replace('_', ' ').casefold().split())
+    
+    async def get_or_fetch(self, plant_name: str, fetch: Fetch) -> Optional[Dict[str, Any]]:
+        """
+        Cached info for the plant, calling fetch() with the normalised name when
+        there is none or it expired.
+        Stale info is returned at once and refreshed in the background. Only one
+        lookup per name runs at a time in this process; concurrent callers share it.
+        Raises fetch's exception when the lookup fails and nothing is cached.
+        """
+        key = self.normalise(plant_name)
+        entry = self._read(key)
+        now = datetime.utcnow()
+        if entry is not None and now < entry.fresh_until:
+            return entry.data
+        if entry is not None and now < entry.stale_until:
+            self._refresh_in_background(key, fetch)
+            return entry.data
+        
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+        
+        try:
+            if leader:
+                try:
+                    data = await fetch(key)
+                except BaseException as e:
+                    future.set_exception(e)
+                    raise
+                self._store(key, data, plant_name)
+                future.set_result(data)
+                return data
+            return await asyncio.wrap_future(future)
+        except Exception as e:
+            if entry is None:
+                raise
+            logger.warning(f"Plant info lookup for {plant_name} failed, serving expired info: {e}")
+            return entry.data
+        finally:
+            if leader:
+                with self._lock:
+                    del self._in_flight[key]
+    
+    async def prefetch(self, plant_names: Iterable[str], fetch: Fetch, force: bool = False) -> Dict[str, int]:
+        """Fetch and store every name whose entry is missing or not fresh (every name with force)"""
+        counts = {'fetched': 0, 'fresh': 0, 'failed': 0}
+        keys = {}
+        for plant_name in plant_names:
+            keys.setdefault(self.normalise(plant_name), plant_name)
+        
+        for key, plant_name in keys.items():
+            entry = self._read(key)
+            if not force and entry is not None and datetime.utcnow() < entry.fresh_until:
+                counts['fresh'] += 1
+                continue
+            try:
+                data = await fetch(key)
+            except Exception as e:
+                logger.warning(f"Prefetching plant info for {plant_name} failed: {e}")
+                counts['failed'] += 1
+                continue
+            self._store(key, data, plant_name)
+            counts['fetched'] += 1
+        return counts
+    
+    def _read(self, key: str) -> Optional[ExternalPlantInfo]:
+        try:
+            return db.session.get(ExternalPlantInfo, key)
+        except Exception as e:
+            logger.warning(f"Plant info cache read failed: {e}")
+            db.session.rollback()
+            return None
+    
+    def _store(self, key: str, data: Optional[Dict[str, Any]], plant_name: str = None) -> None:
+        """Insert or replace the entry, with the short TTL for misses and incomplete results"""
+        try:
+            entry = db.session.get(ExternalPlantInfo, key)
+            complete = data is None or not data.get('api_errors')
+            if not complete and entry is not None and entry.data:
+                # Keep the older, complete info; the next lookup after the lease tries again
+                entry.refreshing_until = None
+                db.session.commit()
+                return
+            
+            now = datetime.utcnow()
+            ttl = self.ttl if data and complete else self.negative_ttl
+            values = {
+                'name': plant_name or (entry.name if entry is not None else key),
+                'data': data,
+                'fetched_at': now,
+                'fresh_until': now + ttl,
+                'stale_until': now + ttl + self.stale_ttl,
+                'refreshing_until': None
+            }
+            if entry is None:
+                try:
+                    with db.session.begin_nested():
+                        db.session.add(ExternalPlantInfo(key=key, **values))
+                except IntegrityError:
+                    # Another worker stored it first
+                    entry = db.session.get(ExternalPlantInfo, key)
+            if entry is not None:
+                for column, value in values.items():
+                    setattr(entry, column, value)
+            db.session.commit()
+        except Exception as e:
+            logger.warning(f"Plant info cache write failed: {e}")
+            db.session.rollback()
+    
+    def _claim_refresh(self, key: str) -> bool:
+        """Take the refresh lease of a stale entry, False if another worker holds it or refreshed it"""
+        now = datetime.utcnow()
+        try:
+            claimed = ExternalPlantInfo.query.filter(
+                ExternalPlantInfo.key == key,
+                ExternalPlantInfo.fresh_until <= now,  # Not refreshed since it was read
+                or_(ExternalPlantInfo.refreshing_until.is_(None), ExternalPlantInfo.refreshing_until < now)
+            ).update({'refreshing_until': now + self.REFRESH_LEASE}, synchronize_session=False)
+            db.session.commit()
+            return claimed == 1
+        except Exception as e:
+            logger.warning(f"Plant info refresh claim failed: {e}")
+            db.session.rollback()
+            return False
+    
+    def _refresh_in_background(self, key: str, fetch: Fetch) -> None:
+        if self._claim_refresh(key):
+            self._executor.submit(self._refresh, current_app._get_current_object(), key, fetch)
+    
+    def _refresh(self, app, key: str, fetch: Fetch) -> None:
+        with app.app_context():
+            try:
+                data = asyncio.run(fetch(key))
+            except Exception as e:
+                # The lease runs out and a later lookup tries again
+                logger.warning(f"Refreshing plant info for {key} failed: {e}")
+                return
+            self._store(key, data)
+
+# Global cache instance
+plant_info_cache = PlantInfoCache()
@@ -0,0 +1,98 @@
+import logging
+from typing import Dict, Optional
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from models import db, Plant, PlantStats
+
+logger = logging.getLogger(__name__)
+
+# Plant.status -> PlantStats counter column
+STATUS_COLUMNS = {
+    'planned': 'planned_plants',
+    'planted': 'planted_plants',
+    'growing': 'growing_plants',
+    'harvested': 'harvested_plants'
+}
+
+class PlantStatsCounters:
+    """
+    Materialised plant counts per user
+    
+    The handlers that create, update or delete plants report the change in the
+    same transaction, so the counters commit or roll back with the plant and
+    reading the stats is a primary key lookup. A missing row is built from one
+    GROUP BY over the user's plants.
+    """
+    
+    def count(self, user_id: int) -> Dict[str, int]:
+        """Counts computed from the plant table in a single GROUP BY query"""
+        by_status = dict(db.session.query(Plant.status, func.count(Plant.id)).filter(
+            Plant.user_id == user_id
+        ).group_by(Plant.status).all())
+        
+        counts = {column: by_status.get(status, 0) for status, column in STATUS_COLUMNS.items()}
+        counts['total_plants'] = sum(by_status.values())
+        return counts
+    
+    def get(self, user_id: int) -> PlantStats:
+        """The user's counters, created from the plant table the first time"""
+        stats = db.session.get(PlantStats, user_id)
+        if stats is None:
+            self._create(user_id)
+            stats = db.session.get(PlantStats, user_id)
+        return stats
+    
+    def plant_added(self, plant: Plant) -> None:
+        """Count a new plant; call it before committing the plant"""
+        db.session.flush()  # Column defaults such as status are only set on insert
+        self._apply(plant.user_id, {'total_plants': 1, STATUS_COLUMNS.get(plant.status): 1})
+    
+    def plant_removed(self, plant: Plant) -> None:
+        """Uncount a deleted plant; call it before committing the delete"""
+        self._apply(plant.user_id, {'total_plants': -1, STATUS_COLUMNS.get(plant.status): -1})
+    
+    def status_changed(self, user_id: int, old_status: Optional[str], new_status: Optional[str]) -> None:
+        """Move a plant between status counters; call it before committing the update"""
+        if old_status != new_status:
+            self._apply(user_id, {STATUS_COLUMNS.get(old_status): -1, STATUS_COLUMNS.get(new_status): 1})
+    
+    def rebuild(self, user_id: int) -> PlantStats:
+        """Recount the user's plants, e.g. after plants were changed outside the handlers"""
+        counts = self.count(user_id)
+        stats = self.get(user_id)
+        if stats.to_dict() != counts:
+            logger.warning(f"Plant stats of user {user_id} drifted from the plant table, recounted")
+            for column, value in counts.items():
+                setattr(stats, column, value)
+        return stats
+    
+    def _create(self, user_id: int) -> bool:
+        """Insert the user's counters from the plant table, False if they already exist"""
+        if db.session.get(PlantStats, user_id) is not None:
+            return False
+        try:
+            with db.session.begin_nested():
+                db.session.add(PlantStats(user_id=user_id, **self.count(user_id)))
+        except IntegrityError:
+            # A concurrent request created them first
+            return False
+        return True
+    
+    def _apply(self, user_id: int, deltas: Dict[Optional[str], int]) -> None:
+        deltas = {column: delta for column, delta in deltas.items() if column is not None}
+        if not deltas:
+            return  # Status without a counter, e.g. None
+        
+        # Make the plant change visible to the GROUP BY, in case the row has to be created
+        db.session.flush()
+        if self._create(user_id):
+            return  # Counted from the table, which already includes this change
+        
+        # Relative update, so concurrent changes of the same user's plants add up
+        db.session.query(PlantStats).filter(PlantStats.user_id == user_id).update({
+            getattr(PlantStats, column): getattr(PlantStats, column) + delta
+            for column, delta in deltas.items()
+        }, synchronize_session=False)
+
+# Global counters instance
+plant_stats_counters = PlantStatsCounters()
@@ -0,0 +1,161 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Dict, NamedTuple, Optional
+from sqlalchemy import case, insert, select, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from models import db, RateLimitBucket
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 60 * 60, 'day': 24 * 60 * 60}
+
+class RateLimitExceeded(Exception):
+    """Raised instead of calling an API whose quota has no token left within the caller's deadline"""
+
+class RateLimit(NamedTuple):
+    capacity: float  # Calls allowed in a burst
+    per_second: float  # Tokens added back per second
+    
+    @classmethod
+    def parse(cls, value: str) -> Optional['RateLimit']:
+        """'100/day' or '120/minute'; None for an empty value or 'none'"""
+        if not value or value.lower() == 'none':
+            return None
+        calls, _, period = value.partition('/')
+        if period not in PERIODS:
+            raise ValueError(f"Unknown rate limit period in {value!r}, use one of {', '.join(PERIODS)}")
+        return cls(float(calls), float(calls) / PERIODS[period])
+
+class RateLimiter:
+    """
+    Token buckets for the quotas of the third-party plant APIs
+    
+    Each provider has one bucket row in the application database, so every
+    worker and host draws from the same quota. Taking a token is a single
+    conditional UPDATE that refills the bucket for the time since it was last
+    used. A call may take a token that only comes in later, up to its deadline,
+    leaving the bucket negative; it then waits its turn. A call that would have
+    to wait past its deadline is refused at once with RateLimitExceeded, so the
+    caller can fall back to cached or local data instead of a doomed request.
+    A 429 answer empties the bucket for its Retry-After.
+    """
+    
+    DEFAULT_PENALTY = 60  # Seconds without calls after a 429 without Retry-After
+    
+    def __init__(self):
+        self.max_wait = float(os.getenv('RATE_LIMIT_MAX_WAIT', 2))
+        self.limits: Dict[str, RateLimit] = {}
+        self._created = set()
+        
+        self.configure('perenual', os.getenv('PERENUAL_RATE_LIMIT', '100/day'))
+        self.configure('trefle', os.getenv('TREFLE_RATE_LIMIT', '120/minute'))
+    
+    def configure(self, provider: str, rate: str) -> None:
+        """Set a provider's quota, e.g. '100/day'; 'none' removes the limit"""
+        limit = RateLimit.parse(rate)
+        if limit is None:
+            self.limits.pop(provider, None)
+        else:
+            self.limits[provider] = limit
+    
+    def _refilled(self, limit: RateLimit, now: float):
+        """SQL expression of the bucket's tokens at `now`, capped at its capacity"""
+        table = RateLimitBucket.__table__
+        tokens = table.c.tokens + (now - table.c.updated_at) * limit.per_second
+        return case((tokens > limit.capacity, limit.capacity), else_=tokens)
+    
+    def _ensure_bucket(self, provider: str, limit: RateLimit) -> None:
+        """Create the provider's bucket full the first time"""
+        if provider in self._created:
+            return
+        table = RateLimitBucket.__table__
+        try:
+            with db.engine.begin() as connection:
+                if connection.execute(select(table.c.provider).where(table.c.provider == provider)).first() is None:
+                    connection.execute(insert(table).values(provider=provider, tokens=limit.capacity,
+                                                            updated_at=time.time()))
+        except IntegrityError:
+            # Another worker created it first
+            pass
+        self._created.add(provider)
+    
+    def reserve(self, provider: str, max_wait: float = None) -> float:
+        """
+        Take a token, returning the seconds to wait before making the call.
+        Raises RateLimitExceeded when the token would come later than max_wait.
+        Uses its own connection, so the caller's session is left alone; when
+        the database fails the call is let through unthrottled.
+        """
+        limit = self.limits.get(provider)
+        if limit is None:
+            return 0.0
+        max_wait = self.max_wait if max_wait is None else max_wait
+        
+        table = RateLimitBucket.__table__
+        now = time.time()
+        refilled = self._refilled(limit, now)
+        try:
+            self._ensure_bucket(provider, limit)
+            with db.engine.begin() as connection:
+                reserved = connection.execute(
+                    update(table)
+                    .where(table.c.provider == provider, refilled - 1 >= -limit.per_second * max_wait)
+                    .values(tokens=refilled - 1, updated_at=now)
+                ).rowcount
+                tokens = connection.execute(
+                    select(table.c.tokens if reserved else refilled).where(table.c.provider == provider)
+                ).scalar_one()
+        except SQLAlchemyError as e:
+            logger.warning(f"Rate limiter unavailable, calling {provider} unthrottled: {e}")
+            return 0.0
+        
+        if not reserved:
+            wait = (1 - tokens) / limit.per_second
+            raise RateLimitExceeded(f"{provider} quota used up, next call possible in {wait:.0f}s")
+        return max(0.0, -tokens / limit.per_second)
+    
+    async def acquire(self, provider: str, max_wait: float = None) -> None:
+        """Take a token and wait for it; raises RateLimitExceeded when it would take longer than max_wait"""
+        delay = self.reserve(provider, max_wait)
+        if delay > 0:
+            await asyncio.sleep(delay)
+    
+    def exhausted(self, provider: str, retry_after: Optional[float] = None) -> None:
+        """The API answered 429: no calls for retry_after seconds, in every worker"""
+        limit = self.limits.get(provider)
+        if limit is None:
+            return
+        seconds = self.DEFAULT_PENALTY if retry_after is None else retry_after
+        logger.warning(f"{provider} rate limited, no calls for {seconds:.0f}s")
+        table = RateLimitBucket.__table__
+        try:
+            self._ensure_bucket(provider, limit)
+            with db.engine.begin() as connection:
+                connection.execute(
+                    update(table).where(table.c.provider == provider)
+                    .values(tokens=-seconds * limit.per_second, updated_at=time.time())
+                )
+        except SQLAlchemyError as e:
+            logger.warning(f"Rate limiter unavailable, {provider} not paused: {e}")
+    
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Tokens left and quota per limited provider"""
+        table = RateLimitBucket.__table__
+        now = time.time()
+        stats = {}
+        with db.engine.connect() as connection:
+            for provider, limit in self.limits.items():
+                tokens = connection.execute(
+                    select(self._refilled(limit, now)).where(table.c.provider == provider)
+                ).scalar()
+                stats[provider] = {
+                    'tokens': round(limit.capacity if tokens is None else tokens, 2),
+                    'capacity': limit.capacity,
+                    'per_second': limit.per_second
+                }
+        return stats
+
+# Global limiter instance
+rate_limiter = RateLimiter()
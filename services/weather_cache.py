@@ -0,0 +1,204 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import date
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# Redis is optional; only needed for WEATHER_CACHE_BACKEND=redis
+try:
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+class MemoryWeatherBackend:
+    """In-process store with expiry, bounded to the most recently used entries"""
+    
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+    
+    def set(self, key: str, value: str, ttl: int) -> None:
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+class SQLiteWeatherBackend:
+    """SQLite file store, shared by the worker processes of one host"""
+    
+    def __init__(self, path: str, max_entries: int = 1024):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._connection().execute(
+            'CREATE TABLE IF NOT EXISTS weather_cache '
+            '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, used_at REAL NOT NULL)'
+        )
+    
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = connection
+        return connection
+    
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        connection = self._connection()
+        row = connection.execute(
+            'SELECT value FROM weather_cache WHERE key = ? AND expires_at > ?', (key, now)
+        ).fetchone()
+        if row is None:
+            return None
+        connection.execute('UPDATE weather_cache SET used_at = ? WHERE key = ?', (now, key))
+        return row[0]
+    
+    def set(self, key: str, value: str, ttl: int) -> None:
+        now = time.time()
+        connection = self._connection()
+        connection.execute(
+            'INSERT OR REPLACE INTO weather_cache (key, value, expires_at, used_at) VALUES (?, ?, ?, ?)',
+            (key, value, now + ttl, now)
+        )
+        # Drop expired entries, then the least recently used ones over the bound
+        connection.execute('DELETE FROM weather_cache WHERE expires_at <= ?', (now,))
+        connection.execute(
+            'DELETE FROM weather_cache WHERE key IN '
+            '(SELECT key FROM weather_cache ORDER BY used_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,)
+        )
+
+class RedisWeatherBackend:
+    """Redis (or any Redis-compatible server) store, shared across hosts; Redis evicts by TTL"""
+    
+    def __init__(self, url: str):
+        if redis is None:
+            raise ValueError("WEATHER_CACHE_BACKEND=redis requires the redis package")
+        self.client = redis.Redis.from_url(url, socket_timeout=2)
+    
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(key)
+        return value.decode('utf-8') if value is not None else None
+    
+    def set(self, key: str, value: str, ttl: int) -> None:
+        self.client.setex(key, ttl, value)
+
+class WeatherCache:
+    """
+    Processed weather data shared across plots and users
+    
+    Entries are keyed by the coordinates rounded to a grid cell (WEATHER_CACHE_GRID
+    degrees, about 11 km at 0.1) and expire after one forecast step
+    (WEATHER_CACHE_TTL seconds, OpenWeather forecasts come in 3 hour steps).
+    Concurrent misses for the same cell share a single fetch.
+    """
+    
+    def __init__(self):
+        self.grid = float(os.getenv('WEATHER_CACHE_GRID', 0.1))
+        self.ttl = int(os.getenv('WEATHER_CACHE_TTL', 3 * 60 * 60))
+        self.backend = None
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+    
+    def _get_backend(self):
+        """Lazy initialization of the configured backend"""
+        if self.backend is None:
+            backend = os.getenv('WEATHER_CACHE_BACKEND', 'memory').lower()
+            max_entries = int(os.getenv('WEATHER_CACHE_MAX_ENTRIES', 1024))
+            
+            if backend == 'sqlite':
+                self.backend = SQLiteWeatherBackend(os.getenv('WEATHER_CACHE_URL') or 'weather_cache.db', max_entries)
+            elif backend == 'redis':
+                self.backend = RedisWeatherBackend(os.getenv('WEATHER_CACHE_URL') or 'redis://localhost:6379/0')
+            elif backend == 'memory':
+                self.backend = MemoryWeatherBackend(max_entries)
+            else:
+                raise ValueError(f"Unknown WEATHER_CACHE_BACKEND: {backend}")
+        return self.backend
+    
+    def cache_key(self, latitude: float, longitude: float) -> str:
+        """Key of the grid cell containing the coordinates"""
+        return f"weather:{self.grid}:{round(latitude / self.grid)}:{round(longitude / self.grid)}"
+    
+    async def get_or_fetch(self, latitude: float, longitude: float,
+                           fetch: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        Cached weather for the coordinates' grid cell, calling fetch() on a miss.
+        Only one fetch per cell runs at a time, in this process; other callers wait for
+        its result (or exception). Backend errors are logged and treated as misses.
+        """
+        key = self.cache_key(latitude, longitude)
+        
+        cached = self._read(key)
+        if cached is not None:
+            return cached
+        
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+        
+        if not leader:
+            return await asyncio.wrap_future(future)
+        
+        try:
+            weather = await fetch()
+            self._write(key, weather)
+            future.set_result(weather)
+            return weather
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+    
+    def _read(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            value = self._get_backend().get(key)
+        except Exception as e:
+            logger.warning(f"Weather cache read failed: {e}")
+            return None
+        return self._decode(value) if value is not None else None
+    
+    def _write(self, key: str, weather: Dict[str, Any]) -> None:
+        try:
+            self._get_backend().set(key, self._encode(weather), self.ttl)
+        except Exception as e:
+            logger.warning(f"Weather cache write failed: {e}")
+    
+    def _encode(self, weather: Dict[str, Any]) -> str:
+        forecast = [dict(day, date=day['date'].isoformat()) for day in weather.get('forecast', [])]
+        return json.dumps(dict(weather, forecast=forecast))
+    
+    def _decode(self, value: str) -> Dict[str, Any]:
+        weather = json.loads(value)
+        weather['forecast'] = [dict(day, date=date.fromisoformat(day['date'])) for day in weather['forecast']]
+        return weather
+
+# Global cache instance
+weather_cache = WeatherCache()
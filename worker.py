@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Background job worker for Garden Fairy.
+Runs queued schedule generation and Google Calendar sync jobs from the database.
+
+Usage: python worker.py [--concurrency N]
+(default concurrency from JOB_WORKER_CONCURRENCY, else 2)
+"""
+
+import os
+import sys
+import logging
+import argparse
+
+from app import app
+from models import db
+from services.job_queue import job_queue
+
+def main():
+    parser = argparse.ArgumentParser(description='Run Garden Fairy background jobs')
+    parser.add_argument('--concurrency', type=int, default=int(os.getenv('JOB_WORKER_CONCURRENCY', 2)),
+                        help='number of jobs run in parallel')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    with app.app_context():
+        db.create_all()
+
+    try:
+        job_queue.work(app, concurrency=args.concurrency)
+    except KeyboardInterrupt:
+        print("👋 Job worker stopped")
+        sys.exit(0)
+
+if __name__ == '__main__':
+    main()